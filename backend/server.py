@@ -2,17 +2,31 @@ import os
 import uuid
 import logging
 import smtplib
-from datetime import datetime, timedelta, timedelta
-from typing import List, Optional, Dict
+import asyncio
+import hmac
+import hashlib
+import time
+import bisect
+import random
+import secrets
+import gzip
+import struct
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Dict, Tuple
 from pathlib import Path
+from zoneinfo import ZoneInfo
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from email.utils import format_datetime, parsedate_to_datetime
 from fastapi import FastAPI, HTTPException, status, Depends, UploadFile, File, Form, APIRouter, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, EmailStr
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, UpdateMany, ReturnDocument
+from pymongo.errors import DuplicateKeyError, BulkWriteError
 from passlib.context import CryptContext
 import jwt
 from enum import Enum
@@ -40,6 +54,9 @@ from reportlab.graphics.charts.linecharts import HorizontalLineChart
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.utils import PlotlyJSONEncoder
@@ -87,6 +104,16 @@ ALGORITHM = "HS256"
 # Daily.co API setup
 DAILY_API_KEY = os.environ.get('DAILY_API_KEY')
 DAILY_API_URL = os.environ.get('DAILY_API_URL', 'https://api.daily.co/v1')
+VIDEO_ROOM_GRACE_MINUTES = 30
+VIDEO_ROOM_REAP_INTERVAL_SECONDS = 300
+VIDEO_ROOM_REAP_BATCH_SIZE = 200
+VIDEO_ROOM_DELETE_CONCURRENCY = 5
+DAILY_API_TIMEOUT_SECONDS = 10
+
+# Certificate verification setup
+CERTIFICATE_SIGNING_KEY = os.environ.get('CERTIFICATE_SIGNING_KEY', SECRET_KEY)
+CERTIFICATE_REVOCATION_REFRESH_SECONDS = int(os.environ.get('CERTIFICATE_REVOCATION_REFRESH_SECONDS', '300'))
+CERTIFICATE_VERIFICATION_CACHE_SECONDS = 600
 
 # Cloudinary setup
 cloudinary.config(
@@ -185,6 +212,7 @@ class CertificateStatus(str, Enum):
     ELIGIBLE = "eligible"
     GENERATED = "generated"
     ISSUED = "issued"
+    REVOKED = "revoked"
 
 # Pydantic Models
 class UserBase(BaseModel):
@@ -270,6 +298,7 @@ class Enrollment(BaseModel):
     driving_school_id: str
     enrollment_status: EnrollmentStatus
     created_at: datetime
+    updated_at: Optional[datetime] = None  # Stamped on every write; analytics exports use it as their watermark
     approved_at: Optional[datetime] = None
 
 class EnrollmentCreate(BaseModel):
@@ -325,15 +354,38 @@ class QuizCreate(BaseModel):
     passing_score: float = 70.0
     time_limit_minutes: int = 30
 
+class QuizBatchAttempt(BaseModel):
+    student_id: Optional[str] = None
+    answers: dict
+
+class QuizBatchGradeRequest(BaseModel):
+    attempts: List[QuizBatchAttempt]
+    record: bool = False  # Store graded attempts for the listed students
+
+class OfflineQuizAttempt(BaseModel):
+    client_attempt_id: str  # Generated on the device, makes retries idempotent
+    quiz_id: str
+    answers: dict
+    started_at: Optional[str] = None
+    completed_at: Optional[str] = None
+    time_taken_seconds: Optional[int] = None
+
+class QuizAttemptSyncRequest(BaseModel):
+    attempts: List[OfflineQuizAttempt]
+
 class QuizAttempt(BaseModel):
     id: str
     quiz_id: str
     student_id: str
-    answers: dict
+    quiz_version: int = 1
+    answer_codes: Optional[bytes] = None  # Packed answer codes, see pack_answer_codes
+    correct_bitmap: Optional[bytes] = None
+    answers: Optional[dict] = None  # Raw answers, only for quizzes too large to pack
+    other_answers: Optional[dict] = None  # Raw values that matched no option
     score: float
     passed: bool
-    started_at: datetime
-    completed_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None  # Only stored when it differs from completed_at
+    completed_at: datetime
     time_taken_minutes: Optional[int] = None
 
 class VideoRoom(BaseModel):
@@ -376,6 +428,29 @@ class SessionCreate(BaseModel):
     duration_minutes: int = 60
     location: Optional[str] = None
 
+class RecurrenceRule(BaseModel):
+    frequency: str = "weekly"  # "daily" or "weekly"
+    interval: int = 1
+    count: int
+    weekdays: Optional[List[int]] = None  # 0 (Monday) to 6, weekly rules only
+
+class SessionSeriesCreate(BaseModel):
+    course_id: str
+    teacher_id: str
+    start_at: str  # ISO string of the first occurrence
+    duration_minutes: int = 60
+    location: Optional[str] = None
+    recurrence: RecurrenceRule
+    skip_conflicts: bool = True  # book the free occurrences and report clashes
+
+class AvailabilityException(BaseModel):
+    date: str  # YYYY-MM-DD in school local time
+    intervals: List[List[str]] = []  # [["09:00", "12:00"]]; empty means day off
+
+class TeacherAvailabilityUpdate(BaseModel):
+    weekly_hours: Dict[str, List[List[str]]]  # weekday "0" (Monday) to "6" -> [["08:00", "12:00"], ...]
+    exceptions: List[AvailabilityException] = []
+
 class ExternalExpert(BaseModel):
     id: str
     user_id: str
@@ -456,6 +531,7 @@ class ReviewCreate(BaseModel):
     rating: int  # 1-5 stars
     comment: str
     enrollment_id: str
+    teacher_id: Optional[str] = None
 
 class Review(BaseModel):
     id: str
@@ -467,6 +543,13 @@ class Review(BaseModel):
     comment: str
     created_at: datetime
 
+class CurriculumCourseConfig(BaseModel):
+    course_type: CourseType
+    total_sessions: int
+
+class CurriculumTemplateCreate(BaseModel):
+    courses: List[CurriculumCourseConfig]
+
 # Algerian States (58 wilayas)
 ALGERIAN_STATES = [
     "Adrar", "Chlef", "Laghouat", "Oum El Bouaghi", "Batna", "Béjaïa", "Biskra", 
@@ -484,6 +567,39 @@ ALGERIAN_STATES = [
 # Course sequence order
 COURSE_SEQUENCE = [CourseType.THEORY, CourseType.PARK, CourseType.ROAD]
 
+# Platform default curriculum, used by schools that have not defined their own
+DEFAULT_CURRICULUM = {
+    "id": "platform-default",
+    "driving_school_id": None,
+    "version": 1,
+    "courses": [
+        {"course_type": CourseType.THEORY, "total_sessions": 10},
+        {"course_type": CourseType.PARK, "total_sessions": 5},
+        {"course_type": CourseType.ROAD, "total_sessions": 15}
+    ]
+}
+CURRICULUM_CACHE_SECONDS = 300
+MAX_CURRICULUM_SESSIONS = 100
+
+# Session scheduling: reservations are claimed in fixed slots, so starts and durations
+# must sit on the slot grid; otherwise a partly used slot would block a later booking
+SESSION_SLOT_MINUTES = 5
+MIN_SESSION_DURATION_MINUTES = 15
+MAX_SESSION_DURATION_MINUTES = 240
+MAX_SERIES_OCCURRENCES = 60
+
+# Teacher availability: working hours are in school local time, Sunday to Thursday by default
+SCHOOL_TIMEZONE = ZoneInfo(os.environ.get('SCHOOL_TIMEZONE', 'Africa/Algiers'))
+DEFAULT_WEEKLY_HOURS = {
+    weekday: [["08:00", "12:00"], ["13:00", "17:00"]]
+    for weekday in ["6", "0", "1", "2", "3"]
+}
+MAX_SLOT_SEARCH_DAYS = 31
+
+# External expert assignment
+EXPERT_DAILY_EXAM_CAPACITY = int(os.environ.get('EXPERT_DAILY_EXAM_CAPACITY', '4'))
+EXPERT_DIRECTORY_CACHE_SECONDS = 60
+
 # Required documents by role
 REQUIRED_DOCUMENTS = {
     UserRole.STUDENT: [DocumentType.PROFILE_PHOTO, DocumentType.ID_CARD, DocumentType.MEDICAL_CERTIFICATE, DocumentType.RESIDENCE_CERTIFICATE],
@@ -521,6 +637,212 @@ def serialize_doc(doc):
         return doc.isoformat()  # Convert datetime to ISO string
     return doc
 
+class TTLCache:
+    """Small in-process cache with per-entry expiry"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        return value
+
+    def set(self, key, value, ttl_seconds: Optional[float] = None):
+        if key not in self._entries and len(self._entries) >= self.max_entries:
+            now = time.monotonic()
+            for stale_key in [k for k, (expires_at, _) in self._entries.items() if expires_at < now]:
+                self._entries.pop(stale_key, None)
+            if len(self._entries) >= self.max_entries:
+                # Drop the oldest insertion
+                self._entries.pop(next(iter(self._entries)))
+        self._entries[key] = (time.monotonic() + (ttl_seconds or self.ttl_seconds), value)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+class QueryPlan:
+    """Runs a composite endpoint's reads stage by stage, concurrently within a stage, timing each one"""
+
+    def __init__(self):
+        self.timings = {}
+        self._started = time.perf_counter()
+
+    async def _timed(self, name: str, awaitable):
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.timings[name] = (time.perf_counter() - started) * 1000
+
+    async def stage(self, **queries) -> dict:
+        """Await independent queries together; a stage costs as much as its slowest query"""
+        names = list(queries)
+        results = await asyncio.gather(*(self._timed(name, queries[name]) for name in names))
+        return dict(zip(names, results))
+
+    def server_timing(self) -> str:
+        """Timings as a Server-Timing header, so they show up in browser dev tools"""
+        entries = [f"{name};dur={duration:.1f}" for name, duration in self.timings.items()]
+        entries.append(f"total;dur={(time.perf_counter() - self._started) * 1000:.1f}")
+        return ", ".join(entries)
+
+class SnapshotCache:
+    """Pre-serialized responses tagged with the entities they were built from.
+    
+    A write drops every entry carrying one of its tags. Entries past their TTL
+    are still served for a grace window while a single background task
+    rebuilds them, and concurrent misses for one key share a single build.
+    """
+
+    def __init__(self, ttl_seconds: float, stale_seconds: float, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+        self._tagged = {}
+        self._invalidated_at = {}
+        self._builds = {}
+
+    def get(self, key) -> Tuple[Optional[bytes], bool]:
+        """Return (body, is_stale); body is None on a miss"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, False
+        fresh_until, stale_until, body, _ = entry
+        now = time.monotonic()
+        if now < fresh_until:
+            return body, False
+        if now < stale_until:
+            return body, True
+        self._drop(key)
+        return None, False
+
+    def set(self, key, body: bytes, tags, built_since: float) -> bool:
+        # A write that landed while the payload was being built may be missing from it
+        if any(self._invalidated_at.get(tag, -1.0) >= built_since for tag in tags):
+            return False
+        self._drop(key)
+        if len(self._entries) >= self.max_entries:
+            # Drop the oldest insertion
+            self._drop(next(iter(self._entries)))
+        now = time.monotonic()
+        self._entries[key] = (now + self.ttl_seconds, now + self.ttl_seconds + self.stale_seconds, body, tuple(tags))
+        for tag in tags:
+            self._tagged.setdefault(tag, set()).add(key)
+        return True
+
+    def invalidate_tags(self, *tags):
+        now = time.monotonic()
+        for tag in tags:
+            self._invalidated_at[tag] = now
+            for key in list(self._tagged.get(tag, ())):
+                self._drop(key)
+        if len(self._invalidated_at) > self.max_entries:
+            # Only builds started before an invalidation need its timestamp; none run for a whole TTL
+            horizon = now - self.ttl_seconds
+            self._invalidated_at = {tag: at for tag, at in self._invalidated_at.items() if at >= horizon}
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[3]:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    async def _build(self, key, build):
+        started = time.monotonic()
+        try:
+            body, tags = await build()
+            self.set(key, body, tags, started)
+            return body
+        finally:
+            self._builds.pop(key, None)
+
+    def _start_build(self, key, build) -> asyncio.Task:
+        task = self._builds.get(key)
+        if task is None:
+            task = self._builds[key] = asyncio.create_task(self._build(key, build))
+            task.add_done_callback(_log_snapshot_build_failure)
+        return task
+
+    async def fetch(self, key, build) -> Tuple[bytes, str]:
+        """Return (body, "hit" | "stale" | "miss"); build() returns (body, tags)"""
+        body, stale = self.get(key)
+        if body is not None:
+            if stale:
+                self._start_build(key, build)
+                return body, "stale"
+            return body, "hit"
+        return await asyncio.shield(self._start_build(key, build)), "miss"
+
+def _log_snapshot_build_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Snapshot build error: {str(task.exception())}")
+
+async def find_by_ids(collection, ids, projection: Optional[dict] = None, field: str = "id") -> Dict[str, dict]:
+    """Batch a per-item lookup into one $in query, keyed by the id field"""
+    ids = list({value for value in ids if value})
+    if not ids:
+        return {}
+    docs = await collection.find({field: {"$in": ids}}, projection or {"_id": 0}).to_list(length=None)
+    return {doc[field]: doc for doc in docs}
+
+def parse_fields_param(fields: Optional[str], allowed: frozenset) -> Optional[List[str]]:
+    """Validate a comma-separated fields= parameter against an endpoint's allow-list.
+    
+    Returns None when the caller wants full documents; otherwise the requested
+    fields in order, always including "id".
+    """
+    if fields is None:
+        return None
+    requested = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    if not requested:
+        return None
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(sorted(allowed))}"
+        )
+    if "id" not in requested:
+        requested.insert(0, "id")
+    return requested
+
+def fields_projection(fields: Optional[List[str]], needed: Tuple[str, ...] = ()) -> dict:
+    """Mongo projection for a sparse fieldset plus the fields the handler itself reads"""
+    projection = {"_id": 0}
+    if fields is not None:
+        projection.update({field: 1 for field in (*fields, *needed)})
+    return projection
+
+def select_fields(docs: List[dict], fields: Optional[List[str]]) -> List[dict]:
+    """Trim documents to a sparse fieldset, dropping fields only the handler needed"""
+    if fields is None:
+        return docs
+    return [{field: doc[field] for field in fields if field in doc} for doc in docs]
+
+def parse_utc_datetime(value: str) -> datetime:
+    """Parse an ISO string into the naive UTC datetimes stored in MongoDB"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -535,7 +857,8 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
-        if user_id is None:
+        # Scoped tokens grant narrower access and must never work as API sessions
+        if user_id is None or "scope" in payload:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
@@ -610,70 +933,470 @@ async def check_user_documents_complete_enhanced(user_id: str, role: str) -> boo
         # Fallback to original function
         return await check_user_documents_complete(user_id, role)
 
+# Position of each course type in COURSE_SEQUENCE
+COURSE_ORDER = {course_type: i for i, course_type in enumerate(COURSE_SEQUENCE)}
+
+def compute_course_availability(courses: List[dict]) -> Dict[str, CourseStatus]:
+    """Return the status changes needed to enforce sequential course unlocking.
+    
+    Theory is always available; each later course is available only once the
+    previous course's exam is passed, otherwise it is locked. Only courses whose
+    status actually changes appear in the result (course id -> new status).
+    """
+    ordered = sorted(courses, key=lambda course: COURSE_ORDER[course["course_type"]])
+    changes = {}
+    
+    for i, course in enumerate(ordered):
+        if i == 0 or ordered[i-1]["exam_status"] == ExamStatus.PASSED:
+            if course["status"] == CourseStatus.LOCKED:
+                changes[course["id"]] = CourseStatus.AVAILABLE
+        elif course["status"] != CourseStatus.LOCKED:
+            changes[course["id"]] = CourseStatus.LOCKED
+    
+    return changes
+
 async def update_course_availability(enrollment_id: str):
     """Update course availability based on completion status"""
-    courses_cursor = db.courses.find({"enrollment_id": enrollment_id}).sort("course_type", 1)
+    courses_cursor = db.courses.find(
+        {"enrollment_id": enrollment_id},
+        {"_id": 0, "id": 1, "course_type": 1, "status": 1, "exam_status": 1}
+    )
     courses = await courses_cursor.to_list(length=None)
     
-    # Sort courses by sequence
-    course_order = {CourseType.THEORY: 0, CourseType.PARK: 1, CourseType.ROAD: 2}
-    courses.sort(key=lambda x: course_order[x["course_type"]])
+    changes = compute_course_availability(courses)
+    if not changes:
+        return
+    
+    # Apply every change in one round-trip; the status guard skips courses changed concurrently
+    current_status = {course["id"]: course["status"] for course in courses}
+    now = datetime.utcnow()
+    await db.courses.bulk_write([
+        UpdateOne(
+            {"id": course_id, "status": current_status[course_id]},
+            {"$set": {"status": new_status, "updated_at": now}}
+        )
+        for course_id, new_status in changes.items()
+    ], ordered=False)
+    invalidate_dashboards(f"enrollment:{enrollment_id}")
+
+async def record_course_session_completed(course_id: str) -> Optional[dict]:
+    """Atomically count one completed session and open the exam once all sessions are done.
+    
+    The increment and the completion/exam decision happen in a single pipeline
+    update, so concurrent completions can neither lose a count nor see a stale
+    total. Returns the updated course, or None if it does not exist.
+    """
+    sessions_done = {"$gte": ["$completed_sessions", "$total_sessions"]}
+    course = await db.courses.find_one_and_update(
+        {"id": course_id},
+        [
+            {"$set": {
+                "completed_sessions": {"$add": [{"$ifNull": ["$completed_sessions", 0]}, 1]},
+                "updated_at": datetime.utcnow()
+            }},
+            {"$set": {
+                "status": {"$cond": [sessions_done, CourseStatus.COMPLETED, "$status"]},
+                "exam_status": {"$cond": [
+                    {"$and": [sessions_done, {"$ne": ["$exam_status", ExamStatus.PASSED]}]},
+                    ExamStatus.AVAILABLE,
+                    "$exam_status"
+                ]}
+            }}
+        ],
+        return_document=ReturnDocument.AFTER
+    )
+    if course:
+        invalidate_dashboards(f"enrollment:{course['enrollment_id']}")
+    return course
+
+# Resolved curriculum per school id (a school's own template or the platform default)
+curriculum_cache = TTLCache(CURRICULUM_CACHE_SECONDS)
+
+async def get_curriculum_template(driving_school_id: Optional[str]) -> dict:
+    """Return the current curriculum template for a school, served from memory when possible"""
+    if not driving_school_id:
+        return DEFAULT_CURRICULUM
+    
+    template = curriculum_cache.get(driving_school_id)
+    if template is None:
+        template = await db.curriculum_templates.find_one(
+            {"driving_school_id": driving_school_id},
+            {"_id": 0},
+            sort=[("version", -1)]
+        )
+        # Cache the fallback too, so schools without a template never hit the database
+        template = template or DEFAULT_CURRICULUM
+        curriculum_cache.set(driving_school_id, template)
     
-    for i, course in enumerate(courses):
-        if i == 0:  # First course (theory) is always available
-            if course["status"] == CourseStatus.LOCKED:
-                await db.courses.update_one(
-                    {"id": course["id"]},
-                    {"$set": {"status": CourseStatus.AVAILABLE, "updated_at": datetime.utcnow()}}
-                )
-        else:
-            # Check if previous course is completed and exam passed
-            prev_course = courses[i-1]
-            if prev_course["exam_status"] == ExamStatus.PASSED:
-                if course["status"] == CourseStatus.LOCKED:
-                    await db.courses.update_one(
-                        {"id": course["id"]},
-                        {"$set": {"status": CourseStatus.AVAILABLE, "updated_at": datetime.utcnow()}}
-                    )
-            else:
-                # Lock the course if previous not completed
-                if course["status"] != CourseStatus.LOCKED:
-                    await db.courses.update_one(
-                        {"id": course["id"]},
-                        {"$set": {"status": CourseStatus.LOCKED, "updated_at": datetime.utcnow()}}
-                    )
+    return template
 
-async def create_sequential_courses(enrollment_id: str):
-    """Create courses with proper sequential logic"""
-    courses = []
-    course_configs = [
-        {"type": CourseType.THEORY, "sessions": 10},
-        {"type": CourseType.PARK, "sessions": 5}, 
-        {"type": CourseType.ROAD, "sessions": 15}
+def session_end(session: dict) -> datetime:
+    return session["scheduled_at"] + timedelta(minutes=session.get("duration_minutes") or 60)
+
+def match_session_conflicts(
+    intervals: List[Tuple[datetime, datetime]],
+    booked_sessions: List[dict],
+    teacher_id: str,
+    student_id: str
+) -> List[dict]:
+    """Find booked sessions overlapping any requested interval.
+    
+    Booked sessions are sorted by start once; each interval then only scans the
+    sessions starting within MAX_SESSION_DURATION_MINUTES before its end.
+    """
+    booked = sorted(booked_sessions, key=lambda session: session["scheduled_at"])
+    starts = [session["scheduled_at"] for session in booked]
+    max_duration = timedelta(minutes=MAX_SESSION_DURATION_MINUTES)
+    
+    conflicts = []
+    for index, (start, end) in enumerate(intervals):
+        first = bisect.bisect_left(starts, start - max_duration)
+        last = bisect.bisect_left(starts, end)
+        for session in booked[first:last]:
+            if session_end(session) <= start:
+                continue
+            conflicts.append({
+                "index": index,
+                "session_id": session["id"],
+                "conflict_with": "teacher" if session["teacher_id"] == teacher_id else "student",
+                "scheduled_at": session["scheduled_at"],
+                "ends_at": session_end(session)
+            })
+    return conflicts
+
+async def find_session_conflicts(
+    teacher_id: str,
+    student_id: str,
+    intervals: List[Tuple[datetime, datetime]]
+) -> List[dict]:
+    """Check requested intervals against the teacher's and student's booked sessions in one query"""
+    if not intervals:
+        return []
+    
+    window = {
+        "$gt": min(start for start, _ in intervals) - timedelta(minutes=MAX_SESSION_DURATION_MINUTES),
+        "$lt": max(end for _, end in intervals)
+    }
+    booked_cursor = db.sessions.find(
+        {
+            "$or": [
+                {"teacher_id": teacher_id, "scheduled_at": window},
+                {"student_id": student_id, "scheduled_at": window}
+            ],
+            "status": {"$ne": SessionStatus.CANCELLED}
+        },
+        {"_id": 0, "id": 1, "teacher_id": 1, "student_id": 1, "scheduled_at": 1, "duration_minutes": 1}
+    )
+    booked_sessions = await booked_cursor.to_list(length=None)
+    
+    return match_session_conflicts(intervals, booked_sessions, teacher_id, student_id)
+
+def expand_recurrence(start: datetime, rule: RecurrenceRule) -> List[datetime]:
+    """List the occurrence start times of a recurrence rule (raises ValueError).
+    
+    Occurrences keep the first one's wall-clock time in SCHOOL_TIMEZONE, and
+    weekdays are school-local weekdays, so a 23:30 local start stays on its
+    local day and a lesson keeps its local hour across DST changes. Times are
+    naive UTC in and out.
+    """
+    if not 1 <= rule.count <= MAX_SERIES_OCCURRENCES:
+        raise ValueError(f"count must be between 1 and {MAX_SERIES_OCCURRENCES}")
+    if rule.interval < 1:
+        raise ValueError("interval must be at least 1")
+    if rule.frequency not in ("daily", "weekly"):
+        raise ValueError("frequency must be daily or weekly")
+    if rule.weekdays and any(not 0 <= weekday <= 6 for weekday in rule.weekdays):
+        raise ValueError("weekdays must be between 0 (Monday) and 6 (Sunday)")
+    
+    local_start = start.replace(tzinfo=timezone.utc).astimezone(SCHOOL_TIMEZONE).replace(tzinfo=None)
+    
+    if rule.frequency == "daily":
+        local_occurrences = [local_start + timedelta(days=i * rule.interval) for i in range(rule.count)]
+    elif not rule.weekdays:
+        local_occurrences = [local_start + timedelta(weeks=i * rule.interval) for i in range(rule.count)]
+    else:
+        week_start = local_start - timedelta(days=local_start.weekday())
+        weekdays = sorted(set(rule.weekdays))
+        local_occurrences = []
+        week = 0
+        while len(local_occurrences) < rule.count:
+            for weekday in weekdays:
+                occurrence = week_start + timedelta(weeks=week * rule.interval, days=weekday)
+                if occurrence >= local_start and len(local_occurrences) < rule.count:
+                    local_occurrences.append(occurrence)
+            week += 1
+    
+    # Naive arithmetic above is wall-clock arithmetic; attach the zone only to convert back
+    return [
+        occurrence.replace(tzinfo=SCHOOL_TIMEZONE).astimezone(timezone.utc).replace(tzinfo=None)
+        for occurrence in local_occurrences
     ]
+
+def session_grid_error(start: datetime, duration_minutes: int) -> Optional[str]:
+    """Why a booking does not fit the reservation slot grid, or None if it does"""
+    if start.minute % SESSION_SLOT_MINUTES or start.second or start.microsecond:
+        return f"Sessions must start on a {SESSION_SLOT_MINUTES}-minute boundary"
+    if duration_minutes % SESSION_SLOT_MINUTES:
+        return f"Session duration must be a multiple of {SESSION_SLOT_MINUTES} minutes"
+    return None
+
+def snap_to_session_grid(intervals: List[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+    """Shrink free intervals onto the slot grid so every start they offer can be booked"""
+    slot = timedelta(minutes=SESSION_SLOT_MINUTES)
+    snapped = []
+    for start, end in intervals:
+        # Bookings and working hours are almost always on the grid already; only do the arithmetic when not
+        if start.minute % SESSION_SLOT_MINUTES or start.second or start.microsecond:
+            day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+            start = day + -((day - start) // slot) * slot
+        if end.minute % SESSION_SLOT_MINUTES or end.second or end.microsecond:
+            day = end.replace(hour=0, minute=0, second=0, microsecond=0)
+            end = day + ((end - day) // slot) * slot
+        if start < end:
+            snapped.append((start, end))
+    return snapped
+
+def session_slot_keys(teacher_id: str, student_id: str, start: datetime, end: datetime) -> List[str]:
+    """Reservation keys for every slot an interval touches, for both participants.
+    
+    The start is rounded down and the end up to the grid; for bookings that pass
+    session_grid_error that is exact, so only real overlaps share a key.
+    """
+    slot = start.replace(second=0, microsecond=0) - timedelta(minutes=start.minute % SESSION_SLOT_MINUTES)
+    keys = []
+    while slot < end:
+        slot_key = slot.strftime("%Y%m%d%H%M")
+        keys.append(f"teacher:{teacher_id}:{slot_key}")
+        keys.append(f"student:{student_id}:{slot_key}")
+        slot += timedelta(minutes=SESSION_SLOT_MINUTES)
+    return keys
+
+async def reserve_session_slots(bookings: List[dict]) -> set:
+    """Claim slot reservations for bookings and return the session ids that clashed.
+    
+    Each booking is a dict with session_id, teacher_id, student_id, start and end.
+    Reservation _ids are unique, so concurrent bookings of the same slot cannot
+    both succeed; clashing bookings have their partial reservations released.
+    """
+    reservation_docs = []
+    owners = []
+    for booking in bookings:
+        for key in session_slot_keys(booking["teacher_id"], booking["student_id"], booking["start"], booking["end"]):
+            reservation_docs.append({"_id": key, "session_id": booking["session_id"], "expires_at": booking["end"]})
+            owners.append(booking["session_id"])
+    
+    clashed = set()
+    try:
+        await db.session_reservations.insert_many(reservation_docs, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            if error.get("code") != 11000:
+                raise
+            clashed.add(owners[error["index"]])
+    
+    if clashed:
+        await release_session_slots(list(clashed))
+    return clashed
+
+async def release_session_slots(session_ids: List[str]):
+    await db.session_reservations.delete_many({"session_id": {"$in": session_ids}})
+
+def merge_intervals(intervals: List[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+    """Sort intervals and merge the ones that overlap or touch"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def subtract_intervals(
+    free: List[Tuple[datetime, datetime]],
+    busy: List[Tuple[datetime, datetime]]
+) -> List[Tuple[datetime, datetime]]:
+    """Remove busy time from free time with a single sweep over both sorted lists"""
+    free = merge_intervals(free)
+    busy = merge_intervals(busy)
+    result = []
+    j = 0
+    for start, end in free:
+        cursor = start
+        while j < len(busy) and busy[j][1] <= cursor:
+            j += 1
+        k = j
+        while k < len(busy) and busy[k][0] < end:
+            if busy[k][0] > cursor:
+                result.append((cursor, busy[k][0]))
+            cursor = max(cursor, busy[k][1])
+            k += 1
+        if cursor < end:
+            result.append((cursor, end))
+    return result
+
+def parse_clock_intervals(intervals: List[List[str]]) -> List[List[str]]:
+    """Validate [["HH:MM", "HH:MM"], ...] working-hour intervals (raises ValueError)"""
+    validated = []
+    for interval in intervals:
+        if len(interval) != 2:
+            raise ValueError("Each interval needs a start and an end")
+        start, end = (datetime.strptime(value, "%H:%M").time() for value in interval)
+        if start >= end:
+            raise ValueError("Interval start must be before its end")
+        validated.append([start.strftime("%H:%M"), end.strftime("%H:%M")])
+    return validated
+
+def _clock_offsets(intervals: List[List[str]]) -> List[Tuple[timedelta, timedelta]]:
+    offsets = []
+    for interval in intervals:
+        start_hour, start_minute = map(int, interval[0].split(":"))
+        end_hour, end_minute = map(int, interval[1].split(":"))
+        offsets.append((timedelta(hours=start_hour, minutes=start_minute), timedelta(hours=end_hour, minutes=end_minute)))
+    return offsets
+
+def expand_availability(
+    availability: Optional[dict],
+    start: datetime,
+    end: datetime
+) -> List[Tuple[datetime, datetime]]:
+    """Turn weekly hours plus dated exceptions into UTC intervals clipped to [start, end)"""
+    availability = availability or {}
+    weekly_offsets = {
+        weekday: _clock_offsets(intervals)
+        for weekday, intervals in (availability.get("weekly_hours") or DEFAULT_WEEKLY_HOURS).items()
+    }
+    exception_offsets = {
+        exception["date"]: _clock_offsets(exception["intervals"])
+        for exception in availability.get("exceptions", [])
+    }
+    
+    intervals = []
+    day = start.replace(tzinfo=timezone.utc).astimezone(SCHOOL_TIMEZONE).date()
+    last_day = end.replace(tzinfo=timezone.utc).astimezone(SCHOOL_TIMEZONE).date()
+    while day <= last_day:
+        day_offsets = exception_offsets.get(day.isoformat())
+        if day_offsets is None:
+            day_offsets = weekly_offsets.get(str(day.weekday()), [])
+        if day_offsets:
+            # Local midnight in UTC; one offset lookup per day is enough for working hours
+            local_midnight = datetime(day.year, day.month, day.day)
+            utc_midnight = local_midnight - SCHOOL_TIMEZONE.utcoffset(local_midnight + timedelta(hours=12))
+            for start_offset, end_offset in day_offsets:
+                interval_start = max(utc_midnight + start_offset, start)
+                interval_end = min(utc_midnight + end_offset, end)
+                if interval_start < interval_end:
+                    intervals.append((interval_start, interval_end))
+        day += timedelta(days=1)
+    
+    return merge_intervals(intervals)
+
+def teacher_accepts_student(teacher: dict, student_gender: Optional[str]) -> bool:
+    if student_gender == Gender.MALE:
+        return teacher.get("can_teach_male", True)
+    if student_gender == Gender.FEMALE:
+        return teacher.get("can_teach_female", True)
+    return True
+
+# Available experts keyed by (specialization, state), rebuilt at most once a minute
+expert_directory_cache = TTLCache(EXPERT_DIRECTORY_CACHE_SECONDS)
+
+async def get_expert_pool(exam_type: str, state: Optional[str]) -> List[dict]:
+    """Available experts for an exam type in a state, from the in-memory directory"""
+    directory = expert_directory_cache.get("directory")
+    if directory is None:
+        directory = {}
+        experts_cursor = db.external_experts.find(
+            {"is_available": True},
+            {"_id": 0, "id": 1, "specialization": 1, "available_states": 1, "daily_capacity": 1}
+        )
+        async for expert in experts_cursor:
+            for specialization in expert.get("specialization") or []:
+                for expert_state in expert.get("available_states") or []:
+                    directory.setdefault((specialization, expert_state), []).append(expert)
+        expert_directory_cache.set("directory", directory)
+    
+    return directory.get((exam_type, state), [])
+
+async def reserve_expert_capacity(expert_id: str, day: str, capacity: int) -> bool:
+    """Atomically book one exam slot for an expert on a day, failing once the day is full"""
+    for _ in range(2):
+        try:
+            await db.expert_exam_load.update_one(
+                {"_id": f"{expert_id}:{day}", "booked": {"$lt": capacity}},
+                {"$inc": {"booked": 1}, "$setOnInsert": {"expert_id": expert_id, "date": day}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            # Either the day is full, or a concurrent request created the counter first; retry once
+            continue
+    return False
+
+async def release_expert_capacity(expert_id: str, day: str):
+    await db.expert_exam_load.update_one(
+        {"_id": f"{expert_id}:{day}", "booked": {"$gt": 0}},
+        {"$inc": {"booked": -1}}
+    )
+
+async def assign_external_expert(
+    exam_type: str,
+    state: Optional[str],
+    preferred_dates: List[datetime]
+) -> Optional[Tuple[dict, datetime]]:
+    """Pick the least-loaded expert free on the earliest possible preferred date and reserve them"""
+    pool = await get_expert_pool(exam_type, state)
+    if not pool:
+        return None
+    
+    days = list(dict.fromkeys(date.date().isoformat() for date in preferred_dates))
+    loads_cursor = db.expert_exam_load.find(
+        {"expert_id": {"$in": [expert["id"] for expert in pool]}, "date": {"$in": days}},
+        {"_id": 0, "expert_id": 1, "date": 1, "booked": 1}
+    )
+    booked = {(load["expert_id"], load["date"]): load["booked"] async for load in loads_cursor}
+    
+    for scheduled_at in preferred_dates:
+        day = scheduled_at.date().isoformat()
+        # Least loaded first; random tie-break so equal experts share the work
+        candidates = sorted(pool, key=lambda expert: (booked.get((expert["id"], day), 0), random.random()))
+        for expert in candidates:
+            capacity = expert.get("daily_capacity") or EXPERT_DAILY_EXAM_CAPACITY
+            if booked.get((expert["id"], day), 0) >= capacity:
+                continue
+            if await reserve_expert_capacity(expert["id"], day, capacity):
+                return expert, scheduled_at
+    
+    return None
+
+async def create_sequential_courses(enrollment_id: str, driving_school_id: Optional[str] = None):
+    """Create courses with proper sequential logic from the school's curriculum template"""
+    template = await get_curriculum_template(driving_school_id)
+    now = datetime.utcnow()
     
-    for i, course_config in enumerate(course_configs):
-        course_id = str(uuid.uuid4())
+    courses = []
+    for i, course_config in enumerate(template["courses"]):
         # Only first course (theory) is available initially
         initial_status = CourseStatus.AVAILABLE if i == 0 else CourseStatus.LOCKED
         
-        course_doc = {
-            "id": course_id,
+        # total_sessions is kept on the course so progress can be decided atomically
+        # and later template edits don't change courses already in progress
+        courses.append({
+            "id": str(uuid.uuid4()),
             "enrollment_id": enrollment_id,
-            "course_type": course_config["type"],
+            "course_type": course_config["course_type"],
             "status": initial_status,
-            "teacher_id": None,
-            "scheduled_sessions": [],
             "completed_sessions": 0,
-            "total_sessions": course_config["sessions"],
+            "total_sessions": course_config["total_sessions"],
             "exam_status": ExamStatus.NOT_AVAILABLE,
-            "exam_score": None,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
-        courses.append(course_doc)
+            "curriculum_id": template["id"],
+            "curriculum_version": template["version"],
+            "created_at": now,
+            "updated_at": now
+        })
     
     await db.courses.insert_many(courses)
+    invalidate_dashboards(f"enrollment:{enrollment_id}")
     return courses
 
 # Cloudinary upload function
@@ -762,6 +1485,91 @@ async def generate_qr_code(data: str) -> str:
     img_str = base64.b64encode(buffered.getvalue()).decode()
     return img_str
 
+def _b64url_encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def _b64url_decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def hash_certificate_name(name: str) -> str:
+    """Hash a holder name so it can be checked without being printed in the QR code"""
+    normalized = " ".join(name.casefold().split())
+    return hashlib.sha256(normalized.encode()).hexdigest()[:16]
+
+def sign_certificate_token(
+    certificate_number: str,
+    student_name: str,
+    issue_date: datetime,
+    expiry_date: Optional[datetime] = None
+) -> str:
+    """Build the compact signed token embedded in certificate QR codes"""
+    payload = "|".join([
+        certificate_number,
+        hash_certificate_name(student_name),
+        issue_date.strftime("%Y%m%d"),
+        expiry_date.strftime("%Y%m%d") if expiry_date else ""
+    ]).encode()
+    signature = hmac.new(CERTIFICATE_SIGNING_KEY.encode(), payload, hashlib.sha256).digest()[:16]
+    return f"{_b64url_encode(payload)}.{_b64url_encode(signature)}"
+
+def decode_certificate_token(token: str) -> dict:
+    """Check a certificate token signature and return its claims (raises ValueError if invalid)"""
+    try:
+        encoded_payload, encoded_signature = token.split(".")
+        payload = _b64url_decode(encoded_payload)
+        signature = _b64url_decode(encoded_signature)
+    except ValueError:
+        raise ValueError("Malformed certificate token")
+
+    expected_signature = hmac.new(CERTIFICATE_SIGNING_KEY.encode(), payload, hashlib.sha256).digest()[:16]
+    if not hmac.compare_digest(signature, expected_signature):
+        raise ValueError("Invalid certificate signature")
+
+    try:
+        certificate_number, name_hash, issue_date, expiry_date = payload.decode().split("|")
+        return {
+            "certificate_number": certificate_number,
+            "name_hash": name_hash,
+            "issue_date": datetime.strptime(issue_date, "%Y%m%d"),
+            "expiry_date": datetime.strptime(expiry_date, "%Y%m%d") if expiry_date else None
+        }
+    except ValueError:
+        raise ValueError("Malformed certificate token")
+
+def certificate_qr_payload(verification_token: str) -> str:
+    return f"VERIFY:{verification_token}"
+
+VALID_CERTIFICATE_STATUSES = (CertificateStatus.GENERATED, CertificateStatus.ISSUED)
+
+def certificate_is_valid(status: str, expiry_date: Optional[datetime], now: datetime) -> bool:
+    """Single validity rule for token and database verification; expiry is inclusive of its day"""
+    if status not in VALID_CERTIFICATE_STATUSES:
+        return False
+    return expiry_date is None or now.date() <= expiry_date.date()
+
+# In-memory revocation list, swapped wholesale by refresh_certificate_revocations
+revoked_certificate_numbers: set = set()
+certificate_verification_cache = TTLCache(CERTIFICATE_VERIFICATION_CACHE_SECONDS)
+
+async def refresh_certificate_revocations():
+    """Reload revoked certificate numbers from the database"""
+    global revoked_certificate_numbers
+    cursor = db.certificates.find(
+        {"status": CertificateStatus.REVOKED},
+        {"_id": 0, "certificate_number": 1}
+    )
+    revoked_certificate_numbers = {doc["certificate_number"] async for doc in cursor}
+    certificate_verification_cache.clear()
+
+async def certificate_revocation_refresher():
+    """Keep the revocation list fresh for offline token verification"""
+    while True:
+        try:
+            await refresh_certificate_revocations()
+        except Exception as e:
+            logger.error(f"Certificate revocation refresh error: {str(e)}")
+        await asyncio.sleep(CERTIFICATE_REVOCATION_REFRESH_SECONDS)
+
 async def create_certificate_pdf(certificate_data: dict) -> bytes:
     """Generate a professional PDF certificate"""
     buffer = BytesIO()
@@ -844,7 +1652,13 @@ async def create_certificate_pdf(certificate_data: dict) -> bytes:
     content.append(Spacer(1, 30))
     
     # QR Code for verification
-    qr_code = await generate_qr_code(f"VERIFY:{certificate_data['certificate_number']}")
+    verification_token = certificate_data.get('verification_token') or sign_certificate_token(
+        certificate_data['certificate_number'],
+        certificate_data['student_name'],
+        certificate_data['issue_date'],
+        certificate_data['expiry_date']
+    )
+    qr_code = await generate_qr_code(certificate_qr_payload(verification_token))
     qr_image = Image(BytesIO(base64.b64decode(qr_code)), width=100, height=100)
     content.append(Paragraph("Scan QR Code to Verify Certificate:", content_style))
     content.append(qr_image)
@@ -959,7 +1773,7 @@ async def calculate_student_metrics(student_id: str) -> dict:
                 metrics["completed_courses"] += 1
         
         # Get quiz attempts
-        quiz_attempts_cursor = db.quiz_attempts.find({"student_id": student_id})
+        quiz_attempts_cursor = db.quiz_attempts.find({"student_id": student_id}, {"_id": 0, "score": 1})
         quiz_attempts = await quiz_attempts_cursor.to_list(length=None)
         
         quiz_scores = [attempt["score"] for attempt in quiz_attempts]
@@ -1058,6 +1872,7 @@ async def mark_notification_read(
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Notification not found")
+        invalidate_dashboards(f"user:{current_user['id']}")
         
         return {"message": "Notification marked as read"}
     
@@ -1210,42 +2025,87 @@ async def login_user(user_data: UserLogin):
             raise e
         raise HTTPException(status_code=500, detail="Login failed")
 
+# Dashboards are cached per (view, user) and tagged with what they were built from:
+#   user:{id}        enrollments, documents and notifications owned by the user
+#   school:{id}      a school, its enrollments and its teachers
+#   enrollment:{id}  course progress of one enrollment
+#   teacher:{id}     sessions assigned to a teacher
+#   expert:{id}      exams assigned to an external expert
+DASHBOARD_SNAPSHOT_TTL_SECONDS = 60
+DASHBOARD_SNAPSHOT_STALE_SECONDS = 300
+dashboard_snapshots = SnapshotCache(DASHBOARD_SNAPSHOT_TTL_SECONDS, DASHBOARD_SNAPSHOT_STALE_SECONDS)
+
+def invalidate_dashboards(*tags: str):
+    """Called by every write a dashboard reads, with the tags of the entities it touched"""
+    dashboard_snapshots.invalidate_tags(*tags)
+
+async def create_notification(notification_doc: dict):
+    """Insert a notification and drop the recipient's cached dashboards"""
+    await db.notifications.insert_one(notification_doc)
+    invalidate_dashboards(f"user:{notification_doc['user_id']}")
+
+async def dashboard_snapshot_response(key, build, plan: QueryPlan, prefix: bytes = b"") -> Response:
+    """Serve a dashboard from its snapshot; build() returns (payload, tags) and runs on a miss or refresh"""
+    async def build_snapshot():
+        payload, tags = await build()
+        return json.dumps(serialize_doc(payload), separators=(",", ":")).encode(), tags
+    
+    body, status = await dashboard_snapshots.fetch(key, build_snapshot)
+    if prefix:
+        # Splice request-specific fields in front of the cached object's members
+        body = b"{" + prefix + (b"," + body[1:] if body != b"{}" else b"}")
+    server_timing = plan.server_timing() if status == "miss" else ""
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"Server-Timing": f"cache;desc={status}" + (f", {server_timing}" if server_timing else "")}
+    )
+
 @api_router.get("/dashboard")
 async def get_dashboard_data(current_user: dict = Depends(get_current_user)):
     """Get dashboard data for the current user"""
     try:
-        dashboard_data = {
-            "user": serialize_doc(current_user),
-            "enrollments": [],
-            "documents": [],
-            "notifications": []
-        }
-        
-        # Get user's enrollments
-        enrollments_cursor = db.enrollments.find({"student_id": current_user["id"]})
-        enrollments = await enrollments_cursor.to_list(length=None)
-        
-        for enrollment in enrollments:
-            # Get school details
-            school = await db.driving_schools.find_one({"id": enrollment["driving_school_id"]})
-            enrollment_data = serialize_doc(enrollment)
-            if school:
-                enrollment_data["school_name"] = school["name"]
-                enrollment_data["school_address"] = school["address"]
-                enrollment_data["school_state"] = school["state"]
-            dashboard_data["enrollments"].append(enrollment_data)
-        
-        # Get user's documents
-        documents_cursor = db.documents.find({"user_id": current_user["id"]})
-        documents = await documents_cursor.to_list(length=None)
-        dashboard_data["documents"] = serialize_doc(documents)
-        
-        # Get user's notifications
-        notifications_cursor = db.notifications.find({"user_id": current_user["id"]}).sort("created_at", -1).limit(10)
-        notifications = await notifications_cursor.to_list(length=None)
-        dashboard_data["notifications"] = serialize_doc(notifications)
+        plan = QueryPlan()
+        user_id = current_user["id"]
+        
+        async def build():
+            dashboard_data = {
+                "enrollments": [],
+                "documents": [],
+                "notifications": []
+            }
+            
+            # Enrollments, documents and notifications don't depend on each other
+            reads = await plan.stage(
+                enrollments=db.enrollments.find({"student_id": user_id}).to_list(length=None),
+                documents=db.documents.find({"user_id": user_id}).to_list(length=None),
+                notifications=db.notifications.find({"user_id": user_id}).sort("created_at", -1).limit(10).to_list(length=10)
+            )
+            
+            # School details for every enrollment in one query
+            schools = (await plan.stage(schools=find_by_ids(
+                db.driving_schools,
+                [enrollment["driving_school_id"] for enrollment in reads["enrollments"]],
+                {"_id": 0, "id": 1, "name": 1, "address": 1, "state": 1}
+            )))["schools"]
+            
+            for enrollment in reads["enrollments"]:
+                school = schools.get(enrollment["driving_school_id"])
+                enrollment_data = serialize_doc(enrollment)
+                if school:
+                    enrollment_data["school_name"] = school["name"]
+                    enrollment_data["school_address"] = school["address"]
+                    enrollment_data["school_state"] = school["state"]
+                dashboard_data["enrollments"].append(enrollment_data)
+            
+            dashboard_data["documents"] = serialize_doc(reads["documents"])
+            dashboard_data["notifications"] = serialize_doc(reads["notifications"])
+            
+            tags = [f"user:{user_id}"] + [f"school:{school_id}" for school_id in schools]
+            return dashboard_data, tags
         
-        return dashboard_data
+        user_json = json.dumps(serialize_doc(current_user), separators=(",", ":")).encode()
+        return await dashboard_snapshot_response(("dashboard", user_id), build, plan, prefix=b'"user":' + user_json)
     
     except Exception as e:
         logger.error(f"Dashboard error: {str(e)}")
@@ -1294,6 +2154,7 @@ async def upload_document(
             )
         else:
             await db.documents.insert_one(document_data)
+        invalidate_dashboards(f"user:{current_user['id']}")
         
         return {
             "message": "Document uploaded successfully",
@@ -1347,19 +2208,24 @@ async def enroll_in_school(
             raise HTTPException(status_code=400, detail="Already enrolled in this school")
         
         # Create enrollment
+        now = datetime.utcnow()
         enrollment_doc = {
             "id": str(uuid.uuid4()),
             "student_id": current_user["id"],
             "driving_school_id": enrollment_data.school_id,
             "enrollment_status": EnrollmentStatus.PENDING_APPROVAL,
-            "created_at": datetime.utcnow(),
+            "created_at": now,
+            "updated_at": now,
             "approved_at": None
         }
         
         await db.enrollments.insert_one(enrollment_doc)
+        invalidate_school_analytics(school["id"])
+        invalidate_dashboards(f"user:{current_user['id']}", f"school:{school['id']}")
+        await record_school_activity(school["id"], enrollment_doc["created_at"], enrollments=1)
         
         # Create initial courses (locked until documents are approved)
-        await create_sequential_courses(enrollment_doc["id"])
+        await create_sequential_courses(enrollment_doc["id"], school["id"])
         
         return {
             "message": "Enrollment created successfully",
@@ -1570,16 +2436,21 @@ async def create_enrollment(
         
         # Create enrollment without payment requirement
         enrollment_id = str(uuid.uuid4())
+        now = datetime.utcnow()
         enrollment_doc = {
             "id": enrollment_id,
             "student_id": current_user["id"],
             "driving_school_id": enrollment_data.school_id,
             "enrollment_status": EnrollmentStatus.PENDING_APPROVAL,
-            "created_at": datetime.utcnow(),
+            "created_at": now,
+            "updated_at": now,
             "approved_at": None
         }
         
         await db.enrollments.insert_one(enrollment_doc)
+        invalidate_school_analytics(school["id"])
+        invalidate_dashboards(f"user:{current_user['id']}", f"school:{school['id']}")
+        await record_school_activity(school["id"], enrollment_doc["created_at"], enrollments=1)
         
         # Update user role to student if they were a guest
         if current_user["role"] == "guest":
@@ -1589,7 +2460,7 @@ async def create_enrollment(
             )
         
         # Create sequential courses for the enrollment
-        await create_sequential_courses(enrollment_id)
+        await create_sequential_courses(enrollment_id, school["id"])
         
         return {
             "message": "Enrollment successful! Your enrollment is ready for manager approval.",
@@ -1678,6 +2549,7 @@ async def upload_document(
         }
         
         await db.documents.insert_one(document_data)
+        invalidate_dashboards(f"user:{current_user['id']}")
         
         # Check if all required documents are uploaded and update enrollment status
         if current_user["role"] == "student":
@@ -1875,16 +2747,20 @@ async def accept_student_enrollment(
             raise HTTPException(status_code=400, detail="Student has not uploaded all required documents")
         
         # Accept the enrollment
+        now = datetime.utcnow()
         await db.enrollments.update_one(
             {"id": enrollment_id},
             {
                 "$set": {
                     "enrollment_status": EnrollmentStatus.APPROVED,
-                    "approved_at": datetime.utcnow(),
-                    "approved_by": current_user["id"]
+                    "approved_at": now,
+                    "approved_by": current_user["id"],
+                    "updated_at": now
                 }
             }
         )
+        invalidate_school_analytics(school["id"])
+        invalidate_dashboards(f"user:{enrollment['student_id']}", f"school:{school['id']}")
         
         # Mark all student documents as accepted (if any were refused)
         for doc_type in required_types:
@@ -1923,7 +2799,7 @@ async def accept_student_enrollment(
             },
             "created_at": datetime.utcnow()
         }
-        await db.notifications.insert_one(notification_doc)
+        await create_notification(notification_doc)
         
         return {
             "message": "Student enrollment accepted successfully",
@@ -1964,8 +2840,10 @@ async def reject_enrollment(
         # Reject enrollment
         await db.enrollments.update_one(
             {"id": enrollment_id},
-            {"$set": {"enrollment_status": EnrollmentStatus.REJECTED}}
+            {"$set": {"enrollment_status": EnrollmentStatus.REJECTED, "updated_at": datetime.utcnow()}}
         )
+        invalidate_school_analytics(school["id"])
+        invalidate_dashboards(f"user:{enrollment['student_id']}", f"school:{school['id']}")
         
         # Send notification to student
         notification_doc = {
@@ -1978,7 +2856,7 @@ async def reject_enrollment(
             "metadata": {"enrollment_id": enrollment_id, "school_name": school["name"], "reason": reason},
             "created_at": datetime.utcnow()
         }
-        await db.notifications.insert_one(notification_doc)
+        await create_notification(notification_doc)
         
         return {"message": "Enrollment rejected"}
     
@@ -2067,17 +2945,21 @@ async def refuse_student_enrollment(
             raise HTTPException(status_code=404, detail="Student not found")
         
         # Update enrollment status to rejected
+        now = datetime.utcnow()
         await db.enrollments.update_one(
             {"id": enrollment_id},
             {
                 "$set": {
                     "enrollment_status": EnrollmentStatus.REJECTED,
-                    "rejected_at": datetime.utcnow(),
+                    "rejected_at": now,
                     "rejected_by": current_user["id"],
-                    "rejection_reason": reason.strip()
+                    "rejection_reason": reason.strip(),
+                    "updated_at": now
                 }
             }
         )
+        invalidate_school_analytics(school["id"])
+        invalidate_dashboards(f"user:{enrollment['student_id']}", f"school:{school['id']}")
         
         # Mark all student documents as refused if they were accepted
         await db.documents.update_many(
@@ -2113,7 +2995,7 @@ async def refuse_student_enrollment(
             },
             "created_at": datetime.utcnow()
         }
-        await db.notifications.insert_one(notification_doc)
+        await create_notification(notification_doc)
         
         return {
             "message": "Student enrollment refused successfully",
@@ -2259,6 +3141,7 @@ async def reject_document(
                 }
             }
         )
+        invalidate_dashboards(f"user:{student_id}")
         
         # Send notification to student
         notification_doc = {
@@ -2271,7 +3154,7 @@ async def reject_document(
             "metadata": {"document_type": document["document_type"], "reason": reason},
             "created_at": datetime.utcnow()
         }
-        await db.notifications.insert_one(notification_doc)
+        await create_notification(notification_doc)
         
         return {"message": "Document rejected successfully"}
     
@@ -2320,6 +3203,7 @@ async def create_driving_school(
         }
         
         await db.driving_schools.insert_one(school_doc)
+        invalidate_dashboards(f"user:{current_user['id']}")
         
         return {"id": school_id, "message": "Driving school created successfully"}
     
@@ -2379,6 +3263,7 @@ async def update_driving_school(
             {"id": school_id},
             {"$set": update_data}
         )
+        invalidate_dashboards(f"school:{school_id}")
         
         return {"message": "Driving school updated successfully"}
     
@@ -2422,6 +3307,7 @@ async def upload_school_photo(
                 {"id": school_id},
                 {"$push": {"photos": upload_result["file_url"]}}
             )
+        invalidate_dashboards(f"school:{school_id}")
         
         return {
             "message": f"School {photo_type} uploaded successfully",
@@ -2434,6 +3320,74 @@ async def upload_school_photo(
             raise e
         raise HTTPException(status_code=500, detail="Failed to upload photo")
 
+@api_router.get("/driving-schools/{school_id}/curriculum")
+async def get_school_curriculum(school_id: str):
+    try:
+        template = await get_curriculum_template(school_id)
+        return serialize_doc(template)
+    
+    except Exception as e:
+        logger.error(f"Get curriculum error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to retrieve curriculum")
+
+@api_router.put("/driving-schools/{school_id}/curriculum")
+async def update_school_curriculum(
+    school_id: str,
+    curriculum_data: CurriculumTemplateCreate,
+    current_user = Depends(get_current_user)
+):
+    try:
+        if current_user["role"] != "manager":
+            raise HTTPException(status_code=403, detail="Only managers can update the curriculum")
+        
+        # Verify ownership
+        school = await db.driving_schools.find_one({
+            "id": school_id,
+            "manager_id": current_user["id"]
+        })
+        if not school:
+            raise HTTPException(status_code=404, detail="Driving school not found or unauthorized")
+        
+        # Every course of the sequence must appear exactly once
+        course_types = [course.course_type for course in curriculum_data.courses]
+        if sorted(course_types, key=COURSE_ORDER.get) != COURSE_SEQUENCE:
+            raise HTTPException(status_code=400, detail="Curriculum must define theory, park and road courses once each")
+        if any(not 1 <= course.total_sessions <= MAX_CURRICULUM_SESSIONS for course in curriculum_data.courses):
+            raise HTTPException(status_code=400, detail=f"Each course needs between 1 and {MAX_CURRICULUM_SESSIONS} sessions")
+        
+        latest = await db.curriculum_templates.find_one(
+            {"driving_school_id": school_id},
+            {"_id": 0, "version": 1},
+            sort=[("version", -1)]
+        )
+        template_doc = {
+            "id": str(uuid.uuid4()),
+            "driving_school_id": school_id,
+            "version": latest["version"] + 1 if latest else 1,
+            "courses": [
+                {"course_type": course.course_type, "total_sessions": course.total_sessions}
+                for course in sorted(curriculum_data.courses, key=lambda course: COURSE_ORDER[course.course_type])
+            ],
+            "created_by": current_user["id"],
+            "created_at": datetime.utcnow()
+        }
+        
+        # Unique (driving_school_id, version) index rejects concurrent edits of the same version
+        await db.curriculum_templates.insert_one(template_doc)
+        curriculum_cache.invalidate(school_id)
+        
+        return {"message": "Curriculum updated successfully", "curriculum": serialize_doc(template_doc)}
+    
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Curriculum was updated concurrently, please retry")
+    except Exception as e:
+        logger.error(f"Update curriculum error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to update curriculum")
+
 # TEACHER MANAGEMENT ENDPOINTS
 
 @api_router.post("/teachers/add")
@@ -2519,6 +3473,8 @@ async def add_teacher(
         }
         
         await db.teachers.insert_one(teacher_doc)
+        invalidate_school_analytics(school["id"])
+        invalidate_dashboards(f"user:{teacher_user['id']}", f"school:{school['id']}")
         
         # Update user role to teacher (if not already)
         if teacher_user["role"] != "teacher":
@@ -2613,6 +3569,8 @@ async def approve_teacher(
             {"id": teacher_id},
             {"$set": {"is_approved": True}}
         )
+        invalidate_school_analytics(school["id"])
+        invalidate_dashboards(f"school:{school['id']}")
         
         return {"message": "Teacher approved successfully"}
     
@@ -2624,6 +3582,344 @@ async def approve_teacher(
 
 # QUIZ SYSTEM ENDPOINTS
 
+QUIZ_KEY_CACHE_SECONDS = 3600
+MAX_BATCH_GRADE_ATTEMPTS = 5000
+MAX_SYNC_ATTEMPTS = 500
+
+ANSWER_MISSING = -1
+ANSWER_UNKNOWN = -2
+
+class CompiledAnswerKey:
+    """A quiz's answer key reduced to integer codes so attempts can be graded as arrays"""
+
+    def __init__(self, quiz: dict):
+        self.quiz_id = quiz["id"]
+        self.version = quiz.get("version", 1)
+        self.passing_score = quiz["passing_score"]
+        self.vocabularies = []
+        self.lookups = []
+        key = []
+        for question in quiz["questions"]:
+            options = list(question.get("options") or [])
+            correct = question.get("correct_answer")
+            # Quizzes from the manager dashboard key answers by option index, older ones by option text
+            if isinstance(correct, int) and not isinstance(correct, bool) and 0 <= correct < len(options) \
+                    and correct not in options:
+                vocabulary = list(range(len(options)))
+            else:
+                vocabulary = options if correct in options else options + [correct]
+            lookup = {}
+            for code, value in enumerate(vocabulary):
+                try:
+                    lookup.setdefault(value, code)
+                except TypeError:
+                    pass
+            lookup.setdefault(None, ANSWER_MISSING)
+            self.vocabularies.append(vocabulary)
+            self.lookups.append(lookup)
+            key.append(vocabulary.index(correct))
+        self.key = np.array(key, dtype=np.int16)
+        self.question_count = len(key)
+
+    @staticmethod
+    def _encode_value(lookup: dict, value) -> int:
+        try:
+            return lookup.get(value, ANSWER_UNKNOWN)
+        except TypeError:
+            return ANSWER_UNKNOWN
+
+    def encode_many(self, answer_sets: List[dict]) -> np.ndarray:
+        """Map raw answers dicts ({"0": value, ...}) onto an (attempts x questions) code matrix"""
+        fields = [(str(i), lookup.get) for i, lookup in enumerate(self.lookups)]
+        flat = []
+        try:
+            # One flat list converted once is much cheaper than filling the array cell by cell
+            for answers in answer_sets:
+                get_answer = answers.get
+                flat.extend([get(get_answer(field), ANSWER_UNKNOWN) for field, get in fields])
+        except TypeError:
+            flat = [
+                self._encode_value(lookup, answers.get(str(i)))
+                for answers in answer_sets
+                for i, lookup in enumerate(self.lookups)
+            ]
+        return np.array(flat, dtype=np.int16).reshape(len(answer_sets), self.question_count)
+
+    def encode(self, answers: dict) -> np.ndarray:
+        return self.encode_many([answers])[0]
+
+    def grade(self, codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Grade a (attempts x questions) code matrix, returning correctness, scores and pass flags"""
+        correct = codes == self.key
+        correct_counts = correct.sum(axis=1)
+        if self.question_count:
+            scores = correct_counts * (100.0 / self.question_count)
+        else:
+            scores = np.zeros(len(codes))
+        return correct, scores, scores >= self.passing_score
+
+quiz_key_cache = TTLCache(QUIZ_KEY_CACHE_SECONDS, max_entries=2000)
+
+QUIZ_CATALOG_CACHE_SECONDS = 300
+QUIZ_CATALOG_VIEWS = ("full", "list")
+QUIZ_HIDDEN_QUESTION_FIELDS = ("correct_answer", "explanation")
+
+quiz_catalog_cache = TTLCache(QUIZ_CATALOG_CACHE_SECONDS, max_entries=500)
+quiz_catalog_version = 0
+
+def invalidate_quiz_catalog():
+    """Bump the catalog version so every cached listing is rebuilt on next read"""
+    global quiz_catalog_version
+    quiz_catalog_version += 1
+    quiz_catalog_cache.clear()
+
+def strip_quiz_answers(quiz: dict) -> dict:
+    """Remove answer keys so the catalog can be sent to students"""
+    questions = quiz.get("questions") or []
+    quiz["question_count"] = len(questions)
+    quiz["questions"] = [
+        {field: value for field, value in question.items() if field not in QUIZ_HIDDEN_QUESTION_FIELDS}
+        for question in questions
+    ]
+    return quiz
+
+async def get_quiz_catalog_payload(course_type: Optional[str], difficulty: Optional[str], view: str) -> dict:
+    """Return {"json": bytes, "gzip": bytes} for a catalog listing, building it at most once per version"""
+    cache_key = (course_type, difficulty, view)
+    cached = quiz_catalog_cache.get(cache_key)
+    if cached and cached["version"] == quiz_catalog_version:
+        return cached
+    
+    version = quiz_catalog_version
+    query = {"is_active": True}
+    if course_type:
+        query["course_type"] = course_type
+    if difficulty:
+        query["difficulty"] = difficulty
+    
+    if view == "list":
+        # Count questions in the database instead of shipping them over the wire
+        quizzes = await db.quizzes.aggregate([
+            {"$match": query},
+            {"$sort": {"created_at": -1}},
+            {"$addFields": {"question_count": {"$size": {"$ifNull": ["$questions", []]}}}},
+            {"$project": {"_id": 0, "questions": 0}}
+        ]).to_list(length=None)
+    else:
+        quizzes = await db.quizzes.find(query, {"_id": 0}).sort("created_at", -1).to_list(length=None)
+        quizzes = [strip_quiz_answers(quiz) for quiz in quizzes]
+    
+    body = json.dumps(serialize_doc(quizzes), separators=(",", ":")).encode()
+    payload = {
+        "version": version,
+        "json": body,
+        "gzip": gzip.compress(body, compresslevel=6)
+    }
+    quiz_catalog_cache.set(cache_key, payload)
+    return payload
+
+ITEM_STATS_REBUILD_BATCH_SIZE = 5000
+
+def item_stats_key(answer_key: CompiledAnswerKey) -> str:
+    return f"{answer_key.quiz_id}:{answer_key.version}"
+
+def item_stats_increments(answer_key: CompiledAnswerKey, codes: np.ndarray, correct: np.ndarray) -> Dict[str, int]:
+    """Sufficient statistics for item analysis, as $inc-able counters"""
+    totals = correct.sum(axis=1).astype(np.int64)
+    increments = {
+        "attempts": int(len(codes)),
+        "score_sum": int(totals.sum()),
+        "score_sq_sum": int((totals * totals).sum())
+    }
+    correct_counts = correct.sum(axis=0)
+    correct_score_sums = correct.T.astype(np.int64) @ totals
+    for j in range(answer_key.question_count):
+        prefix = f"items.{j}"
+        increments[f"{prefix}.correct"] = int(correct_counts[j])
+        increments[f"{prefix}.correct_score_sum"] = int(correct_score_sums[j])
+        # Codes start at ANSWER_UNKNOWN (-2), so shift them to bincount
+        counts = np.bincount(codes[:, j] - ANSWER_UNKNOWN, minlength=len(answer_key.vocabularies[j]) + 2)
+        increments[f"{prefix}.other"] = int(counts[0])
+        increments[f"{prefix}.skipped"] = int(counts[1])
+        for code in np.flatnonzero(counts[2:]):
+            increments[f"{prefix}.choices.{code}"] = int(counts[code + 2])
+    return {field: value for field, value in increments.items() if value}
+
+async def record_item_stats(answer_key: CompiledAnswerKey, codes: np.ndarray, correct: np.ndarray):
+    """Fold newly graded attempts into the quiz's rollup with a single atomic $inc"""
+    if not len(codes):
+        return
+    try:
+        await db.quiz_item_stats.update_one(
+            {"_id": item_stats_key(answer_key)},
+            {
+                "$inc": item_stats_increments(answer_key, codes, correct),
+                "$set": {"quiz_id": answer_key.quiz_id, "version": answer_key.version, "updated_at": datetime.utcnow()}
+            },
+            upsert=True
+        )
+    except Exception as e:
+        # Stats are derived data and can be rebuilt; never fail the attempt over them
+        logger.error(f"Record item stats error: {str(e)}")
+
+def describe_item_stats(answer_key: CompiledAnswerKey, stats: Optional[dict]) -> dict:
+    """Turn stored counters into per-question correct rate, distractor counts and point-biserial"""
+    stats = stats or {}
+    n = stats.get("attempts", 0)
+    score_sum = stats.get("score_sum", 0)
+    mean = score_sum / n if n else 0.0
+    variance = stats.get("score_sq_sum", 0) / n - mean * mean if n else 0.0
+    std = variance ** 0.5 if variance > 0 else 0.0
+    
+    items = []
+    for j in range(answer_key.question_count):
+        item = (stats.get("items") or {}).get(str(j), {})
+        n_correct = item.get("correct", 0)
+        n_wrong = n - n_correct
+        point_biserial = None
+        if std and n_correct and n_wrong:
+            # Uncorrected point-biserial: the item's own point is part of the total score
+            mean_correct = item.get("correct_score_sum", 0) / n_correct
+            mean_wrong = (score_sum - item.get("correct_score_sum", 0)) / n_wrong
+            p = n_correct / n
+            point_biserial = round((mean_correct - mean_wrong) / std * (p * (1 - p)) ** 0.5, 4)
+        
+        choices = item.get("choices") or {}
+        vocabulary = answer_key.vocabularies[j]
+        items.append({
+            "question_index": j,
+            "correct_rate": round(n_correct / n, 4) if n else None,
+            "point_biserial": point_biserial,
+            "choices": [
+                {"answer": value, "count": choices.get(str(code), 0), "is_correct": code == int(answer_key.key[j])}
+                for code, value in enumerate(vocabulary)
+            ],
+            "skipped": item.get("skipped", 0),
+            "other": item.get("other", 0)
+        })
+    
+    return {
+        "quiz_id": answer_key.quiz_id,
+        "version": answer_key.version,
+        "attempts": n,
+        "mean_correct": round(mean, 4),
+        "items": items,
+        "updated_at": stats.get("updated_at")
+    }
+
+ATTEMPT_CODES_HEADER = struct.Struct("<BH")  # bits per answer, question count
+MAX_PACKED_QUESTIONS = 0xFFFF
+# Codes are stored shifted by -ANSWER_UNKNOWN in one byte; a key whose correct answer is not
+# among the options adds one more code
+MAX_PACKED_OPTIONS = 0xFF + ANSWER_UNKNOWN
+
+def quiz_packing_error(questions: List[dict]) -> Optional[str]:
+    """Why attempts at this quiz could not be stored packed, or None if they can"""
+    if len(questions) > MAX_PACKED_QUESTIONS:
+        return f"A quiz can have at most {MAX_PACKED_QUESTIONS} questions"
+    for i, question in enumerate(questions):
+        if len(question.get("options") or []) > MAX_PACKED_OPTIONS:
+            return f"Question {i + 1} has more than {MAX_PACKED_OPTIONS} options"
+    return None
+
+def pack_answer_codes(codes: np.ndarray) -> bytes:
+    """Pack one attempt's answer codes into nibbles (or bytes for quizzes with very long option lists)"""
+    shifted = codes.astype(np.int16) - ANSWER_UNKNOWN
+    if len(shifted) > 0xFFFF:
+        raise ValueError(f"Cannot pack {len(shifted)} answers, the header allows at most {0xFFFF}")
+    if len(shifted) and (shifted.min() < 0 or shifted.max() > 0xFF):
+        raise ValueError("Answer codes do not fit in a byte; the quiz has too many options to pack")
+    shifted = shifted.astype(np.uint8)
+    if len(shifted) and shifted.max() > 0x0F:
+        return ATTEMPT_CODES_HEADER.pack(8, len(shifted)) + shifted.tobytes()
+    if len(shifted) % 2:
+        shifted = np.append(shifted, np.uint8(0))
+    packed = (shifted[0::2] << 4) | shifted[1::2]
+    return ATTEMPT_CODES_HEADER.pack(4, len(codes)) + packed.tobytes()
+
+def unpack_answer_codes(blob: bytes) -> np.ndarray:
+    bits, count = ATTEMPT_CODES_HEADER.unpack_from(blob)
+    body = np.frombuffer(blob, dtype=np.uint8, offset=ATTEMPT_CODES_HEADER.size)
+    if bits == 4:
+        body = np.stack([body >> 4, body & 0x0F], axis=1).reshape(-1)
+    return body[:count].astype(np.int16) + ANSWER_UNKNOWN
+
+def pack_correct_bitmap(correct: np.ndarray) -> bytes:
+    return np.packbits(correct.astype(bool)).tobytes()
+
+def unpack_correct_bitmap(blob: bytes, question_count: int) -> np.ndarray:
+    return np.unpackbits(np.frombuffer(blob, dtype=np.uint8), count=question_count).astype(bool)
+
+def compact_attempt_fields(answer_key: CompiledAnswerKey, answers: dict, codes: np.ndarray, correct: np.ndarray) -> dict:
+    """Stored form of an attempt's answers: packed codes, correctness bitmap and any unmatched raw values"""
+    try:
+        answer_codes = pack_answer_codes(codes)
+    except ValueError:
+        # Quizzes created before quiz_packing_error was enforced can be too large to pack; keep them raw
+        return {"quiz_version": answer_key.version, "answers": answers}
+    fields = {
+        "quiz_version": answer_key.version,
+        "answer_codes": answer_codes,
+        "correct_bitmap": pack_correct_bitmap(correct)
+    }
+    unknown = np.flatnonzero(codes == ANSWER_UNKNOWN)
+    if len(unknown):
+        fields["other_answers"] = {str(i): answers.get(str(i)) for i in unknown}
+    return fields
+
+def attempt_answer_codes(attempt: dict, answer_key: CompiledAnswerKey) -> Optional[np.ndarray]:
+    """Codes for a stored attempt without rebuilding its answers dict; None if they can't be trusted"""
+    if "answer_codes" in attempt:
+        if attempt.get("quiz_version", 1) != answer_key.version:
+            return None
+        return unpack_answer_codes(attempt["answer_codes"])
+    return answer_key.encode(attempt.get("answers") or {})
+
+def decode_attempt_answers(attempt: dict, answer_key: CompiledAnswerKey) -> dict:
+    """Rebuild the original answers dict, only when a caller actually needs it"""
+    if "answer_codes" not in attempt:
+        return attempt.get("answers") or {}
+    codes = attempt_answer_codes(attempt, answer_key)
+    if codes is None:
+        raise ValueError("Attempt was recorded against a different quiz version")
+    answers = {
+        str(i): answer_key.vocabularies[i][code]
+        for i, code in enumerate(codes.tolist())
+        if code >= 0
+    }
+    answers.update(attempt.get("other_answers") or {})
+    return answers
+
+def expand_dotted_fields(flat: Dict[str, int]) -> dict:
+    expanded = {}
+    for path, value in flat.items():
+        node = expanded
+        *parents, leaf = path.split(".")
+        for part in parents:
+            node = node.setdefault(part, {})
+        node[leaf] = value
+    return expanded
+
+async def get_compiled_answer_key(quiz_id: str) -> Optional[CompiledAnswerKey]:
+    """Return the active quiz's compiled key, loading the questions only on a cache miss"""
+    meta = await db.quizzes.find_one(
+        {"id": quiz_id, "is_active": True},
+        {"_id": 0, "version": 1}
+    )
+    if not meta:
+        return None
+    
+    cache_key = (quiz_id, meta.get("version", 1))
+    compiled = quiz_key_cache.get(cache_key)
+    if compiled is None:
+        quiz = await db.quizzes.find_one(
+            {"id": quiz_id},
+            {"_id": 0, "id": 1, "version": 1, "passing_score": 1, "questions.options": 1, "questions.correct_answer": 1}
+        )
+        compiled = CompiledAnswerKey(quiz)
+        quiz_key_cache.set(cache_key, compiled)
+    return compiled
+
 @api_router.post("/quizzes")
 async def create_quiz(
     quiz_data: QuizCreate,
@@ -2633,6 +3929,10 @@ async def create_quiz(
         if current_user["role"] != "manager":
             raise HTTPException(status_code=403, detail="Only managers can create quizzes")
         
+        packing_error = quiz_packing_error(quiz_data.questions)
+        if packing_error:
+            raise HTTPException(status_code=400, detail=packing_error)
+        
         # Create quiz
         quiz_id = str(uuid.uuid4())
         quiz_doc = {
@@ -2644,12 +3944,14 @@ async def create_quiz(
             "questions": quiz_data.questions,
             "passing_score": quiz_data.passing_score,
             "time_limit_minutes": quiz_data.time_limit_minutes,
+            "version": 1,
             "is_active": True,
             "created_by": current_user["id"],
             "created_at": datetime.utcnow()
         }
         
         await db.quizzes.insert_one(quiz_doc)
+        invalidate_quiz_catalog()
         
         return {"quiz_id": quiz_id, "message": "Quiz created successfully"}
     
@@ -2661,22 +3963,23 @@ async def create_quiz(
 
 @api_router.get("/quizzes")
 async def get_quizzes(
+    request: Request,
     course_type: str = None,
     difficulty: str = None,
+    view: str = "full",
     current_user = Depends(get_current_user)
 ):
     try:
-        query = {"is_active": True}
+        if view not in QUIZ_CATALOG_VIEWS:
+            raise HTTPException(status_code=400, detail=f"view must be one of: {', '.join(QUIZ_CATALOG_VIEWS)}")
         
-        if course_type:
-            query["course_type"] = course_type
-        if difficulty:
-            query["difficulty"] = difficulty
+        payload = await get_quiz_catalog_payload(course_type, difficulty, view)
         
-        quizzes_cursor = db.quizzes.find(query)
-        quizzes = await quizzes_cursor.to_list(length=None)
-        
-        return serialize_doc(quizzes)
+        headers = {"Vary": "Accept-Encoding", "Cache-Control": "private, max-age=60"}
+        if "gzip" in request.headers.get("accept-encoding", ""):
+            headers["Content-Encoding"] = "gzip"
+            return Response(content=payload["gzip"], media_type="application/json", headers=headers)
+        return Response(content=payload["json"], media_type="application/json", headers=headers)
     
     except Exception as e:
         logger.error(f"Get quizzes error: {str(e)}")
@@ -2694,23 +3997,17 @@ async def take_quiz(
         if current_user["role"] != "student":
             raise HTTPException(status_code=403, detail="Only students can take quizzes")
         
-        # Get quiz
-        quiz = await db.quizzes.find_one({"id": quiz_id, "is_active": True})
-        if not quiz:
+        answer_key = await get_compiled_answer_key(quiz_id)
+        if not answer_key:
             raise HTTPException(status_code=404, detail="Quiz not found")
         
         # Calculate score
-        total_questions = len(quiz["questions"])
-        correct_answers = 0
-        
-        for i, question in enumerate(quiz["questions"]):
-            student_answer = answers.get(str(i))
-            correct_answer = question["correct_answer"]
-            if student_answer == correct_answer:
-                correct_answers += 1
-        
-        score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
-        passed = score >= quiz["passing_score"]
+        codes = answer_key.encode(answers)[np.newaxis, :]
+        correct, scores, passed_flags = answer_key.grade(codes)
+        total_questions = answer_key.question_count
+        correct_answers = int(correct[0].sum())
+        score = float(scores[0])
+        passed = bool(passed_flags[0])
         
         # Save attempt
         attempt_id = str(uuid.uuid4())
@@ -2718,15 +4015,14 @@ async def take_quiz(
             "id": attempt_id,
             "quiz_id": quiz_id,
             "student_id": current_user["id"],
-            "answers": answers,
+            **compact_attempt_fields(answer_key, answers, codes[0], correct[0]),
             "score": score,
             "passed": passed,
-            "started_at": datetime.utcnow(),
-            "completed_at": datetime.utcnow(),
-            "time_taken_minutes": 0  # Would be calculated in real implementation
+            "completed_at": datetime.utcnow()
         }
         
         await db.quiz_attempts.insert_one(attempt_doc)
+        await record_item_stats(answer_key, codes, correct)
         
         return {
             "attempt_id": attempt_id,
@@ -2742,44 +4038,411 @@ async def take_quiz(
             raise e
         raise HTTPException(status_code=500, detail="Failed to take quiz")
 
-# Daily.co API integration
-async def create_daily_room(room_name: str, duration_hours: int = 24) -> dict:
-    """Create a room using Daily.co API"""
-    if not DAILY_API_KEY:
-        # Fallback to simple URL if no API key
-        return {
-            "name": room_name,
-            "url": f"https://daily.co/{room_name}",
-            "id": room_name
-        }
-    
+@api_router.post("/quizzes/{quiz_id}/grade-batch")
+async def grade_quiz_batch(
+    quiz_id: str,
+    batch: QuizBatchGradeRequest,
+    current_user = Depends(get_current_user)
+):
+    """Grade many attempts at once, e.g. a whole class sitting a mock exam"""
     try:
-        headers = {
-            "Authorization": f"Bearer {DAILY_API_KEY}",
-            "Content-Type": "application/json"
-        }
+        if current_user["role"] not in ["manager", "teacher"]:
+            raise HTTPException(status_code=403, detail="Only managers and teachers can grade quiz batches")
+        if len(batch.attempts) > MAX_BATCH_GRADE_ATTEMPTS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_GRADE_ATTEMPTS} attempts per batch")
         
-        # Calculate expiry time
-        expiry_time = int((datetime.utcnow() + timedelta(hours=duration_hours)).timestamp())
+        answer_key = await get_compiled_answer_key(quiz_id)
+        if not answer_key:
+            raise HTTPException(status_code=404, detail="Quiz not found")
         
-        room_config = {
-            "name": room_name,
-            "properties": {
-                "exp": expiry_time,
-                "eject_at_room_exp": True,
-                "enable_chat": True,
-                "start_audio_off": True,
-                "start_video_off": True,
-                "enable_screenshare": True,
-                "max_participants": 10
-            }
-        }
+        codes = answer_key.encode_many([attempt.answers for attempt in batch.attempts])
+        correct, scores, passed = answer_key.grade(codes)
+        correct_counts = correct.sum(axis=1)
         
-        response = requests.post(
-            f"{DAILY_API_URL}/rooms",
-            headers=headers,
-            json=room_config
-        )
+        results = [
+            {
+                "student_id": attempt.student_id,
+                "score": float(scores[i]),
+                "passed": bool(passed[i]),
+                "correct_answers": int(correct_counts[i]),
+                "total_questions": answer_key.question_count
+            }
+            for i, attempt in enumerate(batch.attempts)
+        ]
+        
+        recorded = 0
+        if batch.record:
+            student_ids = {attempt.student_id for attempt in batch.attempts if attempt.student_id}
+            known_students = {
+                user["id"] for user in await db.users.find(
+                    {"id": {"$in": list(student_ids)}, "role": "student"},
+                    {"_id": 0, "id": 1}
+                ).to_list(length=None)
+            }
+            now = datetime.utcnow()
+            attempt_docs = []
+            for i, (attempt, result) in enumerate(zip(batch.attempts, results)):
+                if attempt.student_id not in known_students:
+                    result["recorded"] = False
+                    continue
+                attempt_id = str(uuid.uuid4())
+                attempt_docs.append({
+                    "id": attempt_id,
+                    "quiz_id": quiz_id,
+                    "student_id": attempt.student_id,
+                    **compact_attempt_fields(answer_key, attempt.answers, codes[i], correct[i]),
+                    "score": result["score"],
+                    "passed": result["passed"],
+                    "completed_at": now,
+                    "graded_by": current_user["id"]
+                })
+                result["attempt_id"] = attempt_id
+                result["recorded"] = True
+            if attempt_docs:
+                await db.quiz_attempts.insert_many(attempt_docs)
+                stored_rows = [i for i, result in enumerate(results) if result["recorded"]]
+                await record_item_stats(answer_key, codes[stored_rows], correct[stored_rows])
+            recorded = len(attempt_docs)
+        
+        return {
+            "quiz_id": quiz_id,
+            "graded": len(results),
+            "recorded": recorded,
+            "average_score": float(scores.mean()) if len(results) else 0,
+            "pass_rate": float(passed.mean()) * 100 if len(results) else 0,
+            "results": results
+        }
+    
+    except Exception as e:
+        logger.error(f"Grade quiz batch error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to grade quiz batch")
+
+@api_router.post("/quizzes/attempts/sync")
+async def sync_offline_quiz_attempts(
+    sync_data: QuizAttemptSyncRequest,
+    current_user = Depends(get_current_user)
+):
+    """Ingest attempts taken offline; replaying the same batch is safe"""
+    try:
+        if current_user["role"] != "student":
+            raise HTTPException(status_code=403, detail="Only students can sync quiz attempts")
+        if len(sync_data.attempts) > MAX_SYNC_ATTEMPTS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_SYNC_ATTEMPTS} attempts per sync")
+        
+        student_id = current_user["id"]
+        now = datetime.utcnow()
+        results = {}
+        unidentified = []
+        pending = []
+        for index, attempt in enumerate(sync_data.attempts):
+            client_id = attempt.client_attempt_id.strip()
+            if not client_id:
+                # Without an id the attempt can't be deduplicated; point the client at it by position
+                unidentified.append({
+                    "client_attempt_id": attempt.client_attempt_id,
+                    "index": index,
+                    "status": "rejected",
+                    "detail": "client_attempt_id is required"
+                })
+                continue
+            if client_id in results:
+                continue  # Same attempt twice in one batch
+            results[client_id] = {"client_attempt_id": client_id, "status": "pending"}
+            pending.append(attempt)
+        
+        async def report_existing(client_ids: List[str]):
+            existing_cursor = db.quiz_attempts.find(
+                {"student_id": student_id, "client_attempt_id": {"$in": client_ids}},
+                {"_id": 0, "id": 1, "client_attempt_id": 1, "score": 1, "passed": 1}
+            )
+            async for existing in existing_cursor:
+                results[existing["client_attempt_id"]].update({
+                    "status": "duplicate",
+                    "attempt_id": existing["id"],
+                    "score": existing["score"],
+                    "passed": existing["passed"]
+                })
+        
+        # Attempts a previous (possibly interrupted) sync already stored
+        await report_existing(list(results))
+        pending = [attempt for attempt in pending if results[attempt.client_attempt_id.strip()]["status"] == "pending"]
+        
+        by_quiz = {}
+        for attempt in pending:
+            by_quiz.setdefault(attempt.quiz_id, []).append(attempt)
+        quiz_ids = list(by_quiz)
+        answer_keys = dict(zip(quiz_ids, await asyncio.gather(*(get_compiled_answer_key(quiz_id) for quiz_id in quiz_ids))))
+        
+        attempt_docs = []
+        graded = []
+        for quiz_id, attempts in by_quiz.items():
+            answer_key = answer_keys[quiz_id]
+            if not answer_key:
+                for attempt in attempts:
+                    results[attempt.client_attempt_id.strip()].update({"status": "rejected", "detail": "Quiz not found"})
+                continue
+            
+            codes = answer_key.encode_many([attempt.answers for attempt in attempts])
+            correct, scores, passed = answer_key.grade(codes)
+            graded.append((answer_key, attempts, codes, correct))
+            correct_counts = correct.sum(axis=1)
+            for i, attempt in enumerate(attempts):
+                client_id = attempt.client_attempt_id.strip()
+                try:
+                    completed_at = min(parse_utc_datetime(attempt.completed_at), now) if attempt.completed_at else now
+                    started_at = min(parse_utc_datetime(attempt.started_at), completed_at) if attempt.started_at else completed_at
+                except ValueError:
+                    results[client_id].update({"status": "rejected", "detail": "Invalid timestamp"})
+                    continue
+                
+                attempt_id = str(uuid.uuid4())
+                attempt_doc = {
+                    "id": attempt_id,
+                    "client_attempt_id": client_id,
+                    "quiz_id": quiz_id,
+                    "student_id": student_id,
+                    **compact_attempt_fields(answer_key, attempt.answers, codes[i], correct[i]),
+                    "score": float(scores[i]),
+                    "passed": bool(passed[i]),
+                    "completed_at": completed_at,
+                    "synced_at": now
+                }
+                if started_at != completed_at:
+                    attempt_doc["started_at"] = started_at
+                if attempt.time_taken_seconds:
+                    attempt_doc["time_taken_minutes"] = attempt.time_taken_seconds // 60
+                attempt_docs.append(attempt_doc)
+                results[client_id].update({
+                    "status": "created",
+                    "attempt_id": attempt_id,
+                    "score": float(scores[i]),
+                    "passed": bool(passed[i]),
+                    "correct_answers": int(correct_counts[i]),
+                    "total_questions": answer_key.question_count
+                })
+        
+        if attempt_docs:
+            try:
+                await db.quiz_attempts.insert_many(attempt_docs, ordered=False)
+            except BulkWriteError as e:
+                # A concurrent retry may have stored some of these first; report those as duplicates
+                raced = []
+                for error in e.details.get("writeErrors", []):
+                    client_id = attempt_docs[error["index"]]["client_attempt_id"]
+                    results[client_id] = {"client_attempt_id": client_id, "status": "failed", "detail": "Could not store attempt"}
+                    if error.get("code") == 11000:
+                        raced.append(client_id)
+                if raced:
+                    await report_existing(raced)
+        
+        for answer_key, attempts, codes, correct in graded:
+            stored_rows = [
+                i for i, attempt in enumerate(attempts)
+                if results[attempt.client_attempt_id.strip()]["status"] == "created"
+            ]
+            await record_item_stats(answer_key, codes[stored_rows], correct[stored_rows])
+        
+        items = list(results.values()) + unidentified
+        return {
+            "created": sum(1 for item in items if item["status"] == "created"),
+            "duplicates": sum(1 for item in items if item["status"] == "duplicate"),
+            "rejected": sum(1 for item in items if item["status"] in ["rejected", "failed"]),
+            "results": items
+        }
+    
+    except Exception as e:
+        logger.error(f"Sync quiz attempts error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to sync quiz attempts")
+
+@api_router.get("/quizzes/{quiz_id}/item-stats")
+async def get_quiz_item_stats(quiz_id: str, current_user = Depends(get_current_user)):
+    try:
+        if current_user["role"] not in ["manager", "teacher"]:
+            raise HTTPException(status_code=403, detail="Only managers and teachers can view item statistics")
+        
+        answer_key = await get_compiled_answer_key(quiz_id)
+        if not answer_key:
+            raise HTTPException(status_code=404, detail="Quiz not found")
+        
+        stats = await db.quiz_item_stats.find_one({"_id": item_stats_key(answer_key)})
+        return serialize_doc(describe_item_stats(answer_key, stats))
+    
+    except Exception as e:
+        logger.error(f"Get quiz item stats error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to retrieve item statistics")
+
+@api_router.post("/quizzes/{quiz_id}/item-stats/rebuild")
+async def rebuild_quiz_item_stats(quiz_id: str, current_user = Depends(get_current_user)):
+    """Recompute the rollup from every stored attempt, grading in vectorized batches"""
+    try:
+        if current_user["role"] != "manager":
+            raise HTTPException(status_code=403, detail="Only managers can rebuild item statistics")
+        
+        answer_key = await get_compiled_answer_key(quiz_id)
+        if not answer_key:
+            raise HTTPException(status_code=404, detail="Quiz not found")
+        
+        totals = {}
+        
+        def accumulate(rows: List[np.ndarray]):
+            codes = np.stack(rows)
+            correct, _, _ = answer_key.grade(codes)
+            for field, value in item_stats_increments(answer_key, codes, correct).items():
+                totals[field] = totals.get(field, 0) + value
+        
+        batch = []
+        attempts_cursor = db.quiz_attempts.find(
+            {"quiz_id": quiz_id},
+            {"_id": 0, "answers": 1, "answer_codes": 1, "quiz_version": 1}
+        )
+        async for attempt in attempts_cursor.batch_size(ITEM_STATS_REBUILD_BATCH_SIZE):
+            codes = attempt_answer_codes(attempt, answer_key)
+            if codes is None or len(codes) != answer_key.question_count:
+                continue
+            batch.append(codes)
+            if len(batch) >= ITEM_STATS_REBUILD_BATCH_SIZE:
+                accumulate(batch)
+                batch = []
+        if batch:
+            accumulate(batch)
+        
+        stats_doc = expand_dotted_fields(totals)
+        stats_doc.update({"quiz_id": quiz_id, "version": answer_key.version, "updated_at": datetime.utcnow()})
+        await db.quiz_item_stats.replace_one({"_id": item_stats_key(answer_key)}, stats_doc, upsert=True)
+        
+        return serialize_doc(describe_item_stats(answer_key, stats_doc))
+    
+    except Exception as e:
+        logger.error(f"Rebuild quiz item stats error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to rebuild item statistics")
+
+QUIZ_ATTEMPT_MIGRATION_BATCH_SIZE = 1000
+
+async def migrate_quiz_attempts_to_compact(batch_size: int = QUIZ_ATTEMPT_MIGRATION_BATCH_SIZE) -> dict:
+    """Rewrite legacy attempts (raw answers dict) into the packed encoding and report the savings"""
+    from bson import encode as bson_encode
+    
+    report = {
+        "migrated": 0,
+        "skipped": 0,
+        "bytes_before": 0,
+        "bytes_after": 0,
+        "write_seconds": 0.0,
+        "decode_checks": 0,
+        "decode_seconds": 0.0
+    }
+    answer_keys = {}
+    started = time.perf_counter()
+    
+    async def flush(operations: List[UpdateOne]):
+        write_started = time.perf_counter()
+        await db.quiz_attempts.bulk_write(operations, ordered=False)
+        report["write_seconds"] += time.perf_counter() - write_started
+    
+    operations = []
+    attempts_cursor = db.quiz_attempts.find({"answers": {"$exists": True}}).batch_size(batch_size)
+    async for attempt in attempts_cursor:
+        quiz_id = attempt.get("quiz_id")
+        if quiz_id not in answer_keys:
+            answer_keys[quiz_id] = await get_compiled_answer_key(quiz_id)
+        answer_key = answer_keys[quiz_id]
+        if not answer_key:
+            report["skipped"] += 1  # Deleted or deactivated quiz, keep the raw answers
+            continue
+        
+        answers = attempt.get("answers") or {}
+        codes = answer_key.encode(answers)
+        correct, _, _ = answer_key.grade(codes[np.newaxis, :])
+        compact_fields = compact_attempt_fields(answer_key, answers, codes, correct[0])
+        if "answer_codes" not in compact_fields:
+            report["skipped"] += 1  # Too many options to pack, keep the raw answers
+            continue
+        
+        unset = {"answers": ""}
+        if attempt.get("started_at") == attempt.get("completed_at"):
+            unset["started_at"] = ""
+        if not attempt.get("time_taken_minutes"):
+            unset["time_taken_minutes"] = ""
+        
+        migrated = {key: value for key, value in attempt.items() if key not in unset}
+        migrated.update(compact_fields)
+        
+        # Round-trip check so a bad encoding never replaces the only copy of the answers. Keys the
+        # packed form can't hold (extra questions, non-index keys, explicit nulls) fail it and stay raw.
+        decode_started = time.perf_counter()
+        decoded = decode_attempt_answers(migrated, answer_key)
+        report["decode_seconds"] += time.perf_counter() - decode_started
+        report["decode_checks"] += 1
+        if decoded != answers:
+            report["skipped"] += 1
+            continue
+        
+        report["bytes_before"] += len(bson_encode(attempt))
+        report["bytes_after"] += len(bson_encode(migrated))
+        operations.append(UpdateOne({"_id": attempt["_id"]}, {"$set": compact_fields, "$unset": unset}))
+        report["migrated"] += 1
+        if len(operations) >= batch_size:
+            await flush(operations)
+            operations = []
+    
+    if operations:
+        await flush(operations)
+    
+    elapsed = time.perf_counter() - started
+    report["elapsed_seconds"] = round(elapsed, 3)
+    report["bytes_saved"] = report["bytes_before"] - report["bytes_after"]
+    report["size_ratio"] = round(report["bytes_after"] / report["bytes_before"], 3) if report["bytes_before"] else None
+    report["attempts_per_second"] = round(report["migrated"] / elapsed, 1) if elapsed else None
+    report["writes_per_second"] = round(report["migrated"] / report["write_seconds"], 1) if report["write_seconds"] else None
+    report["decodes_per_second"] = round(report["decode_checks"] / report["decode_seconds"], 1) if report["decode_seconds"] else None
+    return report
+
+# Daily.co API integration
+async def create_daily_room(room_name: str, duration_hours: int = 24) -> dict:
+    """Create a room using Daily.co API"""
+    if not DAILY_API_KEY:
+        # Fallback to simple URL if no API key
+        return {
+            "name": room_name,
+            "url": f"https://daily.co/{room_name}",
+            "id": room_name
+        }
+    
+    try:
+        headers = {
+            "Authorization": f"Bearer {DAILY_API_KEY}",
+            "Content-Type": "application/json"
+        }
+        
+        # Calculate expiry time
+        expiry_time = int((datetime.utcnow() + timedelta(hours=duration_hours)).timestamp())
+        
+        room_config = {
+            "name": room_name,
+            "properties": {
+                "exp": expiry_time,
+                "eject_at_room_exp": True,
+                "enable_chat": True,
+                "start_audio_off": True,
+                "start_video_off": True,
+                "enable_screenshare": True,
+                "max_participants": 10
+            }
+        }
+        
+        response = requests.post(
+            f"{DAILY_API_URL}/rooms",
+            headers=headers,
+            json=room_config
+        )
         
         if response.status_code == 200:
             return response.json()
@@ -2812,9 +4475,12 @@ async def delete_daily_room(room_name: str) -> bool:
             "Content-Type": "application/json"
         }
         
-        response = requests.delete(
+        # Run the blocking client off the event loop so the reaper can delete rooms concurrently
+        response = await asyncio.to_thread(
+            requests.delete,
             f"{DAILY_API_URL}/rooms/{room_name}",
-            headers=headers
+            headers=headers,
+            timeout=DAILY_API_TIMEOUT_SECONDS
         )
         
         return response.status_code in [200, 204, 404]  # 404 means already deleted
@@ -2823,6 +4489,67 @@ async def delete_daily_room(room_name: str) -> bool:
         logger.error(f"Error deleting Daily.co room: {str(e)}")
         return False
 
+def video_room_expired(room: dict, now: datetime) -> bool:
+    end = room["scheduled_at"] + timedelta(minutes=room.get("duration_minutes") or 60)
+    return end + timedelta(minutes=VIDEO_ROOM_GRACE_MINUTES) <= now
+
+async def reap_expired_video_rooms() -> int:
+    """Delete finished rooms upstream and deactivate them locally, returning how many were reaped"""
+    now = datetime.utcnow()
+    semaphore = asyncio.Semaphore(VIDEO_ROOM_DELETE_CONCURRENCY)
+    
+    async def delete_room(room: dict) -> bool:
+        async with semaphore:
+            return await delete_daily_room(room["room_name"])
+    
+    reaped = 0
+    last_room = None
+    while True:
+        # Nothing can have expired before its start time, so the (is_active, scheduled_at, id)
+        # index narrows candidates; the duration check happens per room
+        query = {"is_active": True, "scheduled_at": {"$lte": now - timedelta(minutes=VIDEO_ROOM_GRACE_MINUTES)}}
+        if last_room is not None:
+            # Keyset on (scheduled_at, id) so rooms left active are never revisited, however many share a start
+            query["$or"] = [
+                {"scheduled_at": {"$gt": last_room["scheduled_at"]}},
+                {"scheduled_at": last_room["scheduled_at"], "id": {"$gt": last_room["id"]}}
+            ]
+        candidates = await db.video_rooms.find(
+            query,
+            {"_id": 0, "id": 1, "room_name": 1, "scheduled_at": 1, "duration_minutes": 1}
+        ).sort([("scheduled_at", 1), ("id", 1)]).limit(VIDEO_ROOM_REAP_BATCH_SIZE).to_list(length=None)
+        if not candidates:
+            break
+        last_room = candidates[-1]
+        
+        expired = [room for room in candidates if video_room_expired(room, now)]
+        results = await asyncio.gather(*(delete_room(room) for room in expired))
+        deleted_ids = [room["id"] for room, deleted in zip(expired, results) if deleted]
+        
+        if deleted_ids:
+            result = await db.video_rooms.update_many(
+                {"id": {"$in": deleted_ids}, "is_active": True},
+                {"$set": {"is_active": False, "deactivated_at": now}}
+            )
+            reaped += result.modified_count
+        if len(deleted_ids) < len(expired):
+            logger.warning(f"Could not delete {len(expired) - len(deleted_ids)} Daily.co rooms, retrying next pass")
+        if len(candidates) < VIDEO_ROOM_REAP_BATCH_SIZE:
+            break
+    
+    return reaped
+
+async def video_room_reaper():
+    """Periodically clean up video rooms whose sessions are over"""
+    while True:
+        try:
+            reaped = await reap_expired_video_rooms()
+            if reaped:
+                logger.info(f"Reaped {reaped} expired video rooms")
+        except Exception as e:
+            logger.error(f"Video room reaper error: {str(e)}")
+        await asyncio.sleep(VIDEO_ROOM_REAP_INTERVAL_SECONDS)
+
 # VIDEO ROOM ENDPOINTS
 
 @api_router.post("/video-rooms")
@@ -2886,9 +4613,19 @@ async def create_video_room(
             raise e
         raise HTTPException(status_code=500, detail="Failed to create video room")
 
+VIDEO_ROOM_LIST_FIELDS = frozenset({
+    "id", "course_id", "teacher_id", "student_id", "room_url", "room_name", "scheduled_at",
+    "duration_minutes", "is_active", "student_name", "teacher_name", "created_at"
+})
+
 @api_router.get("/video-rooms/my")
-async def get_my_video_rooms(current_user = Depends(get_current_user)):
+async def get_my_video_rooms(
+    include_inactive: bool = False,
+    fields: Optional[str] = None,
+    current_user = Depends(get_current_user)
+):
     try:
+        selected = parse_fields_param(fields, VIDEO_ROOM_LIST_FIELDS)
         query = {}
         if current_user["role"] == "teacher":
             query["teacher_id"] = current_user["id"]
@@ -2897,10 +4634,19 @@ async def get_my_video_rooms(current_user = Depends(get_current_user)):
         else:
             raise HTTPException(status_code=403, detail="Only teachers and students can view video rooms")
         
-        rooms_cursor = db.video_rooms.find(query)
+        if not include_inactive:
+            query["is_active"] = True
+        
+        projection = fields_projection(selected, () if include_inactive else ("scheduled_at", "duration_minutes"))
+        rooms_cursor = db.video_rooms.find(query, projection).sort("scheduled_at", 1)
         rooms = await rooms_cursor.to_list(length=None)
         
-        return serialize_doc(rooms)
+        if not include_inactive:
+            # Hide rooms that are over but that the reaper hasn't reached yet
+            now = datetime.utcnow()
+            rooms = [room for room in rooms if not video_room_expired(room, now)]
+        
+        return serialize_doc(select_fields(rooms, selected))
     
     except Exception as e:
         logger.error(f"Get video rooms error: {str(e)}")
@@ -2908,6 +4654,184 @@ async def get_my_video_rooms(current_user = Depends(get_current_user)):
             raise e
         raise HTTPException(status_code=500, detail="Failed to retrieve video rooms")
 
+# TEACHER AVAILABILITY ENDPOINTS
+
+@api_router.put("/teachers/{teacher_id}/availability")
+async def update_teacher_availability(
+    teacher_id: str,
+    availability_data: TeacherAvailabilityUpdate,
+    current_user = Depends(get_current_user)
+):
+    try:
+        teacher = await db.teachers.find_one({"id": teacher_id})
+        if not teacher:
+            raise HTTPException(status_code=404, detail="Teacher not found")
+        
+        # Teachers edit their own hours; managers edit their school's teachers
+        if current_user["role"] == "teacher":
+            if teacher["user_id"] != current_user["id"]:
+                raise HTTPException(status_code=403, detail="Teachers can only edit their own availability")
+        elif current_user["role"] == "manager":
+            school = await db.driving_schools.find_one({
+                "id": teacher["driving_school_id"],
+                "manager_id": current_user["id"]
+            })
+            if not school:
+                raise HTTPException(status_code=403, detail="Unauthorized to edit this teacher's availability")
+        else:
+            raise HTTPException(status_code=403, detail="Only teachers and managers can edit availability")
+        
+        try:
+            weekly_hours = {}
+            for weekday, intervals in availability_data.weekly_hours.items():
+                if weekday not in {str(i) for i in range(7)}:
+                    raise ValueError(f"Invalid weekday {weekday}, use 0 (Monday) to 6 (Sunday)")
+                weekly_hours[weekday] = parse_clock_intervals(intervals)
+            exceptions = [
+                {
+                    "date": datetime.strptime(exception.date, "%Y-%m-%d").date().isoformat(),
+                    "intervals": parse_clock_intervals(exception.intervals)
+                }
+                for exception in availability_data.exceptions
+            ]
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid availability: {str(e)}")
+        
+        availability_doc = {
+            "teacher_id": teacher_id,
+            "driving_school_id": teacher["driving_school_id"],
+            "weekly_hours": weekly_hours,
+            "exceptions": sorted(exceptions, key=lambda exception: exception["date"]),
+            "updated_at": datetime.utcnow()
+        }
+        await db.teacher_availability.replace_one({"teacher_id": teacher_id}, availability_doc, upsert=True)
+        
+        return {"message": "Availability updated successfully", "availability": serialize_doc(availability_doc)}
+    
+    except Exception as e:
+        logger.error(f"Update teacher availability error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to update availability")
+
+@api_router.get("/teachers/{teacher_id}/availability")
+async def get_teacher_availability(teacher_id: str, current_user = Depends(get_current_user)):
+    try:
+        availability = await db.teacher_availability.find_one({"teacher_id": teacher_id}, {"_id": 0})
+        if not availability:
+            return {"teacher_id": teacher_id, "weekly_hours": DEFAULT_WEEKLY_HOURS, "exceptions": [], "is_default": True}
+        
+        return serialize_doc(availability)
+    
+    except Exception as e:
+        logger.error(f"Get teacher availability error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve availability")
+
+@api_router.get("/sessions/free-slots")
+async def find_free_slots(
+    school_id: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    duration_minutes: int = 60,
+    teacher_id: Optional[str] = None,
+    current_user = Depends(get_current_user)
+):
+    """Free time per teacher: availability minus booked sessions, for teachers who can teach this student"""
+    try:
+        try:
+            window_start = parse_utc_datetime(start) if start else datetime.utcnow()
+            window_end = parse_utc_datetime(end) if end else window_start + timedelta(days=7)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid start or end, use ISO format")
+        
+        if window_end <= window_start or window_end - window_start > timedelta(days=MAX_SLOT_SEARCH_DAYS):
+            raise HTTPException(status_code=400, detail=f"Search window must be positive and at most {MAX_SLOT_SEARCH_DAYS} days")
+        if not MIN_SESSION_DURATION_MINUTES <= duration_minutes <= MAX_SESSION_DURATION_MINUTES:
+            raise HTTPException(status_code=400, detail="Invalid session duration")
+        
+        teacher_query = {"driving_school_id": school_id, "is_approved": True}
+        if teacher_id:
+            teacher_query["id"] = teacher_id
+        teachers_cursor = db.teachers.find(
+            teacher_query,
+            {"_id": 0, "id": 1, "user_id": 1, "can_teach_male": 1, "can_teach_female": 1}
+        )
+        teachers = [
+            teacher for teacher in await teachers_cursor.to_list(length=None)
+            if teacher_accepts_student(teacher, current_user.get("gender"))
+        ]
+        if not teachers:
+            return {"teachers": [], "start": window_start, "end": window_end}
+        
+        teacher_ids = [teacher["id"] for teacher in teachers]
+        booked_window = {
+            "$gt": window_start - timedelta(minutes=MAX_SESSION_DURATION_MINUTES),
+            "$lt": window_end
+        }
+        
+        availability_docs, booked_sessions, users = await asyncio.gather(
+            db.teacher_availability.find({"teacher_id": {"$in": teacher_ids}}, {"_id": 0}).to_list(length=None),
+            db.sessions.find(
+                {
+                    "$or": [
+                        {"teacher_id": {"$in": teacher_ids}, "scheduled_at": booked_window},
+                        {"student_id": current_user["id"], "scheduled_at": booked_window}
+                    ],
+                    "status": {"$ne": SessionStatus.CANCELLED}
+                },
+                {"_id": 0, "teacher_id": 1, "student_id": 1, "scheduled_at": 1, "duration_minutes": 1}
+            ).to_list(length=None),
+            db.users.find(
+                {"id": {"$in": [teacher["user_id"] for teacher in teachers]}},
+                {"_id": 0, "id": 1, "first_name": 1, "last_name": 1}
+            ).to_list(length=None)
+        )
+        
+        availability_by_teacher = {doc["teacher_id"]: doc for doc in availability_docs}
+        names = {user["id"]: f"{user['first_name']} {user['last_name']}" for user in users}
+        
+        # The student's own bookings block every teacher
+        student_busy = []
+        busy_by_teacher = {}
+        for session in booked_sessions:
+            interval = (session["scheduled_at"], session_end(session))
+            if session["student_id"] == current_user["id"]:
+                student_busy.append(interval)
+            busy_by_teacher.setdefault(session["teacher_id"], []).append(interval)
+        
+        min_length = timedelta(minutes=duration_minutes)
+        default_available = None
+        results = []
+        for teacher in teachers:
+            availability = availability_by_teacher.get(teacher["id"])
+            if availability:
+                available = expand_availability(availability, window_start, window_end)
+            else:
+                # Teachers on default hours share one expansion
+                if default_available is None:
+                    default_available = expand_availability(None, window_start, window_end)
+                available = default_available
+            free = snap_to_session_grid(
+                subtract_intervals(available, busy_by_teacher.get(teacher["id"], []) + student_busy)
+            )
+            results.append({
+                "teacher_id": teacher["id"],
+                "teacher_name": names.get(teacher["user_id"], "Unknown"),
+                "free_slots": [
+                    {"start": slot_start, "end": slot_end}
+                    for slot_start, slot_end in free
+                    if slot_end - slot_start >= min_length
+                ]
+            })
+        
+        return serialize_doc({"teachers": results, "start": window_start, "end": window_end})
+    
+    except Exception as e:
+        logger.error(f"Find free slots error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to find free slots")
+
 # EXTERNAL EXPERT ENDPOINTS
 
 @api_router.post("/external-experts/register")
@@ -2935,6 +4859,8 @@ async def register_external_expert(
         }
         
         await db.external_experts.insert_one(expert_doc)
+        expert_directory_cache.clear()
+        invalidate_dashboards(f"user:{current_user['id']}")
         
         # Update user role
         await db.users.update_one(
@@ -2995,15 +4921,50 @@ async def schedule_session(
         if not teacher:
             raise HTTPException(status_code=404, detail="Teacher not found or not approved")
         
-        # Create session
+        try:
+            scheduled_at = parse_utc_datetime(session_data.scheduled_at)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid scheduled_at, use ISO format")
+        
+        if not MIN_SESSION_DURATION_MINUTES <= session_data.duration_minutes <= MAX_SESSION_DURATION_MINUTES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Session duration must be between {MIN_SESSION_DURATION_MINUTES} and {MAX_SESSION_DURATION_MINUTES} minutes"
+            )
+        grid_error = session_grid_error(scheduled_at, session_data.duration_minutes)
+        if grid_error:
+            raise HTTPException(status_code=400, detail=grid_error)
+        ends_at = scheduled_at + timedelta(minutes=session_data.duration_minutes)
+        
+        # Reject double bookings of the teacher or the student
+        conflicts = await find_session_conflicts(session_data.teacher_id, current_user["id"], [(scheduled_at, ends_at)])
+        if conflicts:
+            raise HTTPException(
+                status_code=409,
+                detail={"message": "Time slot conflicts with an existing session", "conflicts": serialize_doc(conflicts)}
+            )
+        
+        # Claim the slots; this arbitrates concurrent bookings that passed the check above
         session_id = str(uuid.uuid4())
+        clashed = await reserve_session_slots([{
+            "session_id": session_id,
+            "teacher_id": session_data.teacher_id,
+            "student_id": current_user["id"],
+            "start": scheduled_at,
+            "end": ends_at
+        }])
+        if clashed:
+            raise HTTPException(status_code=409, detail="Time slot was just booked by another session")
+        
+        # Create session
         session_doc = {
             "id": session_id,
             "course_id": session_data.course_id,
             "teacher_id": session_data.teacher_id,
             "student_id": current_user["id"],
+            "driving_school_id": teacher["driving_school_id"],
             "session_type": course["course_type"],
-            "scheduled_at": datetime.fromisoformat(session_data.scheduled_at),
+            "scheduled_at": scheduled_at,
             "duration_minutes": session_data.duration_minutes,
             "location": session_data.location,
             "status": SessionStatus.SCHEDULED,
@@ -3012,7 +4973,13 @@ async def schedule_session(
             "updated_at": datetime.utcnow()
         }
         
-        await db.sessions.insert_one(session_doc)
+        try:
+            await db.sessions.insert_one(session_doc)
+        except Exception:
+            await release_session_slots([session_id])
+            raise
+        invalidate_dashboards(f"teacher:{teacher['id']}")
+        await record_school_activity(teacher["driving_school_id"], scheduled_at, sessions_scheduled=1)
         
         return {"session_id": session_id, "message": "Session scheduled successfully"}
     
@@ -3022,9 +4989,139 @@ async def schedule_session(
             raise e
         raise HTTPException(status_code=500, detail="Failed to schedule session")
 
+@api_router.post("/sessions/schedule-series")
+async def schedule_session_series(
+    series_data: SessionSeriesCreate,
+    current_user = Depends(get_current_user)
+):
+    """Book a recurring series of sessions with one conflict query and bulk inserts"""
+    try:
+        if current_user["role"] != "student":
+            raise HTTPException(status_code=403, detail="Only students can schedule sessions")
+        
+        course = await db.courses.find_one({"id": series_data.course_id}, {"_id": 0, "course_type": 1})
+        if not course:
+            raise HTTPException(status_code=404, detail="Course not found")
+        
+        teacher = await db.teachers.find_one(
+            {"id": series_data.teacher_id, "is_approved": True},
+            {"_id": 0, "id": 1, "driving_school_id": 1}
+        )
+        if not teacher:
+            raise HTTPException(status_code=404, detail="Teacher not found or not approved")
+        
+        if not MIN_SESSION_DURATION_MINUTES <= series_data.duration_minutes <= MAX_SESSION_DURATION_MINUTES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Session duration must be between {MIN_SESSION_DURATION_MINUTES} and {MAX_SESSION_DURATION_MINUTES} minutes"
+            )
+        try:
+            series_start = parse_utc_datetime(series_data.start_at)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid start_at, use ISO format")
+        grid_error = session_grid_error(series_start, series_data.duration_minutes)
+        if grid_error:
+            raise HTTPException(status_code=400, detail=grid_error)
+        try:
+            occurrences = expand_recurrence(series_start, series_data.recurrence)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid recurrence: {str(e)}")
+        
+        duration = timedelta(minutes=series_data.duration_minutes)
+        intervals = [(start, start + duration) for start in occurrences]
+        
+        # One query validates every occurrence against existing bookings
+        conflicts = await find_session_conflicts(series_data.teacher_id, current_user["id"], intervals)
+        clashes = serialize_doc([
+            {**conflict, "occurrence": occurrences[conflict["index"]]} for conflict in conflicts
+        ])
+        if conflicts and not series_data.skip_conflicts:
+            raise HTTPException(status_code=409, detail={"message": "Series conflicts with existing sessions", "clashes": clashes})
+        
+        conflicted = {conflict["index"] for conflict in conflicts}
+        series_id = str(uuid.uuid4())
+        now = datetime.utcnow()
+        session_docs = [
+            {
+                "id": str(uuid.uuid4()),
+                "series_id": series_id,
+                "course_id": series_data.course_id,
+                "teacher_id": series_data.teacher_id,
+                "student_id": current_user["id"],
+                "driving_school_id": teacher["driving_school_id"],
+                "session_type": course["course_type"],
+                "scheduled_at": start,
+                "duration_minutes": series_data.duration_minutes,
+                "location": series_data.location,
+                "status": SessionStatus.SCHEDULED,
+                "notes": None,
+                "created_at": now,
+                "updated_at": now
+            }
+            for index, (start, _) in enumerate(intervals)
+            if index not in conflicted
+        ]
+        
+        # Claim all slots in one insert; occurrences that lose a race (or overlap each other) drop out
+        clashed_ids = await reserve_session_slots([
+            {
+                "session_id": doc["id"],
+                "teacher_id": doc["teacher_id"],
+                "student_id": doc["student_id"],
+                "start": doc["scheduled_at"],
+                "end": doc["scheduled_at"] + duration
+            }
+            for doc in session_docs
+        ]) if session_docs else set()
+        
+        if clashed_ids:
+            clashes += serialize_doc([
+                {"occurrence": doc["scheduled_at"], "conflict_with": "concurrent_booking"}
+                for doc in session_docs if doc["id"] in clashed_ids
+            ])
+            if not series_data.skip_conflicts:
+                await release_session_slots([doc["id"] for doc in session_docs])
+                raise HTTPException(status_code=409, detail={"message": "Series conflicts with existing sessions", "clashes": clashes})
+            session_docs = [doc for doc in session_docs if doc["id"] not in clashed_ids]
+        
+        if session_docs:
+            try:
+                await db.sessions.insert_many(session_docs)
+            except Exception:
+                await release_session_slots([doc["id"] for doc in session_docs])
+                raise
+            invalidate_dashboards(f"teacher:{teacher['id']}")
+            per_day = {}
+            for doc in session_docs:
+                first, count = per_day.get(rollup_day(doc["scheduled_at"]), (doc["scheduled_at"], 0))
+                per_day[rollup_day(doc["scheduled_at"])] = (first, count + 1)
+            for when, count in per_day.values():
+                await record_school_activity(teacher["driving_school_id"], when, sessions_scheduled=count)
+        
+        return {
+            "series_id": series_id,
+            "session_ids": [doc["id"] for doc in session_docs],
+            "scheduled": len(session_docs),
+            "requested": len(occurrences),
+            "clashes": clashes,
+            "message": f"Scheduled {len(session_docs)} of {len(occurrences)} sessions"
+        }
+    
+    except Exception as e:
+        logger.error(f"Schedule session series error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to schedule session series")
+
+SESSION_LIST_FIELDS = frozenset({
+    "id", "series_id", "course_id", "teacher_id", "student_id", "driving_school_id", "session_type",
+    "scheduled_at", "duration_minutes", "location", "status", "notes", "created_at", "updated_at"
+})
+
 @api_router.get("/sessions/my")
-async def get_my_sessions(current_user = Depends(get_current_user)):
+async def get_my_sessions(fields: Optional[str] = None, current_user = Depends(get_current_user)):
     try:
+        selected = parse_fields_param(fields, SESSION_LIST_FIELDS)
         query = {}
         if current_user["role"] == "student":
             query["student_id"] = current_user["id"]
@@ -3033,7 +5130,7 @@ async def get_my_sessions(current_user = Depends(get_current_user)):
         else:
             raise HTTPException(status_code=403, detail="Only students and teachers can view sessions")
         
-        sessions_cursor = db.sessions.find(query)
+        sessions_cursor = db.sessions.find(query, fields_projection(selected))
         sessions = await sessions_cursor.to_list(length=None)
         
         return serialize_doc(sessions)
@@ -3054,14 +5151,9 @@ async def complete_session(
         if current_user["role"] not in ["teacher", "manager"]:
             raise HTTPException(status_code=403, detail="Only teachers and managers can complete sessions")
         
-        # Get session
-        session = await db.sessions.find_one({"id": session_id})
-        if not session:
-            raise HTTPException(status_code=404, detail="Session not found")
-        
-        # Update session
-        await db.sessions.update_one(
-            {"id": session_id},
+        # Mark the session completed; the status guard makes double submissions a no-op
+        session = await db.sessions.find_one_and_update(
+            {"id": session_id, "status": {"$ne": SessionStatus.COMPLETED}},
             {
                 "$set": {
                     "status": SessionStatus.COMPLETED,
@@ -3070,33 +5162,21 @@ async def complete_session(
                 }
             }
         )
+        if not session:
+            if await db.sessions.count_documents({"id": session_id}, limit=1):
+                return {"message": "Session already completed"}
+            raise HTTPException(status_code=404, detail="Session not found")
+        
+        invalidate_dashboards(f"teacher:{session['teacher_id']}")
         
         # Update course progress
-        course = await db.courses.find_one({"id": session["course_id"]})
-        if course:
-            new_completed = course["completed_sessions"] + 1
-            await db.courses.update_one(
-                {"id": session["course_id"]},
-                {
-                    "$set": {
-                        "completed_sessions": new_completed,
-                        "updated_at": datetime.utcnow()
-                    }
-                }
-            )
-            
-            # Check if course is completed
-            if new_completed >= course["total_sessions"]:
-                await db.courses.update_one(
-                    {"id": session["course_id"]},
-                    {
-                        "$set": {
-                            "status": CourseStatus.COMPLETED,
-                            "exam_status": ExamStatus.AVAILABLE,
-                            "updated_at": datetime.utcnow()
-                        }
-                    }
-                )
+        await record_course_session_completed(session["course_id"])
+        
+        school_id = session.get("driving_school_id")
+        if not school_id:
+            teacher = await db.teachers.find_one({"id": session["teacher_id"]}, {"_id": 0, "driving_school_id": 1})
+            school_id = teacher["driving_school_id"] if teacher else None
+        await record_school_activity(school_id, session["scheduled_at"], sessions_completed=1)
         
         return {"message": "Session completed successfully"}
     
@@ -3125,18 +5205,25 @@ async def schedule_exam(
         if course["exam_status"] != ExamStatus.AVAILABLE:
             raise HTTPException(status_code=400, detail="Course is not ready for exam")
         
-        # Find available external expert
-        experts_cursor = db.external_experts.find({
-            "specialization": {"$in": [exam_data.exam_type]},
-            "is_available": True
-        })
-        experts = await experts_cursor.to_list(length=None)
-        
-        if not experts:
-            raise HTTPException(status_code=404, detail="No available external experts for this exam type")
+        try:
+            preferred_dates = [parse_utc_datetime(date) for date in exam_data.preferred_dates]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid preferred date, use ISO format")
+        preferred_dates = [date for date in preferred_dates if date > datetime.utcnow()]
+        if not preferred_dates:
+            raise HTTPException(status_code=400, detail="At least one future preferred date is required")
+        
+        # Exams take place in the state of the student's school
+        enrollment = await db.enrollments.find_one({"id": course["enrollment_id"]}, {"_id": 0, "driving_school_id": 1})
+        school = None
+        if enrollment:
+            school = await db.driving_schools.find_one({"id": enrollment["driving_school_id"]}, {"_id": 0, "id": 1, "state": 1})
+        state = school["state"] if school else current_user.get("state")
         
-        # Select first available expert (in real app, would have better logic)
-        expert = experts[0]
+        assignment = await assign_external_expert(exam_data.exam_type, state, preferred_dates)
+        if not assignment:
+            raise HTTPException(status_code=404, detail="No external expert available for this exam type on the preferred dates")
+        expert, scheduled_at = assignment
         
         # Create exam
         exam_id = str(uuid.uuid4())
@@ -3144,18 +5231,26 @@ async def schedule_exam(
             "id": exam_id,
             "course_id": exam_data.course_id,
             "student_id": current_user["id"],
+            "driving_school_id": school["id"] if school else None,
             "external_expert_id": expert["id"],
             "exam_type": exam_data.exam_type,
-            "scheduled_at": datetime.fromisoformat(exam_data.preferred_dates[0]),  # Use first preferred date
+            "scheduled_at": scheduled_at,
             "location": exam_data.location,
             "duration_minutes": 90,
             "status": ExamStatus.AVAILABLE,
             "score": None,
             "notes": None,
-            "created_at": datetime.utcnow()
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
         }
         
-        await db.exam_schedules.insert_one(exam_doc)
+        try:
+            await db.exam_schedules.insert_one(exam_doc)
+        except Exception:
+            await release_expert_capacity(expert["id"], scheduled_at.date().isoformat())
+            raise
+        invalidate_dashboards(f"expert:{expert['id']}")
+        await record_school_activity(exam_doc["driving_school_id"], scheduled_at, exams_scheduled=1)
         
         return {"exam_id": exam_id, "message": "Exam scheduled successfully"}
     
@@ -3165,9 +5260,15 @@ async def schedule_exam(
             raise e
         raise HTTPException(status_code=500, detail="Failed to schedule exam")
 
+EXAM_LIST_FIELDS = frozenset({
+    "id", "course_id", "student_id", "driving_school_id", "external_expert_id", "exam_type",
+    "scheduled_at", "location", "duration_minutes", "status", "score", "notes", "created_at", "updated_at"
+})
+
 @api_router.get("/exams/my")
-async def get_my_exams(current_user = Depends(get_current_user)):
+async def get_my_exams(fields: Optional[str] = None, current_user = Depends(get_current_user)):
     try:
+        selected = parse_fields_param(fields, EXAM_LIST_FIELDS)
         query = {}
         if current_user["role"] == "student":
             query["student_id"] = current_user["id"]
@@ -3178,7 +5279,7 @@ async def get_my_exams(current_user = Depends(get_current_user)):
         else:
             raise HTTPException(status_code=403, detail="Only students and external experts can view exams")
         
-        exams_cursor = db.exam_schedules.find(query)
+        exams_cursor = db.exam_schedules.find(query, fields_projection(selected))
         exams = await exams_cursor.to_list(length=None)
         
         return serialize_doc(exams)
@@ -3249,10 +5350,13 @@ async def complete_exam(
                 "$set": {
                     "status": ExamStatus.PASSED if passed else ExamStatus.FAILED,
                     "score": score,
-                    "notes": notes
+                    "notes": notes,
+                    "updated_at": datetime.utcnow()
                 }
             }
         )
+        await record_exam_result(exam, passed)
+        invalidate_dashboards(f"expert:{expert['id']}")
         
         # Update course exam status
         await db.courses.update_one(
@@ -3268,64 +5372,402 @@ async def complete_exam(
         
         # Update course availability for next course
         course = await db.courses.find_one({"id": exam["course_id"]})
+        if course:
+            invalidate_dashboards(f"enrollment:{course['enrollment_id']}")
         if course and passed:
             await update_course_availability(course["enrollment_id"])
         
         return {"message": "Exam completed successfully", "passed": passed}
     
     except Exception as e:
-        logger.error(f"Complete exam error: {str(e)}")
-        if isinstance(e, HTTPException):
-            raise e
-        raise HTTPException(status_code=500, detail="Failed to complete exam")
+        logger.error(f"Complete exam error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to complete exam")
+
+# CERTIFICATE ENDPOINTS
+
+CERTIFICATE_LIST_FIELDS = frozenset({
+    "id", "student_id", "student_name", "enrollment_id", "certificate_number", "issue_date",
+    "expiry_date", "status", "pdf_url", "verification_token", "qr_code", "created_at"
+})
+
+@api_router.get("/certificates/my")
+async def get_my_certificates(fields: Optional[str] = None, current_user = Depends(get_current_user)):
+    try:
+        if current_user["role"] != "student":
+            raise HTTPException(status_code=403, detail="Only students can view certificates")
+        
+        selected = parse_fields_param(fields, CERTIFICATE_LIST_FIELDS)
+        certificates_cursor = db.certificates.find({"student_id": current_user["id"]}, fields_projection(selected))
+        certificates = await certificates_cursor.to_list(length=None)
+        
+        return serialize_doc(certificates)
+    
+    except Exception as e:
+        logger.error(f"Get certificates error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to retrieve certificates")
+
+@api_router.get("/certificates/{cert_id}/verify")
+async def verify_certificate(
+    cert_id: str,
+    token: Optional[str] = None,
+    name: Optional[str] = None
+):
+    """Verify a certificate by id or number; with a QR token the check never touches the database"""
+    try:
+        if token:
+            try:
+                claims = decode_certificate_token(token)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            
+            if claims["certificate_number"] != cert_id:
+                raise HTTPException(status_code=400, detail="Token does not match this certificate")
+            
+            # Tokens are only handed out once a certificate is generated
+            revoked = claims["certificate_number"] in revoked_certificate_numbers
+            expiry_date = claims["expiry_date"]
+            verification_data = {
+                "certificate_number": claims["certificate_number"],
+                "student_name_hash": claims["name_hash"],
+                "issue_date": claims["issue_date"].date().isoformat(),
+                "expiry_date": expiry_date.date().isoformat() if expiry_date else None,
+                "status": CertificateStatus.REVOKED if revoked else "verified",
+                "is_valid": certificate_is_valid(
+                    CertificateStatus.REVOKED if revoked else CertificateStatus.GENERATED,
+                    expiry_date,
+                    datetime.utcnow()
+                )
+            }
+            if name is not None:
+                verification_data["name_matches"] = hash_certificate_name(name) == claims["name_hash"]
+            
+            return verification_data
+        
+        # Fallback for certificates without a token: cached database lookup
+        certificate = certificate_verification_cache.get(cert_id)
+        if certificate is None:
+            certificate = await db.certificates.find_one(
+                {"$or": [{"id": cert_id}, {"certificate_number": cert_id}]},
+                {"_id": 0, "certificate_number": 1, "student_id": 1, "student_name": 1,
+                 "issue_date": 1, "expiry_date": 1, "status": 1}
+            )
+            if not certificate:
+                raise HTTPException(status_code=404, detail="Certificate not found")
+            
+            # Get student details for certificates issued before names were stored on them
+            if not certificate.get("student_name"):
+                student = await db.users.find_one({"id": certificate["student_id"]})
+                certificate["student_name"] = f"{student['first_name']} {student['last_name']}" if student else "Unknown"
+            
+            certificate_verification_cache.set(cert_id, certificate)
+        
+        status_value = certificate["status"]
+        if certificate["certificate_number"] in revoked_certificate_numbers:
+            status_value = CertificateStatus.REVOKED
+        
+        verification_data = {
+            "certificate_number": certificate["certificate_number"],
+            "student_name": certificate["student_name"],
+            "issue_date": certificate["issue_date"],
+            "expiry_date": certificate.get("expiry_date"),
+            "status": status_value,
+            "is_valid": certificate_is_valid(status_value, certificate.get("expiry_date"), datetime.utcnow())
+        }
+        
+        return verification_data
+    
+    except Exception as e:
+        logger.error(f"Verify certificate error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to verify certificate")
+
+@api_router.post("/certificates/{cert_id}/revoke")
+async def revoke_certificate(
+    cert_id: str,
+    reason: str = Form(...),
+    current_user = Depends(get_current_user)
+):
+    """Revoke a certificate issued by the manager's school"""
+    try:
+        if current_user["role"] != "manager":
+            raise HTTPException(status_code=403, detail="Only managers can revoke certificates")
+        
+        if not reason.strip():
+            raise HTTPException(status_code=400, detail="Revocation reason is required")
+        
+        certificate = await db.certificates.find_one(
+            {"$or": [{"id": cert_id}, {"certificate_number": cert_id}]},
+            {"_id": 0, "id": 1, "certificate_number": 1, "enrollment_id": 1, "status": 1}
+        )
+        if not certificate:
+            raise HTTPException(status_code=404, detail="Certificate not found")
+        
+        # Verify manager owns the issuing school
+        enrollment = await db.enrollments.find_one({"id": certificate["enrollment_id"]}, {"_id": 0, "driving_school_id": 1})
+        school = await db.driving_schools.find_one({
+            "id": enrollment["driving_school_id"] if enrollment else None,
+            "manager_id": current_user["id"]
+        })
+        if not school:
+            raise HTTPException(status_code=403, detail="Unauthorized to revoke this certificate")
+        
+        if certificate["status"] != CertificateStatus.REVOKED:
+            await db.certificates.update_one(
+                {"id": certificate["id"]},
+                {"$set": {
+                    "status": CertificateStatus.REVOKED,
+                    "revoked_at": datetime.utcnow(),
+                    "revoked_by": current_user["id"],
+                    "revocation_reason": reason.strip()
+                }}
+            )
+        
+        # Take effect in this process now; other workers pick it up on their next refresh
+        revoked_certificate_numbers.add(certificate["certificate_number"])
+        certificate_verification_cache.invalidate(certificate["id"])
+        certificate_verification_cache.invalidate(certificate["certificate_number"])
+        
+        return {"message": "Certificate revoked", "certificate_number": certificate["certificate_number"]}
+    
+    except Exception as e:
+        logger.error(f"Revoke certificate error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to revoke certificate")
+
+# CALENDAR FEED ENDPOINTS
+
+CALENDAR_FEED_BATCH_SIZE = 200
+
+def ical_escape(value) -> str:
+    return (
+        str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+def ical_datetime(value: datetime) -> str:
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+def fold_ical_line(line: str) -> str:
+    """Fold a content line at 75 octets as required by RFC 5545"""
+    if len(line.encode()) <= 75:
+        return line + "\r\n"
+    parts = []
+    current = ""
+    size = 0
+    for char in line:
+        char_size = len(char.encode())
+        if size + char_size > 75:
+            parts.append(current)
+            current, size = " ", 1
+        current += char
+        size += char_size
+    parts.append(current)
+    return "\r\n".join(parts) + "\r\n"
+
+def ical_event(uid: str, start: datetime, end: datetime, summary: str, stamp: datetime,
+               location: Optional[str] = None, description: Optional[str] = None,
+               cancelled: bool = False) -> str:
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{ical_datetime(stamp)}",
+        f"DTSTART:{ical_datetime(start)}",
+        f"DTEND:{ical_datetime(end)}",
+        f"SUMMARY:{ical_escape(summary)}",
+        f"STATUS:{'CANCELLED' if cancelled else 'CONFIRMED'}"
+    ]
+    if location:
+        lines.append(f"LOCATION:{ical_escape(location)}")
+    if description:
+        lines.append(f"DESCRIPTION:{ical_escape(description)}")
+    lines.append("END:VEVENT")
+    return "".join(fold_ical_line(line) for line in lines)
+
+def session_ical_event(session: dict) -> str:
+    return ical_event(
+        uid=f"session-{session['id']}@driving-school-platform",
+        start=session["scheduled_at"],
+        end=session_end(session),
+        summary=f"{str(session.get('session_type', '')).title()} driving session",
+        stamp=session.get("updated_at") or session.get("created_at") or session["scheduled_at"],
+        location=session.get("location"),
+        description=session.get("notes"),
+        cancelled=session.get("status") == SessionStatus.CANCELLED
+    )
+
+def exam_ical_event(exam: dict) -> str:
+    return ical_event(
+        uid=f"exam-{exam['id']}@driving-school-platform",
+        start=exam["scheduled_at"],
+        end=exam["scheduled_at"] + timedelta(minutes=exam.get("duration_minutes") or 90),
+        summary=f"{str(exam.get('exam_type', '')).title()} driving exam",
+        stamp=exam.get("updated_at") or exam.get("created_at") or exam["scheduled_at"],
+        location=exam.get("location"),
+        description=exam.get("notes")
+    )
+
+async def stream_ical(calendar_name: str, cursor, build_event):
+    """Yield an iCalendar document event by event so memory stays flat for long histories"""
+    yield (
+        "BEGIN:VCALENDAR\r\n"
+        "VERSION:2.0\r\n"
+        "PRODID:-//Driving School Platform//Calendar//EN\r\n"
+        "CALSCALE:GREGORIAN\r\n"
+        f"X-WR-CALNAME:{ical_escape(calendar_name)}\r\n"
+    )
+    async for doc in cursor:
+        yield build_event(doc)
+    yield "END:VCALENDAR\r\n"
+
+async def calendar_feed_response(request: Request, collection, query: dict, feed_key: str,
+                                 calendar_name: str, build_event):
+    """Serve a feed, answering 304 when the client's copy is still current"""
+    summary = await collection.aggregate([
+        {"$match": query},
+        {"$group": {
+            "_id": None,
+            "count": {"$sum": 1},
+            "last_modified": {"$max": {"$ifNull": ["$updated_at", "$created_at"]}}
+        }}
+    ]).to_list(length=1)
+    count = summary[0]["count"] if summary else 0
+    last_modified = (summary[0]["last_modified"] if summary else None) or datetime(1970, 1, 1)
+    last_modified = last_modified.replace(microsecond=0)
+    
+    etag = '"' + hashlib.sha1(f"{feed_key}:{count}:{last_modified.isoformat()}".encode()).hexdigest() + '"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": "private, max-age=300"
+    }
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        if etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+    elif request.headers.get("if-modified-since"):
+        try:
+            since = parsedate_to_datetime(request.headers["if-modified-since"]).replace(tzinfo=None)
+            if last_modified <= since:
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+    
+    cursor = collection.find(query, {"_id": 0}).sort("scheduled_at", 1).batch_size(CALENDAR_FEED_BATCH_SIZE)
+    return StreamingResponse(
+        stream_ical(calendar_name, cursor, build_event),
+        media_type="text/calendar; charset=utf-8",
+        headers=headers
+    )
+
+def hash_calendar_feed_token(feed_token: str) -> str:
+    return hashlib.sha256(feed_token.encode()).hexdigest()
+
+async def get_calendar_feed_user(feed_token: str) -> dict:
+    """Resolve a feed token; it only ever unlocks the .ics routes"""
+    feed = await db.calendar_feeds.find_one(
+        {"token_hash": hash_calendar_feed_token(feed_token)},
+        {"_id": 0, "user_id": 1}
+    )
+    if not feed:
+        raise HTTPException(status_code=401, detail="Invalid calendar feed token")
+    
+    user = await db.users.find_one({"id": feed["user_id"]}, {"_id": 0, "id": 1, "role": 1})
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
+
+@api_router.post("/calendar/feed-urls")
+async def issue_calendar_feed_urls(current_user = Depends(get_current_user)):
+    """Issue calendar feed URLs, replacing (and so revoking) any issued before.
+    
+    Calendar apps can't send bearer tokens, so feeds are addressed by an opaque
+    random token. Only its hash is stored, so the URLs are shown once.
+    """
+    try:
+        feed_token = secrets.token_urlsafe(32)
+        await db.calendar_feeds.replace_one(
+            {"user_id": current_user["id"]},
+            {
+                "user_id": current_user["id"],
+                "token_hash": hash_calendar_feed_token(feed_token),
+                "created_at": datetime.utcnow()
+            },
+            upsert=True
+        )
+        return {
+            "sessions_url": f"/api/calendar/{feed_token}/sessions.ics",
+            "exams_url": f"/api/calendar/{feed_token}/exams.ics"
+        }
+    
+    except Exception as e:
+        logger.error(f"Issue calendar feed error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to issue calendar feed")
 
-# CERTIFICATE ENDPOINTS
+@api_router.delete("/calendar/feed-urls")
+async def revoke_calendar_feed_urls(current_user = Depends(get_current_user)):
+    """Stop serving the user's calendar feeds"""
+    try:
+        result = await db.calendar_feeds.delete_one({"user_id": current_user["id"]})
+        return {"message": "Calendar feed revoked" if result.deleted_count else "No calendar feed to revoke"}
+    
+    except Exception as e:
+        logger.error(f"Revoke calendar feed error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to revoke calendar feed")
 
-@api_router.get("/certificates/my")
-async def get_my_certificates(current_user = Depends(get_current_user)):
+@api_router.get("/calendar/{feed_token}/sessions.ics")
+async def get_sessions_calendar(feed_token: str, request: Request):
     try:
-        if current_user["role"] != "student":
-            raise HTTPException(status_code=403, detail="Only students can view certificates")
-        
-        certificates_cursor = db.certificates.find({"student_id": current_user["id"]})
-        certificates = await certificates_cursor.to_list(length=None)
+        user = await get_calendar_feed_user(feed_token)
+        if user["role"] == "student":
+            query = {"student_id": user["id"]}
+        elif user["role"] == "teacher":
+            teacher = await db.teachers.find_one({"user_id": user["id"]}, {"_id": 0, "id": 1})
+            if not teacher:
+                raise HTTPException(status_code=404, detail="Teacher profile not found")
+            query = {"teacher_id": teacher["id"]}
+        else:
+            raise HTTPException(status_code=403, detail="Only students and teachers have session calendars")
         
-        return serialize_doc(certificates)
+        return await calendar_feed_response(
+            request, db.sessions, query, f"sessions:{user['id']}", "Driving sessions", session_ical_event
+        )
     
     except Exception as e:
-        logger.error(f"Get certificates error: {str(e)}")
+        logger.error(f"Sessions calendar error: {str(e)}")
         if isinstance(e, HTTPException):
             raise e
-        raise HTTPException(status_code=500, detail="Failed to retrieve certificates")
+        raise HTTPException(status_code=500, detail="Failed to build sessions calendar")
 
-@api_router.get("/certificates/{cert_id}/verify")
-async def verify_certificate(cert_id: str):
+@api_router.get("/calendar/{feed_token}/exams.ics")
+async def get_exams_calendar(feed_token: str, request: Request):
     try:
-        certificate = await db.certificates.find_one({"id": cert_id})
-        if not certificate:
-            raise HTTPException(status_code=404, detail="Certificate not found")
-        
-        # Get student details
-        student = await db.users.find_one({"id": certificate["student_id"]})
-        
-        verification_data = {
-            "certificate_number": certificate["certificate_number"],
-            "student_name": f"{student['first_name']} {student['last_name']}" if student else "Unknown",
-            "issue_date": certificate["issue_date"],
-            "expiry_date": certificate.get("expiry_date"),
-            "status": certificate["status"],
-            "is_valid": certificate["status"] == "issued" and 
-                       (not certificate.get("expiry_date") or 
-                        datetime.utcnow() < certificate["expiry_date"])
-        }
+        user = await get_calendar_feed_user(feed_token)
+        if user["role"] == "student":
+            query = {"student_id": user["id"]}
+        elif user["role"] == "external_expert":
+            expert = await db.external_experts.find_one({"user_id": user["id"]}, {"_id": 0, "id": 1})
+            if not expert:
+                raise HTTPException(status_code=404, detail="Expert profile not found")
+            query = {"external_expert_id": expert["id"]}
+        else:
+            raise HTTPException(status_code=403, detail="Only students and external experts have exam calendars")
         
-        return verification_data
+        return await calendar_feed_response(
+            request, db.exam_schedules, query, f"exams:{user['id']}", "Driving exams", exam_ical_event
+        )
     
     except Exception as e:
-        logger.error(f"Verify certificate error: {str(e)}")
+        logger.error(f"Exams calendar error: {str(e)}")
         if isinstance(e, HTTPException):
             raise e
-        raise HTTPException(status_code=500, detail="Failed to verify certificate")
+        raise HTTPException(status_code=500, detail="Failed to build exams calendar")
 
 # NOTIFICATION ENDPOINTS
 
@@ -3362,6 +5804,7 @@ async def mark_notification_read(
             {"id": notification_id},
             {"$set": {"is_read": True}}
         )
+        invalidate_dashboards(f"user:{current_user['id']}")
         
         return {"message": "Notification marked as read"}
     
@@ -3378,6 +5821,7 @@ async def mark_all_notifications_read(current_user = Depends(get_current_user)):
             {"user_id": current_user["id"], "is_read": False},
             {"$set": {"is_read": True}}
         )
+        invalidate_dashboards(f"user:{current_user['id']}")
         
         return {"message": "All notifications marked as read"}
     
@@ -3389,6 +5833,362 @@ async def mark_all_notifications_read(current_user = Depends(get_current_user)):
 
 # ANALYTICS ENDPOINTS
 
+SCHOOL_OVERVIEW_CACHE_SECONDS = 60
+
+school_overview_cache = TTLCache(SCHOOL_OVERVIEW_CACHE_SECONDS)
+
+def invalidate_school_analytics(school_id: Optional[str]):
+    """Called by enrollment, teacher and review writes so managers see their changes immediately"""
+    if school_id:
+        school_overview_cache.invalidate(school_id)
+
+ROLLUP_COUNTERS = (
+    "enrollments", "sessions_scheduled", "sessions_completed",
+    "exams_scheduled", "exams_passed", "exams_failed", "reviews", "rating_sum"
+)
+MAX_TREND_DAYS = 366
+MAX_TREND_WEEKS = 104
+MAX_TREND_MONTHS = 36
+
+def rollup_day(when: datetime) -> str:
+    """Bucket a stored (naive UTC) timestamp into the school's local calendar day"""
+    return when.replace(tzinfo=timezone.utc).astimezone(SCHOOL_TIMEZONE).date().isoformat()
+
+async def record_school_activity(school_id: Optional[str], when: datetime, **increments):
+    """Bump a school's daily rollup; trends read these instead of scanning raw collections"""
+    increments = {counter: value for counter, value in increments.items() if value}
+    if not school_id or not increments:
+        return
+    day = rollup_day(when)
+    try:
+        await db.school_daily_rollups.update_one(
+            {"_id": f"{school_id}:{day}"},
+            {"$inc": increments, "$setOnInsert": {"driving_school_id": school_id, "day": day}},
+            upsert=True
+        )
+    except Exception as e:
+        # Rollups can be rebuilt with backfill_school_rollups; never fail the write over them
+        logger.error(f"Record school activity error: {str(e)}")
+
+async def exam_school_id(exam: dict) -> Optional[str]:
+    """Exams booked before driving_school_id was stored are resolved through their course"""
+    if exam.get("driving_school_id"):
+        return exam["driving_school_id"]
+    course = await db.courses.find_one({"id": exam.get("course_id")}, {"_id": 0, "enrollment_id": 1})
+    if not course:
+        return None
+    enrollment = await db.enrollments.find_one({"id": course["enrollment_id"]}, {"_id": 0, "driving_school_id": 1})
+    return enrollment["driving_school_id"] if enrollment else None
+
+async def record_exam_result(exam: dict, passed: bool):
+    """Count a graded exam, moving it between buckets if it is being re-graded"""
+    previous = exam.get("status")
+    increments = {"exams_passed": 1 if passed else 0, "exams_failed": 0 if passed else 1}
+    if previous == ExamStatus.PASSED:
+        increments["exams_passed"] -= 1
+    elif previous == ExamStatus.FAILED:
+        increments["exams_failed"] -= 1
+    await record_school_activity(await exam_school_id(exam), exam["scheduled_at"], **increments)
+
+async def backfill_school_rollups(school_id: Optional[str] = None) -> dict:
+    """Rebuild daily rollups from the raw collections, for one school or the whole platform"""
+    started = time.perf_counter()
+    timezone_name = SCHOOL_TIMEZONE.key
+    school_match = {"driving_school_id": school_id} if school_id else {}
+    
+    def day_of(field: str) -> dict:
+        return {"$dateToString": {"format": "%Y-%m-%d", "date": f"${field}", "timezone": timezone_name}}
+    
+    def counted(condition) -> dict:
+        return {"$sum": {"$cond": [condition, 1, 0]}}
+    
+    # Older sessions and exams don't carry driving_school_id, so resolve it through teachers / courses
+    session_school = [
+        {"$lookup": {"from": "teachers", "localField": "teacher_id", "foreignField": "id", "as": "teacher"}},
+        {"$addFields": {"driving_school_id": {
+            "$ifNull": ["$driving_school_id", {"$first": "$teacher.driving_school_id"}]
+        }}}
+    ]
+    exam_school = [
+        {"$lookup": {"from": "courses", "localField": "course_id", "foreignField": "id", "as": "course"}},
+        {"$lookup": {"from": "enrollments", "localField": "course.enrollment_id", "foreignField": "id", "as": "enrollment"}},
+        {"$addFields": {"driving_school_id": {
+            "$ifNull": ["$driving_school_id", {"$first": "$enrollment.driving_school_id"}]
+        }}}
+    ]
+    
+    # For a single school, narrow the raw rows to its teachers and courses before paying for the $lookup
+    session_scope, exam_scope = {}, {}
+    if school_id:
+        teacher_ids, enrollment_ids = await asyncio.gather(
+            db.teachers.distinct("id", {"driving_school_id": school_id}),
+            db.enrollments.distinct("id", {"driving_school_id": school_id})
+        )
+        course_ids = await db.courses.distinct("id", {"enrollment_id": {"$in": enrollment_ids}})
+        session_scope = {"$or": [school_match, {"teacher_id": {"$in": teacher_ids}}]}
+        exam_scope = {"$or": [school_match, {"course_id": {"$in": course_ids}}]}
+    
+    sources = [
+        db.enrollments.aggregate([
+            {"$match": school_match},
+            {"$group": {"_id": {"school": "$driving_school_id", "day": day_of("created_at")}, "enrollments": {"$sum": 1}}}
+        ]),
+        db.sessions.aggregate([{"$match": session_scope}] + session_school + [
+            {"$match": school_match},
+            {"$group": {
+                "_id": {"school": "$driving_school_id", "day": day_of("scheduled_at")},
+                "sessions_scheduled": {"$sum": 1},
+                "sessions_completed": counted({"$eq": ["$status", SessionStatus.COMPLETED]})
+            }}
+        ]),
+        db.exam_schedules.aggregate([{"$match": exam_scope}] + exam_school + [
+            {"$match": school_match},
+            {"$group": {
+                "_id": {"school": "$driving_school_id", "day": day_of("scheduled_at")},
+                "exams_scheduled": {"$sum": 1},
+                "exams_passed": counted({"$eq": ["$status", ExamStatus.PASSED]}),
+                "exams_failed": counted({"$eq": ["$status", ExamStatus.FAILED]})
+            }}
+        ]),
+        db.reviews.aggregate([
+            {"$match": school_match},
+            {"$group": {
+                "_id": {"school": "$driving_school_id", "day": day_of("created_at")},
+                "reviews": {"$sum": 1},
+                "rating_sum": {"$sum": "$rating"}
+            }}
+        ])
+    ]
+    
+    rollups = {}
+    for groups in await asyncio.gather(*(source.to_list(length=None) for source in sources)):
+        for group in groups:
+            school, day = group["_id"].get("school"), group["_id"].get("day")
+            if not school or not day:
+                continue
+            counters = rollups.setdefault((school, day), dict.fromkeys(ROLLUP_COUNTERS, 0))
+            for counter in ROLLUP_COUNTERS:
+                counters[counter] += group.get(counter, 0)
+    
+    operations = [
+        UpdateOne(
+            {"_id": f"{school}:{day}"},
+            {"$set": {"driving_school_id": school, "day": day, **counters}},
+            upsert=True
+        )
+        for (school, day), counters in rollups.items()
+    ]
+    for start in range(0, len(operations), 1000):
+        await db.school_daily_rollups.bulk_write(operations[start:start + 1000], ordered=False)
+    
+    # Days whose activity no longer exists (deleted rows) are zeroed rather than left stale.
+    # Each filter only lists one school's days, so it stays small however large the platform grows.
+    days_by_school = {}
+    for school, day in rollups:
+        days_by_school.setdefault(school, []).append(day)
+    if school_id:
+        days_by_school.setdefault(school_id, [])
+    zeroed = dict.fromkeys(ROLLUP_COUNTERS, 0)
+    stale_operations = [
+        UpdateMany({"driving_school_id": school, "day": {"$nin": days}}, {"$set": zeroed})
+        for school, days in days_by_school.items()
+    ]
+    if not school_id:
+        # Schools with no remaining activity at all
+        stale_operations.append(
+            UpdateMany({"driving_school_id": {"$nin": list(days_by_school)}}, {"$set": zeroed})
+        )
+    zeroed_days = 0
+    for start in range(0, len(stale_operations), 1000):
+        result = await db.school_daily_rollups.bulk_write(stale_operations[start:start + 1000], ordered=False)
+        zeroed_days += result.modified_count
+    
+    return {
+        "rollup_days": len(operations),
+        "zeroed_days": zeroed_days,
+        "elapsed_seconds": round(time.perf_counter() - started, 3)
+    }
+
+async def load_school_rollups(school_id: str, first_day: str) -> List[dict]:
+    return await db.school_daily_rollups.find(
+        {"driving_school_id": school_id, "day": {"$gte": first_day}},
+        {"_id": 0, "driving_school_id": 0}
+    ).sort("day", 1).to_list(length=None)
+
+async def get_manager_school_id(current_user: dict) -> str:
+    if current_user["role"] != "manager":
+        raise HTTPException(status_code=403, detail="Only managers can view school analytics")
+    school = await db.driving_schools.find_one({"manager_id": current_user["id"]}, {"_id": 0, "id": 1})
+    if not school:
+        raise HTTPException(status_code=404, detail="Manager has no driving school")
+    return school["id"]
+
+FUNNEL_CACHE_SECONDS = 900
+FUNNEL_STAGES = ("enrolled", "approved", "theory_passed", "park_passed", "road_passed", "certified")
+FUNNEL_COHORT_LIMIT = 24
+
+funnel_cache = TTLCache(FUNNEL_CACHE_SECONDS)
+
+def compute_enrollment_funnel(
+    enrollments: pd.DataFrame,
+    courses: pd.DataFrame,
+    exams: pd.DataFrame,
+    certificates: pd.DataFrame
+) -> dict:
+    """Cohort funnel from bulk frames: stage counts, conversion and median days spent before each stage"""
+    if enrollments.empty:
+        return {"stages": list(FUNNEL_STAGES), "overall": None, "cohorts": []}
+    
+    funnel = enrollments.set_index("id")[["created_at", "approved_at"]].rename(
+        columns={"created_at": "enrolled", "approved_at": "approved"}
+    )
+    
+    # First pass of each exam type per enrollment
+    if not exams.empty and not courses.empty:
+        passes = exams.merge(courses, left_on="course_id", right_on="id", how="inner")
+        # Typed datetime columns keep the group-by in native code (all-null columns arrive as object)
+        passes["passed_at"] = pd.to_datetime(passes["updated_at"]).fillna(pd.to_datetime(passes["scheduled_at"]))
+        first_passes = passes.groupby(["enrollment_id", "exam_type"])["passed_at"].min().unstack()
+        for course_type in CourseType:
+            column = f"{course_type.value}_passed"
+            funnel[column] = first_passes[course_type.value] if course_type.value in first_passes else pd.NaT
+    for course_type in CourseType:
+        if f"{course_type.value}_passed" not in funnel:
+            funnel[f"{course_type.value}_passed"] = pd.NaT
+    
+    if not certificates.empty:
+        funnel["certified"] = pd.to_datetime(certificates["issued_at"]).groupby(certificates["enrollment_id"]).min()
+    else:
+        funnel["certified"] = pd.NaT
+    
+    stage_times = funnel[list(FUNNEL_STAGES)].apply(pd.to_datetime)
+    # A stage only counts once every earlier stage was reached
+    reached = stage_times.notna().cumprod(axis=1).astype(bool)
+    durations = stage_times.diff(axis=1).apply(lambda column: column.dt.total_seconds() / 86400)
+    durations = durations.where(reached)
+    cohort = stage_times["enrolled"].dt.year * 100 + stage_times["enrolled"].dt.month
+    
+    def summarize(counts: pd.Series, medians: pd.Series) -> dict:
+        size = int(counts["enrolled"])
+        stages = []
+        previous = size
+        for stage in FUNNEL_STAGES:
+            count = int(counts[stage])
+            stages.append({
+                "stage": stage,
+                "count": count,
+                "conversion_from_previous": round(count / previous * 100, 1) if previous else None,
+                "conversion_from_start": round(count / size * 100, 1) if size else None,
+                "median_days_from_previous": None if stage == "enrolled" or pd.isna(medians[stage])
+                else round(float(medians[stage]), 1)
+            })
+            previous = count
+        return {"size": size, "stages": stages}
+    
+    cohort_counts = reached.groupby(cohort).sum()
+    cohort_medians = durations.groupby(cohort).median()
+    cohorts = [
+        {"cohort": f"{int(month) // 100:04d}-{int(month) % 100:02d}", **summarize(cohort_counts.loc[month], cohort_medians.loc[month])}
+        for month in cohort_counts.index.sort_values()[-FUNNEL_COHORT_LIMIT:]
+    ]
+    return {
+        "stages": list(FUNNEL_STAGES),
+        "overall": summarize(reached.sum(), durations.median()),
+        "cohorts": cohorts
+    }
+
+async def load_funnel_frames(school_id: Optional[str]) -> Tuple[pd.DataFrame, ...]:
+    """One projected bulk read per collection instead of per-student queries"""
+    enrollment_query = {"driving_school_id": school_id} if school_id else {}
+    enrollments = await db.enrollments.find(
+        enrollment_query, {"_id": 0, "id": 1, "created_at": 1, "approved_at": 1}
+    ).to_list(length=None)
+    enrollment_ids = [enrollment["id"] for enrollment in enrollments]
+    
+    scope = {"enrollment_id": {"$in": enrollment_ids}} if school_id else {}
+    courses, certificates = await asyncio.gather(
+        db.courses.find(scope, {"_id": 0, "id": 1, "enrollment_id": 1}).to_list(length=None),
+        db.certificates.find(
+            {**scope, "status": {"$ne": CertificateStatus.REVOKED}},
+            {"_id": 0, "enrollment_id": 1, "issue_date": 1, "created_at": 1}
+        ).to_list(length=None)
+    )
+    exam_query = {"status": ExamStatus.PASSED}
+    if school_id:
+        exam_query["course_id"] = {"$in": [course["id"] for course in courses]}
+    exams = await db.exam_schedules.find(
+        exam_query, {"_id": 0, "course_id": 1, "exam_type": 1, "scheduled_at": 1, "updated_at": 1}
+    ).to_list(length=None)
+    
+    enrollments_frame = pd.DataFrame(enrollments, columns=["id", "created_at", "approved_at"])
+    courses_frame = pd.DataFrame(courses, columns=["id", "enrollment_id"])
+    exams_frame = pd.DataFrame(exams, columns=["course_id", "exam_type", "scheduled_at", "updated_at"])
+    certificates_frame = pd.DataFrame(
+        [
+            {"enrollment_id": certificate["enrollment_id"], "issued_at": certificate.get("issue_date") or certificate.get("created_at")}
+            for certificate in certificates
+        ],
+        columns=["enrollment_id", "issued_at"]
+    )
+    return enrollments_frame, courses_frame, exams_frame, certificates_frame
+
+async def get_enrollment_funnel(school_id: Optional[str]) -> dict:
+    cache_key = school_id or "platform"
+    funnel = funnel_cache.get(cache_key)
+    if funnel is None:
+        frames = await load_funnel_frames(school_id)
+        funnel = await asyncio.to_thread(compute_enrollment_funnel, *frames)
+        funnel["generated_at"] = datetime.utcnow().isoformat()
+        funnel_cache.set(cache_key, funnel)
+    return funnel
+
+async def compute_school_overview_counts(school_id: str) -> dict:
+    """Count enrollments, teachers and reviews for a school in a single aggregation round trip"""
+    results = await db.enrollments.aggregate([
+        {"$match": {"driving_school_id": school_id}},
+        {"$project": {"_id": 0, "kind": "enrollment", "status": "$enrollment_status"}},
+        {"$unionWith": {"coll": "teachers", "pipeline": [
+            {"$match": {"driving_school_id": school_id}},
+            {"$project": {"_id": 0, "kind": "teacher", "approved": "$is_approved"}}
+        ]}},
+        {"$unionWith": {"coll": "reviews", "pipeline": [
+            {"$match": {"driving_school_id": school_id}},
+            {"$project": {"_id": 0, "kind": "review", "rating": 1}}
+        ]}},
+        {"$facet": {
+            "enrollments": [
+                {"$match": {"kind": "enrollment"}},
+                {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+            ],
+            "teachers": [
+                {"$match": {"kind": "teacher"}},
+                {"$group": {
+                    "_id": None,
+                    "total": {"$sum": 1},
+                    "approved": {"$sum": {"$cond": [{"$eq": ["$approved", True]}, 1, 0]}}
+                }}
+            ],
+            "reviews": [
+                {"$match": {"kind": "review"}},
+                {"$group": {"_id": None, "total": {"$sum": 1}, "average_rating": {"$avg": "$rating"}}}
+            ]
+        }}
+    ]).to_list(length=1)
+    
+    facets = results[0] if results else {}
+    by_status = {group["_id"]: group["count"] for group in facets.get("enrollments", [])}
+    teachers = (facets.get("teachers") or [{}])[0]
+    reviews = (facets.get("reviews") or [{}])[0]
+    return {
+        "total_enrollments": sum(by_status.values()),
+        "active_enrollments": by_status.get(EnrollmentStatus.APPROVED, 0),
+        "pending_enrollments": by_status.get(EnrollmentStatus.PENDING_APPROVAL, 0),
+        "total_teachers": teachers.get("total", 0),
+        "approved_teachers": teachers.get("approved", 0),
+        "total_reviews": reviews.get("total", 0),
+        "average_rating": reviews.get("average_rating") or 0
+    }
+
 @api_router.get("/analytics/student-progress/{student_id}")
 async def get_student_progress(
     student_id: str,
@@ -3425,6 +6225,55 @@ async def get_student_progress(
             raise e
         raise HTTPException(status_code=500, detail="Failed to retrieve student progress")
 
+TEACHER_RECENT_SESSIONS = 10
+
+async def compute_teacher_performance(teacher_ids: List[str], include_recent: bool = True) -> Dict[str, dict]:
+    """Session and review metrics for many teachers with a fixed number of round trips"""
+    session_counts, review_stats = await asyncio.gather(
+        db.sessions.aggregate([
+            {"$match": {"teacher_id": {"$in": teacher_ids}}},
+            {"$group": {
+                "_id": "$teacher_id",
+                "total": {"$sum": 1},
+                "completed": {"$sum": {"$cond": [{"$eq": ["$status", SessionStatus.COMPLETED]}, 1, 0]}}
+            }}
+        ]).to_list(length=None),
+        db.reviews.aggregate([
+            {"$match": {"teacher_id": {"$in": teacher_ids}}},
+            {"$group": {"_id": "$teacher_id", "total": {"$sum": 1}, "average_rating": {"$avg": "$rating"}}}
+        ]).to_list(length=None)
+    )
+    session_counts = {group["_id"]: group for group in session_counts}
+    review_stats = {group["_id"]: group for group in review_stats}
+    
+    recent = {}
+    if include_recent:
+        # Each query walks the (teacher_id, scheduled_at) index backwards and stops after ten
+        recent_lists = await asyncio.gather(*(
+            db.sessions.find({"teacher_id": teacher_id}, {"_id": 0})
+            .sort("scheduled_at", -1).limit(TEACHER_RECENT_SESSIONS).to_list(length=TEACHER_RECENT_SESSIONS)
+            for teacher_id in teacher_ids
+        ))
+        recent = dict(zip(teacher_ids, recent_lists))
+    
+    performance = {}
+    for teacher_id in teacher_ids:
+        sessions = session_counts.get(teacher_id, {})
+        reviews = review_stats.get(teacher_id, {})
+        total = sessions.get("total", 0)
+        completed = sessions.get("completed", 0)
+        performance[teacher_id] = {
+            "teacher_id": teacher_id,
+            "total_sessions": total,
+            "completed_sessions": completed,
+            "completion_rate": (completed / total * 100) if total else 0,
+            "total_reviews": reviews.get("total", 0),
+            "average_rating": reviews.get("average_rating") or 0
+        }
+        if include_recent:
+            performance[teacher_id]["recent_sessions"] = serialize_doc(recent.get(teacher_id, []))
+    return performance
+
 @api_router.get("/analytics/school-overview")
 async def get_school_overview(current_user = Depends(get_current_user)):
     try:
@@ -3432,30 +6281,22 @@ async def get_school_overview(current_user = Depends(get_current_user)):
             raise HTTPException(status_code=403, detail="Only managers can view school analytics")
         
         # Get manager's school
-        school = await db.driving_schools.find_one({"manager_id": current_user["id"]})
+        school = await db.driving_schools.find_one(
+            {"manager_id": current_user["id"]},
+            {"_id": 0, "id": 1, "name": 1, "price": 1}
+        )
         if not school:
             raise HTTPException(status_code=404, detail="Manager has no driving school")
         
-        # Calculate school metrics
-        enrollments_cursor = db.enrollments.find({"driving_school_id": school["id"]})
-        enrollments = await enrollments_cursor.to_list(length=None)
-        
-        teachers_cursor = db.teachers.find({"driving_school_id": school["id"]})
-        teachers = await teachers_cursor.to_list(length=None)
-        
-        reviews_cursor = db.reviews.find({"driving_school_id": school["id"]})
-        reviews = await reviews_cursor.to_list(length=None)
+        counts = school_overview_cache.get(school["id"])
+        if counts is None:
+            counts = await compute_school_overview_counts(school["id"])
+            school_overview_cache.set(school["id"], counts)
         
         metrics = {
             "school_name": school["name"],
-            "total_enrollments": len(enrollments),
-            "active_enrollments": len([e for e in enrollments if e["enrollment_status"] == "approved"]),
-            "pending_enrollments": len([e for e in enrollments if e["enrollment_status"] == "pending_approval"]),
-            "total_teachers": len(teachers),
-            "approved_teachers": len([t for t in teachers if t["is_approved"]]),
-            "total_reviews": len(reviews),
-            "average_rating": sum([r["rating"] for r in reviews]) / len(reviews) if reviews else 0,
-            "revenue_estimate": len([e for e in enrollments if e["enrollment_status"] == "approved"]) * school["price"]
+            **counts,
+            "revenue_estimate": counts["active_enrollments"] * school["price"]
         }
         
         return metrics
@@ -3489,34 +6330,291 @@ async def get_teacher_performance(
             raise HTTPException(status_code=403, detail="Unauthorized to view this teacher's performance")
         
         # Calculate teacher metrics
-        sessions_cursor = db.sessions.find({"teacher_id": teacher_id})
-        sessions = await sessions_cursor.to_list(length=None)
+        performance = await compute_teacher_performance([teacher_id])
+        
+        return performance[teacher_id]
+    
+    except Exception as e:
+        logger.error(f"Get teacher performance error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to retrieve teacher performance")
+
+@api_router.get("/analytics/teacher-performance")
+async def get_school_teacher_performance(
+    include_recent: bool = False,
+    current_user = Depends(get_current_user)
+):
+    """Performance for every teacher of the manager's school in one call"""
+    try:
+        if current_user["role"] != "manager":
+            raise HTTPException(status_code=403, detail="Only managers can view teacher performance")
         
-        completed_sessions = [s for s in sessions if s["status"] == "completed"]
+        school = await db.driving_schools.find_one({"manager_id": current_user["id"]}, {"_id": 0, "id": 1})
+        if not school:
+            raise HTTPException(status_code=404, detail="Manager has no driving school")
         
-        reviews_cursor = db.reviews.find({"teacher_id": teacher_id})
-        reviews = await reviews_cursor.to_list(length=None)
+        teachers = await db.teachers.find(
+            {"driving_school_id": school["id"]},
+            {"_id": 0, "id": 1, "user_id": 1, "is_approved": 1}
+        ).to_list(length=None)
+        teacher_ids = [teacher["id"] for teacher in teachers]
+        
+        performance, users = await asyncio.gather(
+            compute_teacher_performance(teacher_ids, include_recent=include_recent),
+            db.users.find(
+                {"id": {"$in": [teacher["user_id"] for teacher in teachers]}},
+                {"_id": 0, "id": 1, "first_name": 1, "last_name": 1}
+            ).to_list(length=None)
+        )
+        users = {user["id"]: user for user in users}
         
-        metrics = {
-            "teacher_id": teacher_id,
-            "total_sessions": len(sessions),
-            "completed_sessions": len(completed_sessions),
-            "completion_rate": (len(completed_sessions) / len(sessions) * 100) if sessions else 0,
-            "total_reviews": len(reviews),
-            "average_rating": sum([r["rating"] for r in reviews]) / len(reviews) if reviews else 0,
-            "recent_sessions": serialize_doc(sessions[-10:])  # Last 10 sessions
-        }
+        results = []
+        for teacher in teachers:
+            user = users.get(teacher["user_id"], {})
+            results.append({
+                **performance[teacher["id"]],
+                "teacher_name": f"{user.get('first_name', '')} {user.get('last_name', '')}".strip(),
+                "is_approved": teacher.get("is_approved", False)
+            })
         
-        return metrics
+        return {"school_id": school["id"], "teachers": results}
     
     except Exception as e:
-        logger.error(f"Get teacher performance error: {str(e)}")
+        logger.error(f"Get school teacher performance error: {str(e)}")
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail="Failed to retrieve teacher performance")
 
+@api_router.get("/analytics/funnel")
+async def get_funnel_analytics(scope: str = "school", current_user = Depends(get_current_user)):
+    """Enrollment-to-certificate funnel by monthly cohort, for the manager's school or the whole platform"""
+    try:
+        if scope not in ["school", "platform"]:
+            raise HTTPException(status_code=400, detail="scope must be 'school' or 'platform'")
+        school_id = await get_manager_school_id(current_user)
+        
+        # The platform view only exposes aggregate counts, so any manager can benchmark against it
+        funnel = await get_enrollment_funnel(school_id if scope == "school" else None)
+        return {"scope": scope, **funnel}
+    
+    except Exception as e:
+        logger.error(f"Get funnel analytics error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to retrieve funnel analytics")
+
+@api_router.get("/analytics/trends/enrollments")
+async def get_enrollment_trend(weeks: int = 12, current_user = Depends(get_current_user)):
+    """New enrollments per week (weeks start on Monday)"""
+    try:
+        school_id = await get_manager_school_id(current_user)
+        weeks = max(1, min(weeks, MAX_TREND_WEEKS))
+        
+        today = datetime.fromisoformat(rollup_day(datetime.utcnow())).date()
+        first_week = today - timedelta(days=today.weekday(), weeks=weeks - 1)
+        totals = {(first_week + timedelta(weeks=i)).isoformat(): 0 for i in range(weeks)}
+        for rollup in await load_school_rollups(school_id, first_week.isoformat()):
+            day = datetime.fromisoformat(rollup["day"]).date()
+            week = (day - timedelta(days=day.weekday())).isoformat()
+            if week in totals:
+                totals[week] += rollup.get("enrollments", 0)
+        
+        return {"weeks": [{"week_start": week, "enrollments": count} for week, count in totals.items()]}
+    
+    except Exception as e:
+        logger.error(f"Get enrollment trend error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to retrieve enrollment trend")
+
+@api_router.get("/analytics/trends/sessions")
+async def get_session_trend(days: int = 30, current_user = Depends(get_current_user)):
+    """Sessions scheduled and completed per day"""
+    try:
+        school_id = await get_manager_school_id(current_user)
+        days = max(1, min(days, MAX_TREND_DAYS))
+        
+        today = datetime.fromisoformat(rollup_day(datetime.utcnow())).date()
+        first_day = today - timedelta(days=days - 1)
+        rollups = {rollup["day"]: rollup for rollup in await load_school_rollups(school_id, first_day.isoformat())}
+        
+        series = []
+        for i in range(days):
+            day = (first_day + timedelta(days=i)).isoformat()
+            rollup = rollups.get(day, {})
+            series.append({
+                "day": day,
+                "sessions_scheduled": rollup.get("sessions_scheduled", 0),
+                "sessions_completed": rollup.get("sessions_completed", 0)
+            })
+        
+        return {"days": series}
+    
+    except Exception as e:
+        logger.error(f"Get session trend error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to retrieve session trend")
+
+@api_router.get("/analytics/trends/pass-rate")
+async def get_pass_rate_trend(months: int = 12, current_user = Depends(get_current_user)):
+    """Exam pass rate per calendar month"""
+    try:
+        school_id = await get_manager_school_id(current_user)
+        months = max(1, min(months, MAX_TREND_MONTHS))
+        
+        today = datetime.fromisoformat(rollup_day(datetime.utcnow())).date()
+        month_index = today.year * 12 + today.month - 1 - (months - 1)
+        month_keys = [f"{(month_index + i) // 12:04d}-{(month_index + i) % 12 + 1:02d}" for i in range(months)]
+        totals = {month: {"passed": 0, "failed": 0} for month in month_keys}
+        
+        for rollup in await load_school_rollups(school_id, f"{month_keys[0]}-01"):
+            month = rollup["day"][:7]
+            if month in totals:
+                totals[month]["passed"] += rollup.get("exams_passed", 0)
+                totals[month]["failed"] += rollup.get("exams_failed", 0)
+        
+        return {"months": [
+            {
+                "month": month,
+                "exams_passed": counts["passed"],
+                "exams_failed": counts["failed"],
+                "pass_rate": round(counts["passed"] / (counts["passed"] + counts["failed"]) * 100, 1)
+                if counts["passed"] + counts["failed"] else None
+            }
+            for month, counts in totals.items()
+        ]}
+    
+    except Exception as e:
+        logger.error(f"Get pass rate trend error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to retrieve pass rate trend")
+
 # REVIEW ENDPOINTS
 
+MIN_REVIEW_RATING = 1
+MAX_REVIEW_RATING = 5
+RATING_RECONCILE_INTERVAL_SECONDS = int(os.environ.get('RATING_RECONCILE_INTERVAL_SECONDS', str(24 * 3600)))
+
+def rating_update_pipeline(rating: int) -> list:
+    """Atomically fold one rating into rating_sum, total_reviews, the histogram and the derived average"""
+    # Documents rated before rating_sum existed only have the average; recover the sum from it
+    previous_sum = {"$ifNull": ["$rating_sum", {
+        "$multiply": [{"$ifNull": ["$rating", 0]}, {"$ifNull": ["$total_reviews", 0]}]
+    }]}
+    # Documents rated before histograms existed have none; starting one here would count only this
+    # review, so leave it for reconcile_review_ratings to backfill from the reviews collection
+    histogram_unknown = {"$and": [
+        {"$eq": [{"$ifNull": ["$rating_histogram", None]}, None]},
+        {"$gt": [{"$ifNull": ["$total_reviews", 0]}, 0]}
+    ]}
+    return [
+        {"$set": {
+            "rating_sum": {"$add": [previous_sum, rating]},
+            "total_reviews": {"$add": [{"$ifNull": ["$total_reviews", 0]}, 1]},
+            "rating_histogram": {"$cond": [histogram_unknown, "$$REMOVE", {"$mergeObjects": [
+                {"$ifNull": ["$rating_histogram", {}]},
+                {str(rating): {"$add": [{"$ifNull": [f"$rating_histogram.{rating}", 0]}, 1]}}
+            ]}]}
+        }},
+        {"$set": {"rating": {"$divide": ["$rating_sum", "$total_reviews"]}}}
+    ]
+
+async def reconcile_review_ratings(fix: bool = True) -> dict:
+    """Recompute school and teacher rating aggregates from reviews and report (and repair) any drift"""
+    report = {}
+    for collection_name, key in [("driving_schools", "driving_school_id"), ("teachers", "teacher_id")]:
+        groups = await db.reviews.aggregate([
+            {"$match": {key: {"$ne": None}}},
+            {"$group": {"_id": {"owner": f"${key}", "rating": "$rating"}, "count": {"$sum": 1}}}
+        ]).to_list(length=None)
+        expected = {}
+        for group in groups:
+            owner, rating = group["_id"]["owner"], group["_id"].get("rating")
+            if rating is None:
+                continue
+            totals = expected.setdefault(owner, {"rating_sum": 0, "total_reviews": 0, "rating_histogram": {}})
+            totals["rating_sum"] += rating * group["count"]
+            totals["total_reviews"] += group["count"]
+            totals["rating_histogram"][str(rating)] = group["count"]
+        
+        operations = []
+        drifted = []
+        async for doc in db[collection_name].find(
+            {"$or": [{"id": {"$in": list(expected)}}, {"total_reviews": {"$gt": 0}}]},
+            {"_id": 0, "id": 1, "rating_sum": 1, "total_reviews": 1, "rating_histogram": 1}
+        ):
+            totals = expected.get(doc["id"], {"rating_sum": 0, "total_reviews": 0, "rating_histogram": {}})
+            stored = {field: doc.get(field, 0 if field != "rating_histogram" else {}) for field in totals}
+            if stored != totals:
+                drifted.append(doc["id"])
+                operations.append(UpdateOne({"id": doc["id"]}, {"$set": {
+                    **totals,
+                    "rating": totals["rating_sum"] / totals["total_reviews"] if totals["total_reviews"] else 0
+                }}))
+        
+        if fix and operations:
+            await db[collection_name].bulk_write(operations, ordered=False)
+        report[collection_name] = {"checked": len(expected), "drifted": len(drifted), "drifted_ids": drifted[:50]}
+    return report
+
+REVIEW_PAGE_SIZE = 20
+MAX_REVIEW_PAGE_SIZE = 100
+REVIEW_SUMMARY_CACHE_SECONDS = 60
+
+review_summary_cache = TTLCache(REVIEW_SUMMARY_CACHE_SECONDS)
+
+def encode_review_cursor(review: dict) -> str:
+    return _b64url_encode(f"{review['created_at'].isoformat()}|{review['id']}".encode())
+
+def decode_review_cursor(cursor: str) -> Tuple[datetime, str]:
+    created_at, review_id = _b64url_decode(cursor).decode().split("|", 1)
+    return datetime.fromisoformat(created_at), review_id
+
+async def get_review_summary(school_id: str) -> dict:
+    """Average, count and per-star histogram for a school's reviews"""
+    summary = review_summary_cache.get(school_id)
+    if summary is not None:
+        return summary
+    
+    school = await db.driving_schools.find_one(
+        {"id": school_id},
+        {"_id": 0, "rating": 1, "total_reviews": 1, "rating_histogram": 1}
+    ) or {}
+    histogram = school.get("rating_histogram")
+    if histogram is None or sum(histogram.values()) != school.get("total_reviews", 0):
+        # Schools not yet touched by the incremental aggregates or the reconciler, or whose histogram
+        # has drifted from the review count; recount until the reconciler repairs them
+        groups = await db.reviews.aggregate([
+            {"$match": {"driving_school_id": school_id}},
+            {"$group": {"_id": "$rating", "count": {"$sum": 1}}}
+        ]).to_list(length=None)
+        histogram = {str(group["_id"]): group["count"] for group in groups if group["_id"] is not None}
+    
+    histogram = {str(star): histogram.get(str(star), 0) for star in range(MIN_REVIEW_RATING, MAX_REVIEW_RATING + 1)}
+    total = sum(histogram.values())
+    summary = {
+        "average_rating": round(sum(int(star) * count for star, count in histogram.items()) / total, 2) if total else 0,
+        "total_reviews": total,
+        "histogram": histogram
+    }
+    review_summary_cache.set(school_id, summary)
+    return summary
+
+async def rating_reconciler():
+    # Run once at startup so aggregates written before histograms existed are backfilled right away
+    while True:
+        try:
+            report = await reconcile_review_ratings()
+            for collection_name, result in report.items():
+                if result["drifted"]:
+                    logger.warning(f"Repaired rating drift on {result['drifted']} {collection_name}")
+        except Exception as e:
+            logger.error(f"Rating reconciliation error: {str(e)}")
+        await asyncio.sleep(RATING_RECONCILE_INTERVAL_SECONDS)
+
 @api_router.post("/reviews")
 async def create_review(
     review_data: ReviewCreate,
@@ -3526,6 +6624,12 @@ async def create_review(
         if current_user["role"] != "student":
             raise HTTPException(status_code=403, detail="Only students can create reviews")
         
+        if not MIN_REVIEW_RATING <= review_data.rating <= MAX_REVIEW_RATING:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Rating must be between {MIN_REVIEW_RATING} and {MAX_REVIEW_RATING}"
+            )
+        
         # Verify enrollment exists and is completed
         enrollment = await db.enrollments.find_one({
             "id": review_data.enrollment_id,
@@ -3543,6 +6647,14 @@ async def create_review(
         if existing_review:
             raise HTTPException(status_code=400, detail="Review already exists for this enrollment")
         
+        if review_data.teacher_id:
+            teacher = await db.teachers.find_one(
+                {"id": review_data.teacher_id, "driving_school_id": enrollment["driving_school_id"]},
+                {"_id": 0, "id": 1}
+            )
+            if not teacher:
+                raise HTTPException(status_code=404, detail="Teacher not found at this driving school")
+        
         # Create review
         review_id = str(uuid.uuid4())
         review_doc = {
@@ -3550,29 +6662,31 @@ async def create_review(
             "student_id": current_user["id"],
             "enrollment_id": review_data.enrollment_id,
             "driving_school_id": enrollment["driving_school_id"],
-            "teacher_id": None,  # Could be assigned to specific teacher
+            "teacher_id": review_data.teacher_id,
             "rating": review_data.rating,
             "comment": review_data.comment,
+            "student_name": f"{current_user['first_name']} {current_user['last_name']}",
             "created_at": datetime.utcnow()
         }
         
-        await db.reviews.insert_one(review_doc)
-        
-        # Update school rating
-        school_reviews_cursor = db.reviews.find({"driving_school_id": enrollment["driving_school_id"]})
-        school_reviews = await school_reviews_cursor.to_list(length=None)
+        try:
+            await db.reviews.insert_one(review_doc)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="Review already exists for this enrollment")
+        invalidate_school_analytics(enrollment["driving_school_id"])
+        await record_school_activity(
+            enrollment["driving_school_id"], review_doc["created_at"], reviews=1, rating_sum=review_doc["rating"]
+        )
         
-        if school_reviews:
-            avg_rating = sum([r["rating"] for r in school_reviews]) / len(school_reviews)
-            await db.driving_schools.update_one(
-                {"id": enrollment["driving_school_id"]},
-                {
-                    "$set": {
-                        "rating": avg_rating,
-                        "total_reviews": len(school_reviews)
-                    }
-                }
-            )
+        # Update school (and teacher) rating aggregates in place
+        await db.driving_schools.update_one(
+            {"id": enrollment["driving_school_id"]},
+            rating_update_pipeline(review_data.rating)
+        )
+        if review_data.teacher_id:
+            await db.teachers.update_one({"id": review_data.teacher_id}, rating_update_pipeline(review_data.rating))
+        review_summary_cache.invalidate(enrollment["driving_school_id"])
+        invalidate_dashboards(f"school:{enrollment['driving_school_id']}")
         
         return {"review_id": review_id, "message": "Review created successfully"}
     
@@ -3583,21 +6697,48 @@ async def create_review(
         raise HTTPException(status_code=500, detail="Failed to create review")
 
 @api_router.get("/reviews/school/{school_id}")
-async def get_school_reviews(school_id: str):
+async def get_school_reviews(school_id: str, cursor: Optional[str] = None, limit: int = REVIEW_PAGE_SIZE):
+    """Newest reviews first, a page at a time; pass next_cursor back to continue"""
     try:
-        # Get reviews for the school
-        reviews_cursor = db.reviews.find({"driving_school_id": school_id}).sort("created_at", -1)
-        reviews = await reviews_cursor.to_list(length=None)
+        limit = max(1, min(limit, MAX_REVIEW_PAGE_SIZE))
         
-        # Get student names for reviews
-        for review in reviews:
-            student = await db.users.find_one({"id": review["student_id"]})
-            if student:
-                review["student_name"] = f"{student['first_name']} {student['last_name']}"
-            else:
-                review["student_name"] = "Anonymous"
+        query = {"driving_school_id": school_id}
+        if cursor:
+            try:
+                created_at, review_id = decode_review_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "id": {"$lt": review_id}}
+            ]
         
-        return serialize_doc(reviews)
+        # Get reviews for the school
+        reviews_cursor = db.reviews.find(query, {"_id": 0}).sort([("created_at", -1), ("id", -1)]).limit(limit + 1)
+        reviews, summary = await asyncio.gather(
+            reviews_cursor.to_list(length=limit + 1),
+            get_review_summary(school_id)
+        )
+        has_more = len(reviews) > limit
+        reviews = reviews[:limit]
+        
+        # Names are stored with new reviews; older ones are resolved in one batched lookup
+        missing = {review["student_id"] for review in reviews if not review.get("student_name")}
+        if missing:
+            students = await db.users.find(
+                {"id": {"$in": list(missing)}},
+                {"_id": 0, "id": 1, "first_name": 1, "last_name": 1}
+            ).to_list(length=None)
+            names = {student["id"]: f"{student['first_name']} {student['last_name']}" for student in students}
+            for review in reviews:
+                if not review.get("student_name"):
+                    review["student_name"] = names.get(review["student_id"], "Anonymous")
+        
+        return {
+            "reviews": serialize_doc(reviews),
+            "next_cursor": encode_review_cursor(reviews[-1]) if has_more else None,
+            **summary
+        }
     
     except Exception as e:
         logger.error(f"Get school reviews error: {str(e)}")
@@ -3616,27 +6757,11 @@ async def complete_course_session(
         if current_user["role"] not in ["student", "teacher", "manager"]:
             raise HTTPException(status_code=403, detail="Unauthorized to complete sessions")
         
-        # Get course
-        course = await db.courses.find_one({"id": course_id})
+        # Increment completed sessions and check completion atomically
+        course = await record_course_session_completed(course_id)
         if not course:
             raise HTTPException(status_code=404, detail="Course not found")
         
-        # Increment completed sessions
-        new_completed = course["completed_sessions"] + 1
-        
-        # Update course
-        update_data = {
-            "completed_sessions": new_completed,
-            "updated_at": datetime.utcnow()
-        }
-        
-        # Check if course is completed
-        if new_completed >= course["total_sessions"]:
-            update_data["status"] = CourseStatus.COMPLETED
-            update_data["exam_status"] = ExamStatus.AVAILABLE
-        
-        await db.courses.update_one({"id": course_id}, {"$set": update_data})
-        
         # Update course availability
         await update_course_availability(course["enrollment_id"])
         
@@ -3681,6 +6806,7 @@ async def take_course_exam(
                 }
             }
         )
+        invalidate_dashboards(f"enrollment:{course['enrollment_id']}")
         
         # Update course availability for next course
         if passed:
@@ -3705,62 +6831,82 @@ async def get_dashboard(
         if current_user["role"] != role:
             raise HTTPException(status_code=403, detail="Role mismatch")
         
-        dashboard_data = {}
+        plan = QueryPlan()
+        user_id = current_user["id"]
         
-        if role == "student":
-            # Get student's enrollments with courses
-            enrollments_cursor = db.enrollments.find({"student_id": current_user["id"]})
-            enrollments = await enrollments_cursor.to_list(length=None)
+        async def build():
+            dashboard_data = {}
+            tags = [f"user:{user_id}"]
             
-            for enrollment in enrollments:
-                # Get school details
-                school = await db.driving_schools.find_one({"id": enrollment["driving_school_id"]})
-                enrollment["school_name"] = school["name"] if school else "Unknown School"
+            if role == "student":
+                # Get student's enrollments with courses
+                enrollments = (await plan.stage(
+                    enrollments=db.enrollments.find({"student_id": user_id}).to_list(length=None)
+                ))["enrollments"]
                 
-                # Get courses
-                courses_cursor = db.courses.find({"enrollment_id": enrollment["id"]})
-                courses = await courses_cursor.to_list(length=None)
-                enrollment["courses"] = serialize_doc(courses)
-            
-            dashboard_data["enrollments"] = serialize_doc(enrollments)
-            
-        elif role == "teacher":
-            # Get teacher's school and students
-            teacher = await db.teachers.find_one({"user_id": current_user["id"]})
-            if teacher:
-                school = await db.driving_schools.find_one({"id": teacher["driving_school_id"]})
-                dashboard_data["school"] = serialize_doc(school)
+                # Schools and courses for all enrollments, batched and fetched together
+                related = await plan.stage(
+                    schools=find_by_ids(
+                        db.driving_schools,
+                        [enrollment["driving_school_id"] for enrollment in enrollments],
+                        {"_id": 0, "id": 1, "name": 1}
+                    ),
+                    courses=db.courses.find(
+                        {"enrollment_id": {"$in": [enrollment["id"] for enrollment in enrollments]}}
+                    ).to_list(length=None)
+                )
+                courses_by_enrollment = {}
+                for course in related["courses"]:
+                    courses_by_enrollment.setdefault(course["enrollment_id"], []).append(course)
                 
-                # Get assigned sessions
-                sessions_cursor = db.sessions.find({"teacher_id": teacher["id"]})
-                sessions = await sessions_cursor.to_list(length=None)
-                dashboard_data["sessions"] = serialize_doc(sessions)
-            
-        elif role == "manager":
-            # Get manager's school
-            school = await db.driving_schools.find_one({"manager_id": current_user["id"]})
-            if school:
-                dashboard_data["school"] = serialize_doc(school)
+                for enrollment in enrollments:
+                    school = related["schools"].get(enrollment["driving_school_id"])
+                    enrollment["school_name"] = school["name"] if school else "Unknown School"
+                    enrollment["courses"] = serialize_doc(courses_by_enrollment.get(enrollment["id"], []))
+                    tags.append(f"enrollment:{enrollment['id']}")
                 
-                # Get enrollments
-                enrollments_cursor = db.enrollments.find({"driving_school_id": school["id"]})
-                enrollments = await enrollments_cursor.to_list(length=None)
                 dashboard_data["enrollments"] = serialize_doc(enrollments)
+                tags.extend(f"school:{school_id}" for school_id in related["schools"])
                 
-                # Get teachers
-                teachers_cursor = db.teachers.find({"driving_school_id": school["id"]})
-                teachers = await teachers_cursor.to_list(length=None)
-                dashboard_data["teachers"] = serialize_doc(teachers)
-        
-        elif role == "external_expert":
-            # Get expert's exams
-            expert = await db.external_experts.find_one({"user_id": current_user["id"]})
-            if expert:
-                exams_cursor = db.exam_schedules.find({"external_expert_id": expert["id"]})
-                exams = await exams_cursor.to_list(length=None)
-                dashboard_data["exams"] = serialize_doc(exams)
+            elif role == "teacher":
+                # Get teacher's school and students
+                teacher = (await plan.stage(teacher=db.teachers.find_one({"user_id": user_id})))["teacher"]
+                if teacher:
+                    related = await plan.stage(
+                        school=db.driving_schools.find_one({"id": teacher["driving_school_id"]}),
+                        sessions=db.sessions.find({"teacher_id": teacher["id"]}).to_list(length=None)
+                    )
+                    dashboard_data["school"] = serialize_doc(related["school"])
+                    dashboard_data["sessions"] = serialize_doc(related["sessions"])
+                    tags.extend([f"teacher:{teacher['id']}", f"school:{teacher['driving_school_id']}"])
+                
+            elif role == "manager":
+                # Get manager's school
+                school = (await plan.stage(school=db.driving_schools.find_one({"manager_id": user_id})))["school"]
+                if school:
+                    dashboard_data["school"] = serialize_doc(school)
+                    
+                    related = await plan.stage(
+                        enrollments=db.enrollments.find({"driving_school_id": school["id"]}).to_list(length=None),
+                        teachers=db.teachers.find({"driving_school_id": school["id"]}).to_list(length=None)
+                    )
+                    dashboard_data["enrollments"] = serialize_doc(related["enrollments"])
+                    dashboard_data["teachers"] = serialize_doc(related["teachers"])
+                    tags.append(f"school:{school['id']}")
+            
+            elif role == "external_expert":
+                # Get expert's exams
+                expert = (await plan.stage(expert=db.external_experts.find_one({"user_id": user_id})))["expert"]
+                if expert:
+                    exams = (await plan.stage(
+                        exams=db.exam_schedules.find({"external_expert_id": expert["id"]}).to_list(length=None)
+                    ))["exams"]
+                    dashboard_data["exams"] = serialize_doc(exams)
+                    tags.append(f"expert:{expert['id']}")
+            
+            return dashboard_data, tags
         
-        return dashboard_data
+        return await dashboard_snapshot_response((role, user_id), build, plan)
     
     except Exception as e:
         logger.error(f"Get dashboard error: {str(e)}")
@@ -3787,8 +6933,10 @@ async def complete_payment(
         # Simulate payment completion
         await db.enrollments.update_one(
             {"id": enrollment_id},
-            {"$set": {"enrollment_status": EnrollmentStatus.PENDING_APPROVAL}}
+            {"$set": {"enrollment_status": EnrollmentStatus.PENDING_APPROVAL, "updated_at": datetime.utcnow()}}
         )
+        invalidate_school_analytics(enrollment["driving_school_id"])
+        invalidate_dashboards(f"user:{current_user['id']}", f"school:{enrollment['driving_school_id']}")
         
         # Create notification for manager
         school = await db.driving_schools.find_one({"id": enrollment["driving_school_id"]})
@@ -3803,7 +6951,7 @@ async def complete_payment(
                 "metadata": {"enrollment_id": enrollment_id},
                 "created_at": datetime.utcnow()
             }
-            await db.notifications.insert_one(notification_doc)
+            await create_notification(notification_doc)
         
         return {"message": "Payment completed successfully"}
     
@@ -3829,30 +6977,61 @@ async def get_user_documents(current_user = Depends(get_current_user)):
             raise e
         raise HTTPException(status_code=500, detail="Failed to retrieve documents")
 
+ENROLLMENT_SCHOOL_FIELDS = {"school_name": "name", "school_address": "address", "school_price": "price"}
+ENROLLMENT_LIST_FIELDS = frozenset({
+    "id", "student_id", "driving_school_id", "enrollment_status", "created_at", "approved_at",
+    "approved_by", "rejected_at", "rejection_reason", "documents_completed_at", "courses",
+    *ENROLLMENT_SCHOOL_FIELDS
+})
+
 @api_router.get("/enrollments/my")
-async def get_my_enrollments_fixed(current_user = Depends(get_current_user)):
+async def get_my_enrollments_fixed(fields: Optional[str] = None, current_user = Depends(get_current_user)):
     try:
         if current_user["role"] != "student":
             raise HTTPException(status_code=403, detail="Only students can view enrollments")
         
-        # Get student's enrollments
-        enrollments_cursor = db.enrollments.find({"student_id": current_user["id"]})
+        selected = parse_fields_param(fields, ENROLLMENT_LIST_FIELDS)
+        school_fields = [
+            field for field in ENROLLMENT_SCHOOL_FIELDS if selected is None or field in selected
+        ]
+        include_courses = selected is None or "courses" in selected
+        
+        # Get student's enrollments; the joined fields are not stored on the enrollment
+        stored = None if selected is None else [
+            field for field in selected if field != "courses" and field not in ENROLLMENT_SCHOOL_FIELDS
+        ]
+        enrollments_cursor = db.enrollments.find(
+            {"student_id": current_user["id"]},
+            fields_projection(stored, ("driving_school_id",) if school_fields else ())
+        )
         enrollments = await enrollments_cursor.to_list(length=None)
         
-        # Get school details for each enrollment
+        # School details and courses for all enrollments, only when asked for
+        schools = {}
+        if school_fields:
+            schools = await find_by_ids(
+                db.driving_schools,
+                [enrollment["driving_school_id"] for enrollment in enrollments],
+                {"_id": 0, "id": 1, **{ENROLLMENT_SCHOOL_FIELDS[field]: 1 for field in school_fields}}
+            )
+        courses = []
+        if include_courses and enrollments:
+            courses = await db.courses.find(
+                {"enrollment_id": {"$in": [enrollment["id"] for enrollment in enrollments]}}, {"_id": 0}
+            ).to_list(length=None)
+        courses_by_enrollment = {}
+        for course in courses:
+            courses_by_enrollment.setdefault(course["enrollment_id"], []).append(course)
+        
         for enrollment in enrollments:
-            school = await db.driving_schools.find_one({"id": enrollment["driving_school_id"]})
+            school = schools.get(enrollment.get("driving_school_id"))
             if school:
-                enrollment["school_name"] = school["name"]
-                enrollment["school_address"] = school["address"]
-                enrollment["school_price"] = school["price"]
-            
-            # Get courses for this enrollment
-            courses_cursor = db.courses.find({"enrollment_id": enrollment["id"]})
-            courses = await courses_cursor.to_list(length=None)
-            enrollment["courses"] = serialize_doc(courses)
+                for field in school_fields:
+                    enrollment[field] = school[ENROLLMENT_SCHOOL_FIELDS[field]]
+            if include_courses:
+                enrollment["courses"] = serialize_doc(courses_by_enrollment.get(enrollment["id"], []))
         
-        return serialize_doc(enrollments)
+        return serialize_doc(select_fields(enrollments, selected))
     
     except Exception as e:
         logger.error(f"Get enrollments error: {str(e)}")
@@ -3880,6 +7059,7 @@ async def verify_document(
             {"id": document_id},
             {"$set": {"is_verified": is_verified}}
         )
+        invalidate_dashboards(f"user:{document['user_id']}")
         
         # If document was verified, check if all documents are now verified for this user
         if is_verified:
@@ -3939,6 +7119,7 @@ async def accept_document(
                 "reviewed_by": current_user["id"]
             }}
         )
+        invalidate_dashboards(f"user:{document['user_id']}")
         
         # Check if all required documents are now accepted for this user using enhanced function
         document_owner = await db.users.find_one({"id": document["user_id"]})
@@ -3958,21 +7139,27 @@ async def accept_document(
                 # Update pending enrollments to pending_approval status
                 logger.info(f"Updating enrollment status for student {document['user_id']}")
                 
+                pending_query = {
+                    "student_id": document["user_id"],
+                    "enrollment_status": EnrollmentStatus.PENDING_APPROVAL
+                }
+                school_ids = await db.enrollments.distinct("driving_school_id", pending_query)
+                now = datetime.utcnow()
                 update_result = await db.enrollments.update_many(
-                    {
-                        "student_id": document["user_id"],
-                        "enrollment_status": EnrollmentStatus.PENDING_APPROVAL
-                    },
+                    pending_query,
                     {
                         "$set": {
                             "enrollment_status": EnrollmentStatus.PENDING_APPROVAL,
-                            "documents_completed_at": datetime.utcnow(),
-                            "status_updated_by": current_user["id"]
+                            "documents_completed_at": now,
+                            "status_updated_by": current_user["id"],
+                            "updated_at": now
                         }
                     }
                 )
                 
                 logger.info(f"Updated {update_result.modified_count} enrollments to pending_approval")
+                # Managers' dashboards list these enrollments too
+                invalidate_dashboards(*(f"school:{school_id}" for school_id in school_ids))
                 
                 # Send notification to student
                 if update_result.modified_count > 0:
@@ -3985,7 +7172,7 @@ async def accept_document(
                         "is_read": False,
                         "created_at": datetime.utcnow()
                     }
-                    await db.notifications.insert_one(notification_doc)
+                    await create_notification(notification_doc)
                     logger.info(f"Notification sent to student {document['user_id']}")
             else:
                 logger.info(f"Documents not yet complete for student {document['user_id']}")
@@ -4042,6 +7229,7 @@ async def refuse_document(
             {"id": document_id},
             {"$set": {"status": "refused", "refusal_reason": reason, "is_verified": False}}
         )
+        invalidate_dashboards(f"user:{document['user_id']}")
         
         # Send notification to student about document refusal
         notification_doc = {
@@ -4054,7 +7242,7 @@ async def refuse_document(
             "metadata": {"document_id": document_id, "document_type": document['document_type'], "reason": reason},
             "created_at": datetime.utcnow()
         }
-        await db.notifications.insert_one(notification_doc)
+        await create_notification(notification_doc)
         
         return {"message": "Document refused successfully"}
     
@@ -4203,17 +7391,25 @@ async def check_and_generate_certificate(enrollment_id: str):
                 # Generate certificate
                 cert_id = str(uuid.uuid4())
                 cert_number = f"DZ-{student['state'][:3].upper()}-{int(datetime.utcnow().timestamp())}"
+                student_name = f"{student['first_name']} {student['last_name']}"
+                issue_date = datetime.utcnow()
+                expiry_date = issue_date + timedelta(days=5*365)  # 5 years
+                
+                # Signed token lets checkpoints verify the QR code without a database hit
+                verification_token = sign_certificate_token(cert_number, student_name, issue_date, expiry_date)
                 
                 certificate_doc = {
                     "id": cert_id,
                     "student_id": enrollment["student_id"],
+                    "student_name": student_name,
                     "enrollment_id": enrollment_id,
                     "certificate_number": cert_number,
-                    "issue_date": datetime.utcnow(),
-                    "expiry_date": datetime.utcnow() + timedelta(days=5*365),  # 5 years
+                    "issue_date": issue_date,
+                    "expiry_date": expiry_date,
                     "status": CertificateStatus.GENERATED,
                     "pdf_url": None,
-                    "qr_code": None,
+                    "verification_token": verification_token,
+                    "qr_code": await generate_qr_code(certificate_qr_payload(verification_token)),
                     "created_at": datetime.utcnow()
                 }
                 
@@ -4230,7 +7426,7 @@ async def check_and_generate_certificate(enrollment_id: str):
                     "metadata": {"certificate_id": cert_id, "certificate_number": cert_number},
                     "created_at": datetime.utcnow()
                 }
-                await db.notifications.insert_one(notification_doc)
+                await create_notification(notification_doc)
                 
                 return cert_id
         
@@ -4273,10 +7469,13 @@ async def complete_exam_updated(
                 "$set": {
                     "status": ExamStatus.PASSED if passed else ExamStatus.FAILED,
                     "score": score,
-                    "notes": notes
+                    "notes": notes,
+                    "updated_at": datetime.utcnow()
                 }
             }
         )
+        await record_exam_result(exam, passed)
+        invalidate_dashboards(f"expert:{expert['id']}")
         
         # Update course exam status
         await db.courses.update_one(
@@ -4292,6 +7491,8 @@ async def complete_exam_updated(
         
         # Update course availability for next course
         course = await db.courses.find_one({"id": exam["course_id"]})
+        if course:
+            invalidate_dashboards(f"enrollment:{course['enrollment_id']}")
         if course and passed:
             await update_course_availability(course["enrollment_id"])
             
@@ -4513,6 +7714,8 @@ async def remove_teacher(teacher_id: str, current_user: dict = Depends(get_curre
     
     # Remove teacher
     await db.teachers.delete_one({"id": teacher_id})
+    invalidate_school_analytics(school["id"])
+    invalidate_dashboards(f"user:{teacher['user_id']}", f"school:{school['id']}", f"teacher:{teacher_id}")
     
     # Update user role back to guest or student if they have enrollments
     user = await db.users.find_one({"id": teacher["user_id"]})
@@ -4613,6 +7816,8 @@ async def add_teacher_enhanced(
     }
     
     await db.teachers.insert_one(teacher_data)
+    invalidate_school_analytics(school["id"])
+    invalidate_dashboards(f"user:{user_id}", f"school:{school['id']}")
     
     # Get the created teacher with user info for response
     teacher = await db.teachers.find_one({"id": teacher_id})
@@ -4713,8 +7918,285 @@ async def get_student_enrollment_status(
             raise e
         raise HTTPException(status_code=500, detail="Failed to get enrollment status")
 
+# BACKGROUND TASKS AND STARTUP
+
+background_tasks: List[asyncio.Task] = []
+
+# ANALYTICS EXPORT
+
+EXPORT_DIR = Path(os.environ.get('EXPORT_DIR', 'exports'))
+EXPORT_BATCH_SIZE = 5000
+EXPORT_INTERVAL_SECONDS = int(os.environ.get('EXPORT_INTERVAL_SECONDS', '0'))  # 0 disables scheduled exports
+# Writers stamp updated_at before their write commits, so the window stops short of "now" to let
+# in-flight writes land; anything stamped after it is picked up by the next run
+EXPORT_WATERMARK_LAG_SECONDS = float(os.environ.get('EXPORT_WATERMARK_LAG_SECONDS', '60'))
+
+_timestamp = pa.timestamp("ms")
+
+# Explicit schemas keep column types stable across files, whatever the documents look like
+EXPORT_TABLES = {
+    "enrollments": {
+        "watermark_fields": ("updated_at", "created_at"),
+        "schema": pa.schema([
+            ("id", pa.string()),
+            ("student_id", pa.string()),
+            ("driving_school_id", pa.string()),
+            ("enrollment_status", pa.string()),
+            ("created_at", _timestamp),
+            ("approved_at", _timestamp),
+            ("updated_at", _timestamp)
+        ])
+    },
+    "sessions": {
+        "watermark_fields": ("updated_at", "created_at"),
+        "schema": pa.schema([
+            ("id", pa.string()),
+            ("series_id", pa.string()),
+            ("course_id", pa.string()),
+            ("teacher_id", pa.string()),
+            ("student_id", pa.string()),
+            ("driving_school_id", pa.string()),
+            ("session_type", pa.string()),
+            ("scheduled_at", _timestamp),
+            ("duration_minutes", pa.int32()),
+            ("status", pa.string()),
+            ("created_at", _timestamp),
+            ("updated_at", _timestamp)
+        ])
+    },
+    "quiz_attempts": {
+        "watermark_fields": ("completed_at",),
+        "schema": pa.schema([
+            ("id", pa.string()),
+            ("quiz_id", pa.string()),
+            ("quiz_version", pa.int32()),
+            ("student_id", pa.string()),
+            ("score", pa.float64()),
+            ("passed", pa.bool_()),
+            ("answer_codes", pa.binary()),
+            ("correct_bitmap", pa.binary()),
+            ("started_at", _timestamp),
+            ("completed_at", _timestamp),
+            ("time_taken_minutes", pa.int32())
+        ])
+    },
+    "exam_schedules": {
+        "watermark_fields": ("updated_at", "created_at"),
+        "schema": pa.schema([
+            ("id", pa.string()),
+            ("course_id", pa.string()),
+            ("student_id", pa.string()),
+            ("external_expert_id", pa.string()),
+            ("driving_school_id", pa.string()),
+            ("exam_type", pa.string()),
+            ("scheduled_at", _timestamp),
+            ("status", pa.string()),
+            ("score", pa.float64()),
+            ("created_at", _timestamp),
+            ("updated_at", _timestamp)
+        ])
+    },
+    "reviews": {
+        "watermark_fields": ("updated_at", "created_at"),
+        "schema": pa.schema([
+            ("id", pa.string()),
+            ("student_id", pa.string()),
+            ("enrollment_id", pa.string()),
+            ("driving_school_id", pa.string()),
+            ("teacher_id", pa.string()),
+            ("rating", pa.int32()),
+            ("comment", pa.string()),
+            ("created_at", _timestamp)
+        ])
+    }
+}
+
+def export_window_query(watermark_fields: Tuple[str, ...], since: Optional[datetime], until: datetime) -> dict:
+    """Match documents whose first present watermark field falls in (since, until]"""
+    window = {"$lte": until}
+    if since:
+        window["$gt"] = since
+    clauses = []
+    for i, field in enumerate(watermark_fields):
+        clause = {field: dict(window)}
+        for earlier in watermark_fields[:i]:
+            clause[earlier] = None  # Matches missing or null, so the coalesce falls through
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+def export_batch_table(rows: List[dict], schema: pa.Schema) -> pa.Table:
+    columns = {field.name: [row.get(field.name) for row in rows] for field in schema}
+    return pa.Table.from_pydict(columns, schema=schema)
+
+async def export_collection_to_parquet(collection_name: str, full: bool = False) -> dict:
+    """Stream one collection (or its changes since the last watermark) into a Parquet file"""
+    config = EXPORT_TABLES[collection_name]
+    schema = config["schema"]
+    started = time.perf_counter()
+    until = datetime.utcnow() - timedelta(seconds=EXPORT_WATERMARK_LAG_SECONDS)
+    
+    state = None if full else await db.export_watermarks.find_one({"_id": collection_name})
+    since = state["watermark"] if state else None
+    query = export_window_query(config["watermark_fields"], since, until)
+    projection = {"_id": 0, **{field.name: 1 for field in schema}}
+    
+    target_dir = EXPORT_DIR / collection_name
+    target_dir.mkdir(parents=True, exist_ok=True)
+    mode = "full" if since is None else "incremental"
+    target = target_dir / f"{collection_name}-{mode}-{until.strftime('%Y%m%dT%H%M%S')}.parquet"
+    partial = target.with_suffix(".parquet.partial")
+    
+    rows_written = 0
+    writer = pq.ParquetWriter(partial, schema, compression="zstd")
+    try:
+        batch = []
+        cursor = db[collection_name].find(query, projection).batch_size(EXPORT_BATCH_SIZE)
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                # Only one batch is ever held in memory; encoding runs off the event loop
+                await asyncio.to_thread(writer.write_table, export_batch_table(batch, schema))
+                rows_written += len(batch)
+                batch = []
+        if batch:
+            await asyncio.to_thread(writer.write_table, export_batch_table(batch, schema))
+            rows_written += len(batch)
+    except Exception:
+        writer.close()
+        partial.unlink(missing_ok=True)
+        raise
+    writer.close()
+    partial.rename(target)
+    
+    # Advance the watermark only once the file is safely in place
+    elapsed = time.perf_counter() - started
+    await db.export_watermarks.update_one(
+        {"_id": collection_name},
+        {"$set": {
+            "watermark": until,
+            "last_file": str(target),
+            "last_rows": rows_written,
+            "updated_at": datetime.utcnow()
+        }},
+        upsert=True
+    )
+    
+    return {
+        "collection": collection_name,
+        "mode": mode,
+        "since": since.isoformat() if since else None,
+        "until": until.isoformat(),
+        "rows": rows_written,
+        "file": str(target),
+        "bytes": target.stat().st_size,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(rows_written / elapsed, 1) if elapsed else None
+    }
+
+async def export_analytics(collections: Optional[List[str]] = None, full: bool = False) -> List[dict]:
+    reports = []
+    for collection_name in collections or list(EXPORT_TABLES):
+        if collection_name not in EXPORT_TABLES:
+            raise ValueError(f"Unknown export collection: {collection_name}")
+        reports.append(await export_collection_to_parquet(collection_name, full=full))
+    return reports
+
+async def scheduled_analytics_export():
+    while True:
+        await asyncio.sleep(EXPORT_INTERVAL_SECONDS)
+        try:
+            for report in await export_analytics():
+                logger.info(
+                    f"Exported {report['rows']} {report['collection']} rows "
+                    f"({report['rows_per_second']} rows/s) to {report['file']}"
+                )
+        except Exception as e:
+            logger.error(f"Analytics export error: {str(e)}")
+
+async def ensure_indexes():
+    """Create the indexes hot paths rely on (idempotent)"""
+    await db.certificates.create_index("id")
+    await db.certificates.create_index("certificate_number")
+    await db.certificates.create_index("status")
+    await db.curriculum_templates.create_index([("driving_school_id", 1), ("version", -1)], unique=True)
+    await db.sessions.create_index("id")
+    await db.sessions.create_index([("teacher_id", 1), ("scheduled_at", 1)])
+    await db.sessions.create_index([("student_id", 1), ("scheduled_at", 1)])
+    await db.session_reservations.create_index("session_id")
+    await db.teacher_availability.create_index("teacher_id", unique=True)
+    await db.external_experts.create_index("user_id")
+    await db.external_experts.create_index("available_states")
+    await db.expert_exam_load.create_index([("expert_id", 1), ("date", 1)])
+    await db.exam_schedules.create_index("id")
+    await db.exam_schedules.create_index([("student_id", 1), ("scheduled_at", 1)])
+    await db.exam_schedules.create_index([("external_expert_id", 1), ("scheduled_at", 1)])
+    await db.calendar_feeds.create_index("token_hash", unique=True)
+    await db.calendar_feeds.create_index("user_id", unique=True)
+    await db.session_reservations.create_index("expires_at", expireAfterSeconds=0)
+    await db.quizzes.create_index("id")
+    await db.courses.create_index("enrollment_id")
+    await db.enrollments.create_index("student_id")
+    await db.documents.create_index("user_id")
+    await db.notifications.create_index([("user_id", 1), ("created_at", -1)])
+    await db.quiz_attempts.create_index("quiz_id")
+    await db.quiz_attempts.create_index(
+        [("student_id", 1), ("client_attempt_id", 1)],
+        unique=True,
+        partialFilterExpression={"client_attempt_id": {"$type": "string"}}
+    )
+    await db.quizzes.create_index([("is_active", 1), ("course_type", 1), ("difficulty", 1), ("created_at", -1)])
+    await db.driving_schools.create_index("manager_id")
+    await db.enrollments.create_index([("driving_school_id", 1), ("enrollment_status", 1)])
+    await db.teachers.create_index("driving_school_id")
+    await db.reviews.create_index([("driving_school_id", 1), ("created_at", -1), ("id", -1)])
+    await db.reviews.create_index("teacher_id")
+    await db.school_daily_rollups.create_index([("driving_school_id", 1), ("day", 1)])
+    for collection_name, config in EXPORT_TABLES.items():
+        for field in config["watermark_fields"]:
+            await db[collection_name].create_index(field)
+    await db.video_rooms.create_index([("is_active", 1), ("scheduled_at", 1), ("id", 1)])
+    await db.video_rooms.create_index([("teacher_id", 1), ("is_active", 1)])
+    await db.video_rooms.create_index([("student_id", 1), ("is_active", 1)])
+    # Last, as it fails on legacy duplicate reviews until they are cleaned up
+    await db.reviews.create_index([("student_id", 1), ("enrollment_id", 1)], unique=True)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        logger.error(f"Index creation error: {str(e)}")
+    
+    background_tasks.append(asyncio.create_task(certificate_revocation_refresher()))
+    background_tasks.append(asyncio.create_task(video_room_reaper()))
+    background_tasks.append(asyncio.create_task(rating_reconciler()))
+    if EXPORT_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(scheduled_analytics_export()))
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in background_tasks:
+        task.cancel()
+
 app.include_router(api_router)
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate-quiz-attempts":
+        # python server.py migrate-quiz-attempts
+        print(json.dumps(asyncio.run(migrate_quiz_attempts_to_compact()), indent=2))
+    elif len(sys.argv) > 1 and sys.argv[1] == "export-parquet":
+        # python server.py export-parquet [--full] [collection ...]
+        export_args = sys.argv[2:]
+        print(json.dumps(asyncio.run(export_analytics(
+            [arg for arg in export_args if arg != "--full"] or None,
+            full="--full" in export_args
+        )), indent=2))
+    elif len(sys.argv) > 1 and sys.argv[1] == "reconcile-ratings":
+        # python server.py reconcile-ratings [--dry-run]
+        print(json.dumps(asyncio.run(reconcile_review_ratings(fix="--dry-run" not in sys.argv)), indent=2))
+    elif len(sys.argv) > 1 and sys.argv[1] == "backfill-rollups":
+        # python server.py backfill-rollups [school_id]
+        print(json.dumps(asyncio.run(backfill_school_rollups(sys.argv[2] if len(sys.argv) > 2 else None)), indent=2))
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -0,0 +1,52 @@
+import contextlib
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+# server.py lives in backend/ and is not an installed package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: timing checks for hot paths; deselect with -m 'not benchmark'")
+
+
+@pytest.fixture
+def mongo_url():
+    """URL of a MongoDB server for integration tests; skips the test when none is reachable"""
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    url = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+    probe = MongoClient(url, serverSelectionTimeoutMS=500)
+    try:
+        probe.admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"MongoDB not reachable at {url}")
+    finally:
+        probe.close()
+    return url
+
+
+@pytest.fixture
+def scratch_database(mongo_url, monkeypatch):
+    """Async context manager that points server.db at a throwaway database"""
+    import server
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    @contextlib.asynccontextmanager
+    async def open_database():
+        # Motor binds to the running loop, so the client is created inside the test's loop
+        client = AsyncIOMotorClient(mongo_url)
+        database = client[f"test_{uuid.uuid4().hex[:12]}"]
+        monkeypatch.setattr(server, "db", database)
+        try:
+            yield database
+        finally:
+            await client.drop_database(database.name)
+            client.close()
+
+    return open_database
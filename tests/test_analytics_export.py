@@ -0,0 +1,50 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pyarrow.parquet as pq
+
+import server
+from server import EnrollmentStatus
+
+
+def enrollment(enrollment_id, stamp):
+    return {
+        "id": enrollment_id, "student_id": "s1", "driving_school_id": "school-1",
+        "enrollment_status": EnrollmentStatus.PENDING_APPROVAL, "created_at": stamp, "updated_at": stamp
+    }
+
+
+def test_window_query_falls_back_to_later_watermark_fields():
+    until = datetime(2025, 3, 2, 12)
+    since = until - timedelta(hours=1)
+    assert server.export_window_query(("completed_at",), None, until) == {"completed_at": {"$lte": until}}
+    assert server.export_window_query(("updated_at", "created_at"), since, until) == {"$or": [
+        {"updated_at": {"$lte": until, "$gt": since}},
+        {"created_at": {"$lte": until, "$gt": since}, "updated_at": None}
+    ]}
+
+
+def test_incremental_export_picks_up_a_late_committed_row(scratch_database, monkeypatch, tmp_path):
+    monkeypatch.setattr(server, "EXPORT_DIR", tmp_path)
+    monkeypatch.setattr(server, "EXPORT_WATERMARK_LAG_SECONDS", 0.5)
+
+    async def scenario():
+        async with scratch_database() as database:
+            await database.enrollments.insert_one(enrollment("early", datetime.utcnow() - timedelta(minutes=5)))
+
+            first = await server.export_collection_to_parquet("enrollments")
+            assert (first["mode"], first["rows"]) == ("full", 1)
+
+            # Stamped by its writer just before the first export ran, committed only after it finished
+            stamped_at = datetime.utcnow() - timedelta(seconds=0.2)
+            await database.enrollments.insert_one(enrollment("late", stamped_at))
+            await asyncio.sleep(0.6)
+
+            second = await server.export_collection_to_parquet("enrollments")
+            assert (second["mode"], second["rows"]) == ("incremental", 1)
+            assert pq.read_table(second["file"]).column("id").to_pylist() == ["late"]
+
+            third = await server.export_collection_to_parquet("enrollments")
+            assert third["rows"] == 0
+
+    asyncio.run(scenario())
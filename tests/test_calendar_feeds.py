@@ -0,0 +1,44 @@
+import asyncio
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import server
+
+
+def bearer(payload):
+    token = jwt.encode(payload, server.SECRET_KEY, algorithm=server.ALGORITHM)
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def test_scoped_tokens_are_not_api_sessions():
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(server.get_current_user(bearer({"sub": "user-1", "scope": "calendar"})))
+    assert raised.value.status_code == 401
+
+
+def test_feed_tokens_are_opaque_rotatable_and_revocable(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            await database.users.insert_one({"id": "user-1", "role": "student"})
+            user = {"id": "user-1", "role": "student"}
+
+            first = await server.issue_calendar_feed_urls(user)
+            first_token = first["sessions_url"].split("/")[3]
+            assert (await server.get_calendar_feed_user(first_token))["id"] == "user-1"
+            with pytest.raises(jwt.PyJWTError):
+                jwt.decode(first_token, server.SECRET_KEY, algorithms=[server.ALGORITHM])
+            assert await database.calendar_feeds.count_documents({"token_hash": first_token}) == 0
+
+            second_token = (await server.issue_calendar_feed_urls(user))["sessions_url"].split("/")[3]
+            with pytest.raises(HTTPException):
+                await server.get_calendar_feed_user(first_token)
+            assert (await server.get_calendar_feed_user(second_token))["id"] == "user-1"
+
+            await server.revoke_calendar_feed_urls(user)
+            with pytest.raises(HTTPException):
+                await server.get_calendar_feed_user(second_token)
+
+    asyncio.run(scenario())
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+from server import CertificateStatus
+
+
+def test_token_round_trip():
+    issued = datetime(2025, 3, 1)
+    token = server.sign_certificate_token("DZ-2025-0001", "Amina  Benali", issued, issued + timedelta(days=365))
+    claims = server.decode_certificate_token(token)
+    assert claims["certificate_number"] == "DZ-2025-0001"
+    assert claims["issue_date"] == issued
+    assert claims["name_hash"] == server.hash_certificate_name("amina benali")
+
+
+def test_tampered_token_is_rejected():
+    token = server.sign_certificate_token("DZ-2025-0001", "Amina Benali", datetime(2025, 3, 1))
+    signature = token.split(".")[1]
+    forged = server.sign_certificate_token("DZ-2025-0002", "Amina Benali", datetime(2025, 3, 1)).split(".")[0]
+    with pytest.raises(ValueError):
+        server.decode_certificate_token(f"{forged}.{signature}")
+
+
+@pytest.mark.parametrize("status, valid", [
+    (CertificateStatus.GENERATED, True),
+    (CertificateStatus.ISSUED, True),
+    (CertificateStatus.REVOKED, False),
+    (CertificateStatus.ELIGIBLE, False),
+])
+def test_validity_depends_on_status(status, valid):
+    assert server.certificate_is_valid(status, None, datetime(2025, 6, 1)) is valid
+
+
+def test_expiry_day_is_still_valid():
+    expiry = datetime(2025, 6, 1, 0, 0)
+    assert server.certificate_is_valid(CertificateStatus.GENERATED, expiry, datetime(2025, 6, 1, 23, 59))
+    assert not server.certificate_is_valid(CertificateStatus.GENERATED, expiry, datetime(2025, 6, 2))
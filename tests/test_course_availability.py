@@ -0,0 +1,93 @@
+import asyncio
+import uuid
+
+from hypothesis import given, strategies as st
+
+import server
+from server import COURSE_SEQUENCE, CourseStatus, CourseType, ExamStatus
+
+course_states = st.fixed_dictionaries({
+    "status": st.sampled_from(list(CourseStatus)),
+    "exam_status": st.sampled_from(list(ExamStatus)),
+})
+
+# One course per type in the sequence, listed in any order, as the database returns them
+enrollments = st.lists(course_states, min_size=1, max_size=len(COURSE_SEQUENCE)).flatmap(
+    lambda states: st.permutations([
+        {"id": str(uuid.uuid4()), "course_type": course_type, **state}
+        for course_type, state in zip(COURSE_SEQUENCE, states)
+    ])
+)
+
+
+def legacy_availability(courses):
+    """The update_one-per-course loop that compute_course_availability replaced, run in memory"""
+    courses = sorted(courses, key=lambda course: COURSE_SEQUENCE.index(course["course_type"]))
+    statuses = {course["id"]: course["status"] for course in courses}
+    for i, course in enumerate(courses):
+        if i == 0:
+            if course["status"] == CourseStatus.LOCKED:
+                statuses[course["id"]] = CourseStatus.AVAILABLE
+        elif courses[i - 1]["exam_status"] == ExamStatus.PASSED:
+            if course["status"] == CourseStatus.LOCKED:
+                statuses[course["id"]] = CourseStatus.AVAILABLE
+        elif course["status"] != CourseStatus.LOCKED:
+            statuses[course["id"]] = CourseStatus.LOCKED
+    return statuses
+
+
+def apply(courses, changes):
+    return {course["id"]: changes.get(course["id"], course["status"]) for course in courses}
+
+
+@given(enrollments)
+def test_matches_legacy_loop(courses):
+    assert apply(courses, server.compute_course_availability(courses)) == legacy_availability(courses)
+
+
+@given(enrollments)
+def test_only_reports_real_changes(courses):
+    current = {course["id"]: course["status"] for course in courses}
+    for course_id, status in server.compute_course_availability(courses).items():
+        assert current[course_id] != status
+
+
+@given(enrollments)
+def test_is_idempotent(courses):
+    changes = server.compute_course_availability(courses)
+    updated = [{**course, "status": changes.get(course["id"], course["status"])} for course in courses]
+    assert server.compute_course_availability(updated) == {}
+
+
+@given(enrollments)
+def test_first_course_is_never_locked(courses):
+    first = min(courses, key=lambda course: COURSE_SEQUENCE.index(course["course_type"]))
+    assert apply(courses, server.compute_course_availability(courses))[first["id"]] != CourseStatus.LOCKED
+
+
+def test_update_course_availability_writes_once(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            enrollment_id = str(uuid.uuid4())
+            courses = [
+                {"id": "theory", "enrollment_id": enrollment_id, "course_type": CourseType.THEORY,
+                 "status": CourseStatus.COMPLETED, "exam_status": ExamStatus.PASSED},
+                {"id": "park", "enrollment_id": enrollment_id, "course_type": CourseType.PARK,
+                 "status": CourseStatus.LOCKED, "exam_status": ExamStatus.NOT_AVAILABLE},
+                {"id": "road", "enrollment_id": enrollment_id, "course_type": CourseType.ROAD,
+                 "status": CourseStatus.AVAILABLE, "exam_status": ExamStatus.NOT_AVAILABLE},
+            ]
+            await database.courses.insert_many(courses)
+            await server.update_course_availability(enrollment_id)
+            stored = {
+                course["id"]: course["status"]
+                async for course in database.courses.find({"enrollment_id": enrollment_id})
+            }
+            assert stored == {
+                "theory": CourseStatus.COMPLETED,
+                "park": CourseStatus.AVAILABLE,
+                "road": CourseStatus.LOCKED,
+            }
+
+    asyncio.run(scenario())
+
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+
+import server
+from server import DocumentType, EnrollmentStatus, SnapshotCache
+
+
+def counting_build(body=b"{}", tags=("school:1",)):
+    calls = []
+
+    async def build():
+        calls.append(time.monotonic())
+        await asyncio.sleep(0.01)
+        return body + str(len(calls)).encode(), list(tags)
+
+    return build, calls
+
+
+def test_miss_hit_stale_and_expiry():
+    async def scenario():
+        cache = SnapshotCache(ttl_seconds=0.05, stale_seconds=0.1)
+        build, calls = counting_build(b"v")
+
+        assert await cache.fetch("key", build) == (b"v1", "miss")
+        assert await cache.fetch("key", build) == (b"v1", "hit")
+
+        await asyncio.sleep(0.06)
+        # Past the TTL the old body is served while one refresh runs in the background
+        assert await cache.fetch("key", build) == (b"v1", "stale")
+        assert await cache.fetch("key", build) == (b"v1", "stale")
+        await asyncio.sleep(0.03)
+        assert len(calls) == 2
+        assert await cache.fetch("key", build) == (b"v2", "hit")
+
+        await asyncio.sleep(0.2)
+        assert cache.get("key") == (None, False)
+        assert await cache.fetch("key", build) == (b"v3", "miss")
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_misses_share_one_build():
+    async def scenario():
+        cache = SnapshotCache(ttl_seconds=60, stale_seconds=60)
+        build, calls = counting_build(b"v")
+
+        results = await asyncio.gather(*(cache.fetch("key", build) for _ in range(20)))
+
+        assert len(calls) == 1
+        assert set(results) == {(b"v1", "miss")}
+
+    asyncio.run(scenario())
+
+
+def test_invalidation_drops_only_tagged_entries():
+    async def scenario():
+        cache = SnapshotCache(ttl_seconds=60, stale_seconds=60)
+        school_build, _ = counting_build(b"a", tags=("school:1", "user:1"))
+        other_build, _ = counting_build(b"b", tags=("school:2",))
+        await cache.fetch("a", school_build)
+        await cache.fetch("b", other_build)
+
+        cache.invalidate_tags("school:1")
+
+        assert cache.get("a") == (None, False)
+        assert cache.get("b") == (b"b1", False)
+        assert "school:1" not in cache._tagged and "user:1" not in cache._tagged
+
+    asyncio.run(scenario())
+
+
+def test_build_racing_an_invalidation_is_served_but_not_cached():
+    async def scenario():
+        cache = SnapshotCache(ttl_seconds=60, stale_seconds=60)
+        reading = asyncio.Event()
+        release = asyncio.Event()
+        calls = []
+
+        async def build():
+            calls.append(1)
+            reading.set()
+            await release.wait()
+            return f"v{len(calls)}".encode(), ["school:1"]
+
+        fetch = asyncio.create_task(cache.fetch("key", build))
+        await reading.wait()
+        # A write lands after the build read its data but before it stored the result
+        cache.invalidate_tags("school:1")
+        release.set()
+
+        assert await fetch == (b"v1", "miss")
+        assert cache.get("key") == (None, False)
+        assert await cache.fetch("key", build) == (b"v2", "miss")
+        assert await cache.fetch("key", build) == (b"v2", "hit")
+
+    asyncio.run(scenario())
+
+
+def test_accepting_the_last_document_refreshes_the_manager_dashboard(scratch_database, monkeypatch):
+    monkeypatch.setattr(server, "dashboard_snapshots", SnapshotCache(60, 300))
+
+    async def scenario():
+        async with scratch_database() as database:
+            manager = {"id": "manager-1", "role": "manager"}
+            student_id = "student-1"
+            await database.users.insert_one({"id": student_id, "role": "student"})
+            await database.driving_schools.insert_one({"id": "school-1", "name": "Auto-école", "manager_id": manager["id"]})
+            await database.enrollments.insert_one({
+                "id": "enrollment-1", "student_id": student_id, "driving_school_id": "school-1",
+                "enrollment_status": EnrollmentStatus.PENDING_APPROVAL, "created_at": datetime.utcnow()
+            })
+            await database.documents.insert_many([
+                {"id": str(uuid.uuid4()), "user_id": student_id, "document_type": document_type.value,
+                 "status": "pending" if document_type == DocumentType.ID_CARD else "accepted"}
+                for document_type in server.REQUIRED_DOCUMENTS[server.UserRole.STUDENT]
+            ])
+            pending = await database.documents.find_one({"status": "pending"})
+
+            async def manager_dashboard():
+                response = await server.get_dashboard("manager", manager)
+                return json.loads(response.body), response.headers["Server-Timing"]
+
+            before, _ = await manager_dashboard()
+            assert "documents_completed_at" not in before["enrollments"][0]
+            _, timing = await manager_dashboard()
+            assert timing.startswith("cache;desc=hit")
+
+            await server.accept_document(pending["id"], manager)
+
+            after, timing = await manager_dashboard()
+            assert timing.startswith("cache;desc=miss")
+            assert after["enrollments"][0]["documents_completed_at"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import server
+
+MARCH = datetime(2025, 3, 3, 9)
+
+
+def day(n, start=MARCH):
+    return start + timedelta(days=n)
+
+
+def frames(enrollments, courses=(), exams=(), certificates=()):
+    return (
+        pd.DataFrame(list(enrollments), columns=["id", "created_at", "approved_at"]),
+        pd.DataFrame(list(courses), columns=["id", "enrollment_id"]),
+        pd.DataFrame(list(exams), columns=["course_id", "exam_type", "scheduled_at", "updated_at"]),
+        pd.DataFrame(list(certificates), columns=["enrollment_id", "issued_at"])
+    )
+
+
+def by_stage(summary):
+    return {stage["stage"]: stage for stage in summary["stages"]}
+
+
+def school_history():
+    enrollments = [
+        {"id": "e1", "created_at": day(0), "approved_at": day(2)},
+        {"id": "e2", "created_at": day(0), "approved_at": day(4)},
+        # Passed theory without ever being approved: must not count past "enrolled"
+        {"id": "e3", "created_at": day(1), "approved_at": None},
+        {"id": "e4", "created_at": day(0, datetime(2025, 4, 7)), "approved_at": day(1, datetime(2025, 4, 7))}
+    ]
+    courses = [{"id": f"{enrollment}-{kind}", "enrollment_id": enrollment}
+               for enrollment in ("e1", "e2", "e3") for kind in ("theory", "park", "road")]
+    exams = [
+        {"course_id": "e1-theory", "exam_type": "theory", "scheduled_at": day(9), "updated_at": day(12)},
+        {"course_id": "e1-theory", "exam_type": "theory", "scheduled_at": day(9), "updated_at": day(10)},
+        # No updated_at: the pass time falls back to the scheduled time
+        {"course_id": "e1-park", "exam_type": "park", "scheduled_at": day(20), "updated_at": None},
+        {"course_id": "e1-road", "exam_type": "road", "scheduled_at": day(29), "updated_at": day(30)},
+        {"course_id": "e2-theory", "exam_type": "theory", "scheduled_at": day(14), "updated_at": None},
+        {"course_id": "e3-theory", "exam_type": "theory", "scheduled_at": day(5), "updated_at": None},
+        {"course_id": "unknown-course", "exam_type": "theory", "scheduled_at": day(5), "updated_at": None}
+    ]
+    certificates = [{"enrollment_id": "e1", "issued_at": day(35)}]
+    return frames(enrollments, courses, exams, certificates)
+
+
+def test_stage_counts_are_gated_on_every_earlier_stage():
+    overall = by_stage(server.compute_enrollment_funnel(*school_history())["overall"])
+
+    assert {stage: overall[stage]["count"] for stage in server.FUNNEL_STAGES} == {
+        "enrolled": 4, "approved": 3, "theory_passed": 2, "park_passed": 1, "road_passed": 1, "certified": 1
+    }
+    assert overall["approved"]["conversion_from_previous"] == 75.0
+    assert overall["theory_passed"]["conversion_from_previous"] == 66.7
+    assert overall["certified"]["conversion_from_start"] == 25.0
+    assert overall["enrolled"]["conversion_from_previous"] == 100.0
+
+
+def test_median_days_between_stages():
+    overall = by_stage(server.compute_enrollment_funnel(*school_history())["overall"])
+
+    assert {stage: overall[stage]["median_days_from_previous"] for stage in server.FUNNEL_STAGES} == {
+        # e3's unapproved theory pass is excluded; e1's earliest theory pass is used
+        "enrolled": None, "approved": 2.0, "theory_passed": 9.0, "park_passed": 10.0,
+        "road_passed": 10.0, "certified": 5.0
+    }
+
+
+def test_cohorts_are_grouped_by_enrollment_month():
+    funnel = server.compute_enrollment_funnel(*school_history())
+
+    assert [(cohort["cohort"], cohort["size"]) for cohort in funnel["cohorts"]] == [("2025-03", 3), ("2025-04", 1)]
+    march = by_stage(funnel["cohorts"][0])
+    assert (march["approved"]["count"], march["theory_passed"]["count"]) == (2, 2)
+    april = by_stage(funnel["cohorts"][1])
+    assert (april["approved"]["count"], april["theory_passed"]["count"]) == (1, 0)
+    assert april["theory_passed"]["median_days_from_previous"] is None
+
+
+def test_empty_school():
+    funnel = server.compute_enrollment_funnel(*frames([]))
+    assert funnel == {"stages": list(server.FUNNEL_STAGES), "overall": None, "cohorts": []}
+
+
+def test_school_without_exams_or_approvals():
+    enrollments = [{"id": f"e{i}", "created_at": day(i), "approved_at": None} for i in range(3)]
+    # A certificate without the earlier stages does not count either
+    funnel = server.compute_enrollment_funnel(*frames(enrollments, certificates=[{"enrollment_id": "e0", "issued_at": day(9)}]))
+
+    overall = by_stage(funnel["overall"])
+    assert overall["enrolled"]["count"] == 3
+    assert all(overall[stage]["count"] == 0 for stage in server.FUNNEL_STAGES[1:])
+    assert overall["approved"]["conversion_from_previous"] == 0.0
+    assert overall["theory_passed"]["conversion_from_previous"] is None
+    assert all(overall[stage]["median_days_from_previous"] is None for stage in server.FUNNEL_STAGES)
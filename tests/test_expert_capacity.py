@@ -0,0 +1,45 @@
+import asyncio
+from datetime import datetime
+
+import server
+
+
+def test_concurrent_reservations_never_overbook(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            results = await asyncio.gather(*(
+                server.reserve_expert_capacity("expert-1", "2025-03-02", 5) for _ in range(100)
+            ))
+
+            assert results.count(True) == 5
+            load = await database.expert_exam_load.find_one({"_id": "expert-1:2025-03-02"})
+            assert load["booked"] == 5
+
+            await server.release_expert_capacity("expert-1", "2025-03-02")
+            assert await server.reserve_expert_capacity("expert-1", "2025-03-02", 5)
+            assert not await server.reserve_expert_capacity("expert-1", "2025-03-02", 5)
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_assignments_fill_every_expert_exactly(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            server.expert_directory_cache.clear()
+            await database.external_experts.insert_many([
+                {"id": f"expert-{i}", "is_available": True, "specialization": ["road"],
+                 "available_states": ["Alger"], "daily_capacity": 3}
+                for i in range(2)
+            ])
+            day = datetime(2025, 3, 2, 9)
+
+            assignments = await asyncio.gather(*(
+                server.assign_external_expert("road", "Alger", [day]) for _ in range(30)
+            ))
+
+            assigned = [assignment[0]["id"] for assignment in assignments if assignment]
+            assert sorted(assigned) == ["expert-0"] * 3 + ["expert-1"] * 3
+            loads = await database.expert_exam_load.find({}, {"_id": 0, "booked": 1}).to_list(length=None)
+            assert [load["booked"] for load in loads] == [3, 3]
+
+    asyncio.run(scenario())
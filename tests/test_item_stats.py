@@ -0,0 +1,78 @@
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import server
+
+
+def make_quiz(question_count, rng):
+    return {"id": "quiz-1", "version": 1, "passing_score": 50, "questions": [
+        {"options": ["a", "b", "c", "d"], "correct_answer": rng.choice("abcd")} for _ in range(question_count)
+    ]}
+
+
+def random_answers(quiz, rng):
+    # Stronger students are right more often, so items correlate with the total
+    skill = rng.random()
+    answers = {}
+    for i, question in enumerate(quiz["questions"]):
+        roll = rng.random()
+        if roll < 0.05:
+            continue
+        if roll < 0.08:
+            answers[str(i)] = "free text"
+        elif rng.random() < skill:
+            answers[str(i)] = question["correct_answer"]
+        else:
+            answers[str(i)] = rng.choice(question["options"])
+    return answers
+
+
+def folded_stats(answer_key, codes, correct, chunks):
+    """What $inc leaves in the rollup after recording the attempts a few at a time"""
+    totals = Counter()
+    for rows in np.array_split(np.arange(len(codes)), chunks):
+        totals.update(server.item_stats_increments(answer_key, codes[rows], correct[rows]))
+    return server.expand_dotted_fields(dict(totals))
+
+
+def test_incremental_item_stats_match_a_direct_computation():
+    rng = random.Random(21)
+    quiz = make_quiz(8, rng)
+    # A question everyone gets right has no point-biserial
+    quiz["questions"].append({"options": ["yes", "no"], "correct_answer": "yes"})
+    attempts = [random_answers(quiz, rng) for _ in range(400)]
+    for answers in attempts:
+        answers["8"] = "yes"
+    answer_key = server.CompiledAnswerKey(quiz)
+    codes = answer_key.encode_many(attempts)
+    correct, _, _ = answer_key.grade(codes)
+
+    described = server.describe_item_stats(answer_key, folded_stats(answer_key, codes, correct, chunks=7))
+
+    totals = correct.sum(axis=1)
+    assert described["attempts"] == len(attempts)
+    assert described["mean_correct"] == pytest.approx(totals.mean(), abs=1e-4)
+    for j, item in enumerate(described["items"]):
+        column = correct[:, j]
+        assert item["correct_rate"] == pytest.approx(column.mean(), abs=1e-4)
+        if column.all():
+            assert item["point_biserial"] is None
+        else:
+            # Point-biserial is Pearson's r between the item and the total score
+            assert item["point_biserial"] == pytest.approx(np.corrcoef(column, totals)[0, 1], abs=1e-4)
+        assert [choice["count"] for choice in item["choices"]] == [
+            int((codes[:, j] == code).sum()) for code in range(len(answer_key.vocabularies[j]))
+        ]
+        assert item["skipped"] == int((codes[:, j] == server.ANSWER_MISSING).sum())
+        assert item["other"] == int((codes[:, j] == server.ANSWER_UNKNOWN).sum())
+        assert [choice["is_correct"] for choice in item["choices"]].count(True) == 1
+
+
+def test_empty_rollup():
+    answer_key = server.CompiledAnswerKey(make_quiz(2, random.Random(1)))
+    described = server.describe_item_stats(answer_key, None)
+    assert described["attempts"] == 0
+    assert [(item["correct_rate"], item["point_biserial"]) for item in described["items"]] == [(None, None)] * 2
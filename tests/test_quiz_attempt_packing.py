@@ -0,0 +1,181 @@
+import asyncio
+import random
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import CourseType, QuizDifficulty
+
+
+def quiz_with_options(option_counts, quiz_id="quiz-1"):
+    return {
+        "id": quiz_id,
+        "version": 2,
+        "passing_score": 50,
+        "is_active": True,
+        "questions": [
+            {"question": f"Q{i}", "options": [f"q{i}-{k}" for k in range(count)], "correct_answer": f"q{i}-0"}
+            for i, count in enumerate(option_counts)
+        ]
+    }
+
+
+def stored_attempt(answer_key, answers):
+    codes = answer_key.encode(answers)
+    correct, _, _ = answer_key.grade(codes[np.newaxis, :])
+    return server.compact_attempt_fields(answer_key, answers, codes, correct[0]), codes, correct[0]
+
+
+def test_header_layout():
+    assert server.ATTEMPT_CODES_HEADER.format == "<BH"
+    blob = server.pack_answer_codes(np.array([0, 1, server.ANSWER_MISSING], dtype=np.int16))
+    assert server.ATTEMPT_CODES_HEADER.unpack_from(blob) == (4, 3)
+
+
+@pytest.mark.parametrize("length", [0, 1, 2, 7, 40, 201])
+def test_nibble_round_trip(length):
+    rng = np.random.default_rng(length)
+    codes = rng.integers(server.ANSWER_UNKNOWN, 14, size=length).astype(np.int16)
+    blob = server.pack_answer_codes(codes)
+    bits, count = server.ATTEMPT_CODES_HEADER.unpack_from(blob)
+    assert (bits, count) == (4, length)
+    assert len(blob) == server.ATTEMPT_CODES_HEADER.size + (length + 1) // 2
+    assert server.unpack_answer_codes(blob).tolist() == codes.tolist()
+
+
+def test_long_option_lists_switch_to_bytes():
+    codes = np.array([0, 14, 200, 253, server.ANSWER_UNKNOWN], dtype=np.int16)
+    blob = server.pack_answer_codes(codes)
+    assert server.ATTEMPT_CODES_HEADER.unpack_from(blob) == (8, len(codes))
+    assert server.unpack_answer_codes(blob).tolist() == codes.tolist()
+
+
+@pytest.mark.parametrize("code", [254, 1000, -3])
+def test_codes_outside_the_packing_width_raise(code):
+    with pytest.raises(ValueError):
+        server.pack_answer_codes(np.array([0, code], dtype=np.int16))
+
+
+def test_quizzes_too_large_to_pack_are_refused_at_creation():
+    assert server.quiz_packing_error(quiz_with_options([4, server.MAX_PACKED_OPTIONS])["questions"]) is None
+    wide = quiz_with_options([4, server.MAX_PACKED_OPTIONS + 1])["questions"]
+    assert server.quiz_packing_error(wide) == f"Question 2 has more than {server.MAX_PACKED_OPTIONS} options"
+
+    quiz = server.QuizCreate(
+        course_type=CourseType.THEORY, title="Signs", description="Road signs",
+        difficulty=QuizDifficulty.EASY, questions=wide
+    )
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.create_quiz(quiz, {"id": "manager-1", "role": "manager"}))
+    assert error.value.status_code == 400
+
+
+def test_largest_packable_key_fits_a_byte():
+    questions = quiz_with_options([server.MAX_PACKED_OPTIONS])["questions"]
+    questions[0]["correct_answer"] = "not among the options"
+    answer_key = server.CompiledAnswerKey({"id": "quiz-1", "passing_score": 50, "questions": questions})
+    fields, codes, _ = stored_attempt(answer_key, {"0": "not among the options"})
+    assert codes.tolist() == [server.MAX_PACKED_OPTIONS]
+    assert server.decode_attempt_answers(fields, answer_key) == {"0": "not among the options"}
+
+
+def test_attempts_at_oversized_legacy_quizzes_are_stored_raw():
+    answer_key = server.CompiledAnswerKey(quiz_with_options([300]))
+    fields, _, _ = stored_attempt(answer_key, {"0": "q0-299"})
+    assert fields == {"quiz_version": answer_key.version, "answers": {"0": "q0-299"}}
+    assert server.attempt_answer_codes(fields, answer_key).tolist() == [299]
+    assert server.decode_attempt_answers(fields, answer_key) == {"0": "q0-299"}
+
+
+def test_correct_bitmap_round_trip():
+    correct = np.array([True, False, True, True, False, False, True, False, True])
+    blob = server.pack_correct_bitmap(correct)
+    assert len(blob) == 2
+    assert server.unpack_correct_bitmap(blob, len(correct)).tolist() == correct.tolist()
+
+
+def test_compact_attempt_round_trip():
+    rng = random.Random(4)
+    quiz = quiz_with_options([4, 3, 20, 2, 5])
+    answer_key = server.CompiledAnswerKey(quiz)
+    for _ in range(200):
+        answers = {}
+        for i, question in enumerate(quiz["questions"]):
+            roll = rng.random()
+            if roll < 0.2:
+                continue
+            answers[str(i)] = "free text" if roll < 0.3 else rng.choice(question["options"])
+        fields, codes, correct = stored_attempt(answer_key, answers)
+        assert server.attempt_answer_codes(fields, answer_key).tolist() == codes.tolist()
+        assert server.unpack_correct_bitmap(fields["correct_bitmap"], answer_key.question_count).tolist() \
+            == correct.tolist()
+        assert server.decode_attempt_answers(fields, answer_key) == answers
+
+
+def test_other_version_is_not_trusted():
+    answer_key = server.CompiledAnswerKey(quiz_with_options([3, 3]))
+    fields, _, _ = stored_attempt(answer_key, {"0": "q0-1"})
+    fields["quiz_version"] = answer_key.version - 1
+    assert server.attempt_answer_codes(fields, answer_key) is None
+    with pytest.raises(ValueError):
+        server.decode_attempt_answers(fields, answer_key)
+
+
+def test_legacy_attempts_are_read_from_raw_answers():
+    answer_key = server.CompiledAnswerKey(quiz_with_options([3, 3]))
+    legacy = {"answers": {"0": "q0-2"}}
+    assert server.attempt_answer_codes(legacy, answer_key).tolist() == [2, server.ANSWER_MISSING]
+    assert server.decode_attempt_answers(legacy, answer_key) == {"0": "q0-2"}
+
+
+def test_migration_leaves_attempts_it_cannot_round_trip(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            server.quiz_key_cache.clear()
+            await database.quizzes.insert_many([quiz_with_options([4, 4, 4]), quiz_with_options([300], "quiz-wide")])
+            now = datetime.utcnow()
+
+            def attempt(answers, quiz_id="quiz-1"):
+                return {"id": str(uuid.uuid4()), "quiz_id": quiz_id, "student_id": "s1", "answers": answers,
+                        "score": 0.0, "passed": False, "started_at": now, "completed_at": now}
+
+            plain = attempt({"0": "q0-1", "2": "something else"})
+            extra_question = attempt({"0": "q0-1", "3": "q3-0"})
+            named_key = attempt({"0": "q0-1", "notes": "reviewed"})
+            explicit_null = attempt({"0": "q0-1", "1": None})
+            too_wide = attempt({"0": "q0-299"}, "quiz-wide")
+            await database.quiz_attempts.insert_many([plain, extra_question, named_key, explicit_null, too_wide])
+
+            report = await server.migrate_quiz_attempts_to_compact(batch_size=2)
+
+            assert (report["migrated"], report["skipped"]) == (1, 4)
+            migrated = await database.quiz_attempts.find_one({"id": plain["id"]})
+            assert "answers" not in migrated
+            answer_key = await server.get_compiled_answer_key("quiz-1")
+            assert server.decode_attempt_answers(migrated, answer_key) == plain["answers"]
+            for untouched in (extra_question, named_key, explicit_null, too_wide):
+                stored = await database.quiz_attempts.find_one({"id": untouched["id"]})
+                assert stored["answers"] == untouched["answers"]
+                assert "answer_codes" not in stored
+
+    asyncio.run(scenario())
+
+
+def test_taking_an_oversized_legacy_quiz_still_records_the_attempt(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            server.quiz_key_cache.clear()
+            await database.quizzes.insert_one(quiz_with_options([300], "quiz-wide"))
+
+            result = await server.take_quiz("quiz-wide", {"0": "q0-299"}, {"id": "s1", "role": "student"})
+
+            assert (result["score"], result["passed"]) == (0.0, False)
+            stored = await database.quiz_attempts.find_one({"id": result["attempt_id"]})
+            assert stored["answers"] == {"0": "q0-299"}
+            assert "answer_codes" not in stored
+
+    asyncio.run(scenario())
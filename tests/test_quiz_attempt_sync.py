@@ -0,0 +1,33 @@
+import asyncio
+
+import server
+
+
+def test_blank_client_attempt_ids_are_reported_as_rejected(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            server.quiz_key_cache.clear()
+            await database.quizzes.insert_one({
+                "id": "quiz-1", "version": 1, "passing_score": 50, "is_active": True,
+                "questions": [{"options": ["a", "b"], "correct_answer": "a"}]
+            })
+            batch = server.QuizAttemptSyncRequest(attempts=[
+                server.OfflineQuizAttempt(client_attempt_id="  ", quiz_id="quiz-1", answers={"0": "a"}),
+                server.OfflineQuizAttempt(client_attempt_id="device-1", quiz_id="quiz-1", answers={"0": "a"}),
+                server.OfflineQuizAttempt(client_attempt_id="", quiz_id="quiz-1", answers={"0": "b"})
+            ])
+            student = {"id": "student-1", "role": "student"}
+
+            report = await server.sync_offline_quiz_attempts(batch, student)
+
+            assert (report["created"], report["duplicates"], report["rejected"]) == (1, 0, 2)
+            rejected = [item for item in report["results"] if item["status"] == "rejected"]
+            assert [(item["index"], item["detail"]) for item in rejected] == [
+                (0, "client_attempt_id is required"), (2, "client_attempt_id is required")
+            ]
+            assert await database.quiz_attempts.count_documents({}) == 1
+
+            replay = await server.sync_offline_quiz_attempts(batch, student)
+            assert (replay["created"], replay["duplicates"], replay["rejected"]) == (0, 1, 2)
+
+    asyncio.run(scenario())
@@ -0,0 +1,117 @@
+import random
+import time
+
+import numpy as np
+import pytest
+
+import server
+
+
+def make_quiz(question_count, rng, by_index=True, passing_score=60):
+    questions = []
+    for i in range(question_count):
+        options = [f"q{i} option {k}" for k in range(4)]
+        correct = rng.randrange(4)
+        questions.append({
+            "question": f"Question {i}",
+            "options": options,
+            "correct_answer": correct if by_index else options[correct]
+        })
+    return {"id": "quiz-1", "version": 3, "passing_score": passing_score, "questions": questions}
+
+
+def random_answers(quiz, rng):
+    answers = {}
+    for i, question in enumerate(quiz["questions"]):
+        roll = rng.random()
+        if roll < 0.05:
+            continue
+        if roll < 0.08:
+            answers[str(i)] = "not an option"
+        elif isinstance(question["correct_answer"], int):
+            answers[str(i)] = rng.randrange(4)
+        else:
+            answers[str(i)] = rng.choice(question["options"])
+    return answers
+
+
+def grade_with_loop(quiz, answers):
+    """The per-question loop take_quiz used before answer keys were compiled"""
+    correct_count = 0
+    for i, question in enumerate(quiz["questions"]):
+        if answers.get(str(i)) == question["correct_answer"]:
+            correct_count += 1
+    score = (correct_count / len(quiz["questions"])) * 100 if quiz["questions"] else 0
+    return score, score >= quiz["passing_score"]
+
+
+@pytest.mark.parametrize("by_index", [True, False])
+def test_vectorized_grading_matches_loop(by_index):
+    rng = random.Random(7)
+    quiz = make_quiz(12, rng, by_index=by_index)
+    attempts = [random_answers(quiz, rng) for _ in range(300)]
+    answer_key = server.CompiledAnswerKey(quiz)
+
+    _, scores, passed = answer_key.grade(answer_key.encode_many(attempts))
+
+    for answers, score, did_pass in zip(attempts, scores, passed):
+        expected_score, expected_pass = grade_with_loop(quiz, answers)
+        assert score == pytest.approx(expected_score)
+        assert bool(did_pass) == expected_pass
+
+
+def test_missing_and_unknown_answers_get_reserved_codes():
+    quiz = {"id": "quiz-2", "passing_score": 50, "questions": [
+        {"options": ["a", "b"], "correct_answer": "b"},
+        {"options": ["a", "b"], "correct_answer": "a"},
+        {"options": ["a", "b"], "correct_answer": "a"},
+        {"options": ["a", "b"], "correct_answer": "a"},
+    ]}
+    answer_key = server.CompiledAnswerKey(quiz)
+    codes = answer_key.encode({"0": "b", "2": "zzz", "3": ["unhashable"]})
+    assert codes.tolist() == [1, server.ANSWER_MISSING, server.ANSWER_UNKNOWN, server.ANSWER_UNKNOWN]
+    correct, scores, passed = answer_key.grade(codes[np.newaxis, :])
+    assert correct.tolist() == [[True, False, False, False]]
+    assert scores.tolist() == [25.0]
+    assert not passed[0]
+
+
+def test_correct_answer_outside_options_is_still_gradable():
+    quiz = {"id": "quiz-3", "passing_score": 100, "questions": [{"options": ["a", "b"], "correct_answer": "c"}]}
+    answer_key = server.CompiledAnswerKey(quiz)
+    _, scores, _ = answer_key.grade(answer_key.encode_many([{"0": "c"}, {"0": "a"}]))
+    assert scores.tolist() == [100.0, 0.0]
+
+
+def test_quiz_without_questions_scores_zero():
+    answer_key = server.CompiledAnswerKey({"id": "quiz-4", "passing_score": 0, "questions": []})
+    _, scores, passed = answer_key.grade(answer_key.encode_many([{}, {}]))
+    assert scores.tolist() == [0.0, 0.0]
+    assert passed.all()
+
+
+@pytest.mark.benchmark
+def test_grading_ten_thousand_attempts_of_forty_questions():
+    rng = random.Random(11)
+    quiz = make_quiz(40, rng)
+    attempts = [random_answers(quiz, rng) for _ in range(10_000)]
+    answer_key = server.CompiledAnswerKey(quiz)
+
+    def best_ms(grade_all):
+        timings = []
+        for _ in range(5):
+            started = time.perf_counter()
+            grade_all()
+            timings.append((time.perf_counter() - started) * 1000)
+        return min(timings)
+
+    loop_ms = best_ms(lambda: [grade_with_loop(quiz, answers) for answers in attempts])
+    batch_ms = best_ms(lambda: answer_key.grade(answer_key.encode_many(attempts)))
+    codes = answer_key.encode_many(attempts)
+    grade_ms = best_ms(lambda: answer_key.grade(codes))
+    timings = f"loop {loop_ms:.1f} ms, encode+grade {batch_ms:.1f} ms, grade {grade_ms:.2f} ms"
+    # Encoding still reads every answer from its dict once, which bounds the end-to-end win;
+    # the comparison itself must be array work, far away from per-attempt Python
+    assert batch_ms * 1.2 < loop_ms, timings
+    assert grade_ms * 20 < loop_ms, timings
+    assert batch_ms < 500, timings
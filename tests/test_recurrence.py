@@ -0,0 +1,36 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import server
+from server import RecurrenceRule
+
+
+def test_weekdays_are_school_local_weekdays():
+    # 00:30 on Tuesday 4 March in Algiers is 23:30 on Monday in UTC
+    occurrences = server.expand_recurrence(datetime(2025, 3, 3, 23, 30), RecurrenceRule(count=3, weekdays=[1, 3]))
+    assert occurrences == [datetime(2025, 3, 3, 23, 30), datetime(2025, 3, 5, 23, 30), datetime(2025, 3, 10, 23, 30)]
+
+
+def test_local_time_is_kept_across_dst(monkeypatch):
+    monkeypatch.setattr(server, "SCHOOL_TIMEZONE", ZoneInfo("Europe/Paris"))
+    # 17:00 in Paris, the week before clocks go forward on 30 March
+    occurrences = server.expand_recurrence(datetime(2025, 3, 24, 16, 0), RecurrenceRule(count=2))
+    assert occurrences == [datetime(2025, 3, 24, 16, 0), datetime(2025, 3, 31, 15, 0)]
+
+
+def test_daily_interval():
+    occurrences = server.expand_recurrence(datetime(2025, 3, 2, 8, 0), RecurrenceRule(frequency="daily", interval=2, count=3))
+    assert occurrences == [datetime(2025, 3, 2, 8, 0), datetime(2025, 3, 4, 8, 0), datetime(2025, 3, 6, 8, 0)]
+
+
+@pytest.mark.parametrize("rule", [
+    RecurrenceRule(count=0),
+    RecurrenceRule(count=2, interval=0),
+    RecurrenceRule(count=2, frequency="monthly"),
+    RecurrenceRule(count=2, weekdays=[7]),
+])
+def test_invalid_rules(rule):
+    with pytest.raises(ValueError):
+        server.expand_recurrence(datetime(2025, 3, 2, 8, 0), rule)
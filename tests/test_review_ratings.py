@@ -0,0 +1,62 @@
+import asyncio
+
+import server
+
+
+def test_rating_update_leaves_unknown_histograms_for_the_reconciler(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            await database.driving_schools.insert_many([
+                # Rated before histograms were stored
+                {"id": "legacy", "rating": 4.0, "total_reviews": 2},
+                {"id": "new"}
+            ])
+            await database.reviews.insert_many([
+                {"id": "r1", "driving_school_id": "legacy", "rating": 5},
+                {"id": "r2", "driving_school_id": "legacy", "rating": 3},
+                {"id": "r3", "driving_school_id": "legacy", "rating": 2},
+                {"id": "r4", "driving_school_id": "new", "rating": 2}
+            ])
+
+            for school_id, rating in [("legacy", 2), ("new", 2)]:
+                await database.driving_schools.update_one({"id": school_id}, server.rating_update_pipeline(rating))
+
+            legacy = await database.driving_schools.find_one({"id": "legacy"})
+            assert (legacy["rating_sum"], legacy["total_reviews"]) == (10, 3)
+            assert "rating_histogram" not in legacy
+            new = await database.driving_schools.find_one({"id": "new"})
+            assert new["rating_histogram"] == {"2": 1}
+
+            report = await server.reconcile_review_ratings()
+            assert report["driving_schools"]["drifted_ids"] == ["legacy"]
+            legacy = await database.driving_schools.find_one({"id": "legacy"})
+            assert legacy["rating_histogram"] == {"5": 1, "3": 1, "2": 1}
+
+    asyncio.run(scenario())
+
+
+def test_review_summary_recounts_when_the_histogram_disagrees_with_the_total(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            server.review_summary_cache.clear()
+            await database.driving_schools.insert_many([
+                # Histogram started after the school already had reviews
+                {"id": "drifted", "total_reviews": 3, "rating_histogram": {"2": 1}},
+                {"id": "consistent", "total_reviews": 2, "rating_histogram": {"4": 1, "5": 1}}
+            ])
+            await database.reviews.insert_many([
+                {"id": "r1", "driving_school_id": "drifted", "rating": 5},
+                {"id": "r2", "driving_school_id": "drifted", "rating": 5},
+                {"id": "r3", "driving_school_id": "drifted", "rating": 2}
+            ])
+
+            drifted = await server.get_review_summary("drifted")
+            assert drifted["total_reviews"] == 3
+            assert drifted["histogram"] == {"1": 0, "2": 1, "3": 0, "4": 0, "5": 2}
+            assert drifted["average_rating"] == 4.0
+
+            # A histogram that agrees with the stored total is used without touching the reviews
+            consistent = await server.get_review_summary("consistent")
+            assert (consistent["total_reviews"], consistent["average_rating"]) == (2, 4.5)
+
+    asyncio.run(scenario())
@@ -0,0 +1,121 @@
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+from server import EnrollmentStatus
+
+MANAGER = {"id": "manager-1", "role": "manager"}
+
+
+def test_invalidation_only_drops_the_written_school():
+    server.school_overview_cache.clear()
+    server.school_overview_cache.set("school-1", {"total_enrollments": 1})
+    server.school_overview_cache.set("school-2", {"total_enrollments": 2})
+
+    server.invalidate_school_analytics("school-1")
+    server.invalidate_school_analytics(None)
+
+    assert server.school_overview_cache.get("school-1") is None
+    assert server.school_overview_cache.get("school-2") == {"total_enrollments": 2}
+
+
+def enrollment(school_id, status, student_id=None):
+    return {
+        "id": str(uuid.uuid4()),
+        "student_id": student_id or str(uuid.uuid4()),
+        "driving_school_id": school_id,
+        "enrollment_status": status,
+        "created_at": datetime.utcnow()
+    }
+
+
+async def seed_school(database, enrollments):
+    await database.driving_schools.insert_one(
+        {"id": "school-1", "name": "Auto-école", "manager_id": MANAGER["id"], "price": 1000.0}
+    )
+    await database.teachers.insert_many([
+        {"id": "t1", "user_id": "u1", "driving_school_id": "school-1", "is_approved": True},
+        {"id": "t2", "user_id": "u2", "driving_school_id": "school-1", "is_approved": False},
+        {"id": "t3", "user_id": "u3", "driving_school_id": "school-2", "is_approved": True}
+    ])
+    await database.enrollments.insert_many(enrollments)
+
+
+def test_overview_is_cached_until_a_review_invalidates_it(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            server.school_overview_cache.clear()
+            student = {"id": "student-1", "role": "student", "first_name": "Amina", "last_name": "B"}
+            await seed_school(database, [
+                enrollment("school-1", EnrollmentStatus.APPROVED, student["id"]),
+                enrollment("school-1", EnrollmentStatus.APPROVED),
+                enrollment("school-1", EnrollmentStatus.PENDING_APPROVAL),
+                enrollment("school-2", EnrollmentStatus.APPROVED)
+            ])
+
+            overview = await server.get_school_overview(MANAGER)
+            assert overview["total_enrollments"] == 3
+            assert overview["active_enrollments"] == 2
+            assert overview["pending_enrollments"] == 1
+            assert (overview["total_teachers"], overview["approved_teachers"]) == (2, 1)
+            assert overview["revenue_estimate"] == 2000.0
+
+            # A write that bypasses the endpoints is not seen until the cache entry goes
+            await database.enrollments.insert_one(enrollment("school-1", EnrollmentStatus.APPROVED))
+            assert (await server.get_school_overview(MANAGER))["total_enrollments"] == 3
+
+            own_enrollment = await database.enrollments.find_one({"student_id": student["id"]})
+            await server.create_review(
+                server.ReviewCreate(rating=4, comment="Great", enrollment_id=own_enrollment["id"]), student
+            )
+            overview = await server.get_school_overview(MANAGER)
+            assert overview["total_enrollments"] == 4
+            assert (overview["total_reviews"], overview["average_rating"]) == (1, 4)
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.benchmark
+def test_overview_for_a_school_with_fifty_thousand_enrollments(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            await server.ensure_indexes()
+            server.school_overview_cache.clear()
+            statuses = [EnrollmentStatus.APPROVED, EnrollmentStatus.PENDING_APPROVAL, EnrollmentStatus.REJECTED]
+            started_at = datetime.utcnow() - timedelta(days=3650)
+            history = []
+            for i in range(50_000):
+                row = enrollment("school-1", statuses[i % 3])
+                row["created_at"] = started_at + timedelta(hours=i)
+                history.append(row)
+            await seed_school(database, history)
+            await database.reviews.insert_many([
+                {"id": str(uuid.uuid4()), "driving_school_id": "school-1", "rating": 1 + i % 5} for i in range(2000)
+            ])
+
+            cold = []
+            for _ in range(5):
+                started = time.perf_counter()
+                counts = await server.compute_school_overview_counts("school-1")
+                cold.append((time.perf_counter() - started) * 1000)
+            assert counts["total_enrollments"] == 50_000
+            assert counts["active_enrollments"] == 16_667
+            assert counts["total_reviews"] == 2000
+
+            await server.get_school_overview(MANAGER)
+            warm = []
+            for _ in range(20):
+                started = time.perf_counter()
+                await server.get_school_overview(MANAGER)
+                warm.append((time.perf_counter() - started) * 1000)
+            print(f"median {statistics.median(cold):.1f} ms aggregated, {statistics.median(warm):.2f} ms cached")
+            # The cached path still reads the school document, so it is bounded by one indexed find_one
+            assert statistics.median(warm) < statistics.median(cold)
+            assert statistics.median(cold) < 1000
+
+    asyncio.run(scenario())
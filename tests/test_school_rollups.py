@@ -0,0 +1,58 @@
+import asyncio
+from datetime import datetime
+
+import server
+from server import ExamStatus, SessionStatus
+
+
+def test_backfill_rebuilds_one_school_and_zeroes_its_stale_days(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            await database.teachers.insert_many([
+                {"id": "t1", "driving_school_id": "school-1"},
+                {"id": "t2", "driving_school_id": "school-2"}
+            ])
+            await database.enrollments.insert_many([
+                {"id": "e1", "driving_school_id": "school-1", "created_at": datetime(2025, 3, 2, 9)},
+                {"id": "e2", "driving_school_id": "school-2", "created_at": datetime(2025, 3, 2, 9)}
+            ])
+            await database.courses.insert_many([
+                {"id": "c1", "enrollment_id": "e1"},
+                {"id": "c2", "enrollment_id": "e2"}
+            ])
+            # Older rows without driving_school_id are attributed through the teacher and course
+            await database.sessions.insert_many([
+                {"id": "s1", "teacher_id": "t1", "scheduled_at": datetime(2025, 3, 3, 9), "status": SessionStatus.COMPLETED},
+                {"id": "s2", "teacher_id": "t2", "scheduled_at": datetime(2025, 3, 3, 9), "status": SessionStatus.COMPLETED}
+            ])
+            await database.exam_schedules.insert_many([
+                {"id": "x1", "course_id": "c1", "scheduled_at": datetime(2025, 3, 4, 9), "status": ExamStatus.PASSED},
+                {"id": "x2", "course_id": "c2", "scheduled_at": datetime(2025, 3, 4, 9), "status": ExamStatus.FAILED}
+            ])
+            stale = {counter: 5 for counter in server.ROLLUP_COUNTERS}
+            await database.school_daily_rollups.insert_many([
+                {"_id": "school-1:2024-01-01", "driving_school_id": "school-1", "day": "2024-01-01", **stale},
+                {"_id": "school-2:2024-01-01", "driving_school_id": "school-2", "day": "2024-01-01", **stale}
+            ])
+
+            report = await server.backfill_school_rollups("school-1")
+
+            assert (report["rollup_days"], report["zeroed_days"]) == (3, 1)
+            rollups = {
+                doc["_id"]: doc async for doc in database.school_daily_rollups.find({"driving_school_id": "school-1"})
+            }
+            assert rollups["school-1:2025-03-02"]["enrollments"] == 1
+            assert rollups["school-1:2025-03-03"]["sessions_completed"] == 1
+            assert rollups["school-1:2025-03-04"]["exams_passed"] == 1
+            assert rollups["school-1:2024-01-01"]["enrollments"] == 0
+            # Other schools are untouched by a scoped rebuild
+            other = await database.school_daily_rollups.find({"driving_school_id": "school-2"}).to_list(length=None)
+            assert [doc["_id"] for doc in other] == ["school-2:2024-01-01"]
+            assert other[0]["enrollments"] == 5
+
+            report = await server.backfill_school_rollups()
+            assert report["zeroed_days"] == 1
+            assert (await database.school_daily_rollups.find_one({"_id": "school-2:2024-01-01"}))["enrollments"] == 0
+            assert (await database.school_daily_rollups.find_one({"_id": "school-2:2025-03-04"}))["exams_failed"] == 1
+
+    asyncio.run(scenario())
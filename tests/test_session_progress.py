@@ -0,0 +1,90 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import server
+from server import CourseStatus, CourseType, ExamStatus, SessionStatus
+
+PARALLEL_COMPLETIONS = 100
+
+
+def make_course(total_sessions):
+    return {
+        "id": str(uuid.uuid4()),
+        "enrollment_id": str(uuid.uuid4()),
+        "course_type": CourseType.PARK,
+        "status": CourseStatus.IN_PROGRESS,
+        "completed_sessions": 0,
+        "total_sessions": total_sessions,
+        "exam_status": ExamStatus.NOT_AVAILABLE,
+    }
+
+
+def test_parallel_increments_are_not_lost(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            course = make_course(PARALLEL_COMPLETIONS)
+            await database.courses.insert_one(course)
+
+            await asyncio.gather(*(
+                server.record_course_session_completed(course["id"]) for _ in range(PARALLEL_COMPLETIONS)
+            ))
+
+            stored = await database.courses.find_one({"id": course["id"]})
+            assert stored["completed_sessions"] == PARALLEL_COMPLETIONS
+            assert stored["status"] == CourseStatus.COMPLETED
+            assert stored["exam_status"] == ExamStatus.AVAILABLE
+
+    asyncio.run(scenario())
+
+
+def test_exam_opens_only_when_the_last_session_completes(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            course = make_course(3)
+            await database.courses.insert_one(course)
+
+            first = await server.record_course_session_completed(course["id"])
+            assert first["completed_sessions"] == 1
+            assert first["exam_status"] == ExamStatus.NOT_AVAILABLE
+
+            await server.record_course_session_completed(course["id"])
+            last = await server.record_course_session_completed(course["id"])
+            assert last["status"] == CourseStatus.COMPLETED
+            assert last["exam_status"] == ExamStatus.AVAILABLE
+
+    asyncio.run(scenario())
+
+
+def test_double_submitted_session_completions_count_once(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            course = make_course(PARALLEL_COMPLETIONS)
+            await database.courses.insert_one(course)
+            start = datetime.utcnow() - timedelta(days=1)
+            sessions = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "course_id": course["id"],
+                    "teacher_id": "teacher-1",
+                    "student_id": "student-1",
+                    "scheduled_at": start + timedelta(hours=i),
+                    "duration_minutes": 60,
+                    "status": SessionStatus.SCHEDULED,
+                }
+                for i in range(PARALLEL_COMPLETIONS)
+            ]
+            await database.sessions.insert_many(sessions)
+            teacher = {"id": "teacher-user-1", "role": "teacher"}
+
+            # Every session is submitted twice at once, as a double-clicking teacher would
+            await asyncio.gather(*(
+                server.complete_session(session["id"], "", teacher)
+                for session in sessions for _ in range(2)
+            ))
+
+            stored = await database.courses.find_one({"id": course["id"]})
+            assert stored["completed_sessions"] == PARALLEL_COMPLETIONS
+            assert await database.sessions.count_documents({"status": SessionStatus.COMPLETED}) == PARALLEL_COMPLETIONS
+
+    asyncio.run(scenario())
@@ -0,0 +1,135 @@
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+
+NINE = datetime(2025, 3, 2, 9, 0)
+
+
+def upcoming_nine():
+    """9:00 a month ahead; reservations expire through a TTL index once their session ends"""
+    return (datetime.utcnow() + timedelta(days=30)).replace(hour=9, minute=0, second=0, microsecond=0)
+
+
+def minutes(n):
+    return timedelta(minutes=n)
+
+
+def slot_keys(start, length):
+    return set(server.session_slot_keys("t1", "s1", start, start + minutes(length)))
+
+
+def test_grid_rejects_off_grid_bookings():
+    assert server.session_grid_error(NINE, 60) is None
+    assert server.session_grid_error(NINE + minutes(3), 60)
+    assert server.session_grid_error(NINE + timedelta(seconds=30), 60)
+    assert server.session_grid_error(NINE, 32)
+
+
+def test_adjacent_bookings_share_no_slot():
+    assert not slot_keys(NINE, 30) & slot_keys(NINE + minutes(30), 30)
+
+
+def test_overlapping_bookings_share_a_slot():
+    assert slot_keys(NINE, 30) & slot_keys(NINE + minutes(25), 30)
+
+
+def test_slot_keys_cover_both_participants():
+    keys = server.session_slot_keys("t1", "s1", NINE, NINE + minutes(10))
+    assert keys == ["teacher:t1:202503020900", "student:s1:202503020900",
+                    "teacher:t1:202503020905", "student:s1:202503020905"]
+
+
+def test_free_slots_are_snapped_inward_to_the_grid():
+    snapped = server.snap_to_session_grid([
+        (NINE + minutes(2), NINE + minutes(58)),
+        (NINE, NINE + minutes(4)),
+    ])
+    assert snapped == [(NINE + minutes(5), NINE + minutes(55))]
+
+
+def test_conflicts_only_for_real_overlaps():
+    booked = [{"id": "b1", "teacher_id": "t1", "student_id": "s2", "scheduled_at": NINE, "duration_minutes": 30}]
+    intervals = [(NINE + minutes(30), NINE + minutes(60)), (NINE + minutes(25), NINE + minutes(55))]
+    conflicts = server.match_session_conflicts(intervals, booked, "t1", "s1")
+    assert [conflict["index"] for conflict in conflicts] == [1]
+    assert conflicts[0]["conflict_with"] == "teacher"
+
+
+@pytest.mark.benchmark
+def test_conflict_matching_throughput():
+    # A busy school: 200 teachers with a month of bookings, checked for 5000 requests
+    rng = random.Random(7)
+    booked = [
+        {
+            "id": str(i),
+            "teacher_id": f"t{i % 200}",
+            "student_id": f"s{i}",
+            "scheduled_at": NINE + minutes(5 * rng.randrange(0, 30 * 24 * 12)),
+            "duration_minutes": rng.choice([30, 60, 90]),
+        }
+        for i in range(20000)
+    ]
+    by_teacher = {}
+    for session in booked:
+        by_teacher.setdefault(session["teacher_id"], []).append(session)
+    requests = [
+        (f"t{rng.randrange(200)}", start, start + minutes(60))
+        for start in (NINE + minutes(5 * rng.randrange(0, 30 * 24 * 12)) for _ in range(5000))
+    ]
+    started = time.perf_counter()
+    for teacher_id, start, end in requests:
+        server.match_session_conflicts([(start, end)], by_teacher[teacher_id], teacher_id, "s1")
+        server.session_slot_keys(teacher_id, "s1", start, end)
+    elapsed = time.perf_counter() - started
+    print(f"{len(requests) / elapsed * 60:,.0f} booking checks per minute")
+    assert elapsed < 60 / 10  # well above 1000 bookings per minute of CPU headroom
+
+
+def test_concurrent_bookings_of_one_slot_have_one_winner(scratch_database):
+    async def scenario():
+        async with scratch_database():
+            start = upcoming_nine()
+            bookings = [
+                {"session_id": str(uuid.uuid4()), "teacher_id": "t1", "student_id": f"s{i}",
+                 "start": start, "end": start + minutes(60)}
+                for i in range(50)
+            ]
+            results = await asyncio.gather(*(server.reserve_session_slots([booking]) for booking in bookings))
+            winners = [booking for booking, clashed in zip(bookings, results) if not clashed]
+            assert len(winners) == 1
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.benchmark
+def test_reservation_throughput(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            await server.ensure_indexes()
+            start = upcoming_nine()
+            bookings = [
+                {"session_id": str(uuid.uuid4()), "teacher_id": f"t{i % 100}", "student_id": f"s{i}",
+                 "start": start + minutes(60 * (i // 100)), "end": start + minutes(60 * (i // 100) + 60)}
+                for i in range(3000)
+            ]
+            semaphore = asyncio.Semaphore(50)
+
+            async def book(booking):
+                async with semaphore:
+                    return await server.reserve_session_slots([booking])
+
+            started = time.perf_counter()
+            results = await asyncio.gather(*(book(booking) for booking in bookings))
+            elapsed = time.perf_counter() - started
+            print(f"{len(bookings) / elapsed * 60:,.0f} reservations per minute")
+            assert not any(results)
+            assert await database.session_reservations.count_documents({}) == 3000 * 2 * 12
+            assert elapsed < 60
+
+    asyncio.run(scenario())
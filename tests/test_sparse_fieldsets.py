@@ -0,0 +1,114 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+STUDENT = {"id": "student-1", "role": "student"}
+ALLOWED = frozenset({"id", "name", "price"})
+
+
+def test_fields_omitted_or_blank_means_full_documents():
+    assert server.parse_fields_param(None, ALLOWED) is None
+    assert server.parse_fields_param(" , ", ALLOWED) is None
+    assert server.fields_projection(None, ("price",)) == {"_id": 0}
+    docs = [{"id": "a", "name": "A", "price": 1}]
+    assert server.select_fields(docs, None) is docs
+
+
+def test_requested_fields_keep_order_and_always_include_id():
+    assert server.parse_fields_param("price, name,price", ALLOWED) == ["id", "price", "name"]
+    assert server.parse_fields_param("name,id", ALLOWED) == ["name", "id"]
+
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(HTTPException) as error:
+        server.parse_fields_param("name,password_hash", ALLOWED)
+    assert error.value.status_code == 400
+    assert "password_hash" in error.value.detail
+
+
+def test_helper_fields_are_projected_then_trimmed():
+    assert server.fields_projection(["id", "name"], ("price",)) == {"_id": 0, "id": 1, "name": 1, "price": 1}
+    docs = [{"id": "a", "name": "A", "price": 1}, {"id": "b", "price": 2}]
+    assert server.select_fields(docs, ["id", "name"]) == [{"id": "a", "name": "A"}, {"id": "b"}]
+
+
+@pytest.mark.parametrize("endpoint, user", [
+    (server.get_my_video_rooms, STUDENT),
+    (server.get_my_sessions, STUDENT),
+    (server.get_my_exams, STUDENT),
+    (server.get_my_certificates, STUDENT),
+    (server.get_my_enrollments_fixed, STUDENT)
+])
+def test_my_endpoints_reject_unknown_fields(endpoint, user):
+    kwargs = {"include_inactive": False} if endpoint is server.get_my_video_rooms else {}
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(endpoint(fields="id,secret", current_user=user, **kwargs))
+    assert error.value.status_code == 400
+
+
+def test_video_rooms_trim_the_expiry_fields_they_needed(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            now = datetime.utcnow()
+            await database.video_rooms.insert_many([
+                {"id": "live", "student_id": STUDENT["id"], "room_url": "https://daily.example/live", "is_active": True,
+                 "scheduled_at": now - timedelta(minutes=10), "duration_minutes": 60},
+                # Over, but the reaper has not deactivated it yet
+                {"id": "over", "student_id": STUDENT["id"], "room_url": "https://daily.example/over", "is_active": True,
+                 "scheduled_at": now - timedelta(hours=5), "duration_minutes": 60}
+            ])
+
+            rooms = await server.get_my_video_rooms(include_inactive=False, fields="room_url", current_user=STUDENT)
+            assert rooms == [{"id": "live", "room_url": "https://daily.example/live"}]
+
+            full = await server.get_my_video_rooms(include_inactive=False, fields=None, current_user=STUDENT)
+            assert [room["id"] for room in full] == ["live"]
+            assert set(full[0]) == {"id", "student_id", "room_url", "is_active", "scheduled_at", "duration_minutes"}
+
+    asyncio.run(scenario())
+
+
+def test_enrollments_join_school_fields_only_when_asked(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            await database.driving_schools.insert_one(
+                {"id": "school-1", "name": "Auto-école", "address": "Alger", "price": 1000.0}
+            )
+            await database.enrollments.insert_one({
+                "id": "enrollment-1", "student_id": STUDENT["id"], "driving_school_id": "school-1",
+                "enrollment_status": "approved", "created_at": datetime(2025, 3, 2)
+            })
+            await database.courses.insert_one({"id": "course-1", "enrollment_id": "enrollment-1"})
+
+            sparse = await server.get_my_enrollments_fixed(fields="school_name", current_user=STUDENT)
+            # driving_school_id was only read to join the school
+            assert sparse == [{"id": "enrollment-1", "school_name": "Auto-école"}]
+
+            status_only = await server.get_my_enrollments_fixed(fields="enrollment_status", current_user=STUDENT)
+            assert status_only == [{"id": "enrollment-1", "enrollment_status": "approved"}]
+
+            full = await server.get_my_enrollments_fixed(fields=None, current_user=STUDENT)
+            assert full[0]["school_name"] == "Auto-école"
+            assert full[0]["school_price"] == 1000.0
+            assert [course["id"] for course in full[0]["courses"]] == ["course-1"]
+            assert full[0]["driving_school_id"] == "school-1"
+
+    asyncio.run(scenario())
+
+
+def test_sessions_without_fields_are_unchanged(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            session = {"id": "session-1", "student_id": STUDENT["id"], "teacher_id": "t1",
+                       "scheduled_at": datetime(2025, 3, 2, 9), "status": "scheduled", "notes": "Parking"}
+            await database.sessions.insert_one(dict(session))
+
+            assert await server.get_my_sessions(fields=None, current_user=STUDENT) == [server.serialize_doc(session)]
+            assert await server.get_my_sessions(fields="status", current_user=STUDENT) == \
+                [{"id": "session-1", "status": "scheduled"}]
+
+    asyncio.run(scenario())
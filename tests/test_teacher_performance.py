@@ -0,0 +1,31 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import server
+from server import SessionStatus
+
+
+def test_recent_sessions_are_the_latest_per_teacher(scratch_database):
+    async def scenario():
+        async with scratch_database() as database:
+            await server.ensure_indexes()
+            start = datetime(2025, 3, 2, 9)
+            await database.sessions.insert_many([
+                {"id": f"{teacher_id}-{i}", "teacher_id": teacher_id, "scheduled_at": start + timedelta(days=i),
+                 "status": SessionStatus.COMPLETED if i % 2 else SessionStatus.SCHEDULED}
+                for teacher_id, count in [("t1", 25), ("t2", 3)]
+                for i in range(count)
+            ])
+
+            performance = await server.compute_teacher_performance(["t1", "t2", "t3"])
+
+            assert [session["id"] for session in performance["t1"]["recent_sessions"]] == \
+                [f"t1-{i}" for i in range(24, 24 - server.TEACHER_RECENT_SESSIONS, -1)]
+            assert (performance["t1"]["total_sessions"], performance["t1"]["completed_sessions"]) == (25, 12)
+            assert len(performance["t2"]["recent_sessions"]) == 3
+            assert performance["t3"]["recent_sessions"] == []
+
+            summary = await server.compute_teacher_performance(["t1"], include_recent=False)
+            assert "recent_sessions" not in summary["t1"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import server
+
+
+class DailyStub:
+    """A local stand-in for the Daily.co REST API that records room deletions"""
+
+    def __init__(self, delay_seconds=0.02):
+        self.deleted = []
+        self.auth_headers = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_DELETE(self):
+                with stub.lock:
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    stub.auth_headers.add(self.headers.get("Authorization"))
+                time.sleep(delay_seconds)
+                name = self.path.rsplit("/", 1)[-1]
+                if name.startswith("broken"):
+                    status = 500
+                elif name.startswith("gone"):
+                    status = 404
+                else:
+                    status = 200
+                    with stub.lock:
+                        stub.deleted.append(name)
+                with stub.lock:
+                    stub.in_flight -= 1
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def daily_stub(monkeypatch):
+    stub = DailyStub()
+    monkeypatch.setattr(server, "DAILY_API_URL", stub.url)
+    monkeypatch.setattr(server, "DAILY_API_KEY", "test-key")
+    yield stub
+    stub.close()
+
+
+def test_delete_daily_room(daily_stub):
+    assert asyncio.run(server.delete_daily_room("room-1"))
+    assert asyncio.run(server.delete_daily_room("gone-1"))  # already deleted upstream
+    assert not asyncio.run(server.delete_daily_room("broken-1"))
+    assert daily_stub.deleted == ["room-1"]
+    assert daily_stub.auth_headers == {"Bearer test-key"}
+
+
+def test_video_room_expired():
+    start = datetime(2025, 3, 2, 9, 0)
+    room = {"scheduled_at": start, "duration_minutes": 60}
+    grace = timedelta(minutes=server.VIDEO_ROOM_GRACE_MINUTES)
+    assert not server.video_room_expired(room, start + timedelta(minutes=60) + grace - timedelta(seconds=1))
+    assert server.video_room_expired(room, start + timedelta(minutes=60) + grace)
+    # Rooms without a duration are assumed to last an hour
+    assert server.video_room_expired({"scheduled_at": start}, start + timedelta(minutes=60) + grace)
+
+
+def video_room(name, scheduled_at, duration_minutes=60):
+    return {
+        "id": str(uuid.uuid4()),
+        "room_name": name,
+        "scheduled_at": scheduled_at,
+        "duration_minutes": duration_minutes,
+        "is_active": True,
+    }
+
+
+def test_reaper_deactivates_expired_rooms_with_bounded_concurrency(daily_stub, scratch_database, monkeypatch):
+    monkeypatch.setattr(server, "VIDEO_ROOM_REAP_BATCH_SIZE", 7)
+
+    async def scenario():
+        async with scratch_database() as database:
+            now = datetime.utcnow()
+            long_ago = now - timedelta(days=1)
+            expired = [video_room(f"room-{i}", long_ago + timedelta(minutes=i % 3)) for i in range(30)]
+            rooms = expired + [
+                video_room("gone-1", long_ago),
+                video_room("broken-1", long_ago),
+                video_room("running", now - timedelta(minutes=40), duration_minutes=60),
+                video_room("upcoming", now + timedelta(hours=2)),
+            ]
+            await database.video_rooms.insert_many(rooms)
+
+            reaped = await server.reap_expired_video_rooms()
+
+            assert reaped == len(expired) + 1
+            assert sorted(daily_stub.deleted) == sorted(room["room_name"] for room in expired)
+            assert daily_stub.max_in_flight <= server.VIDEO_ROOM_DELETE_CONCURRENCY
+            active = {room["room_name"] async for room in database.video_rooms.find({"is_active": True})}
+            # Failed upstream deletions stay active so the next pass retries them
+            assert active == {"broken-1", "running", "upcoming"}
+
+    asyncio.run(scenario())
+
+
+def test_reaper_pages_past_many_active_rooms_sharing_a_start(daily_stub, scratch_database, monkeypatch):
+    monkeypatch.setattr(server, "VIDEO_ROOM_REAP_BATCH_SIZE", 5)
+
+    async def scenario():
+        async with scratch_database() as database:
+            started = datetime.utcnow() - timedelta(days=1)
+            # More than two batches on one timestamp that stay active: still running, or failing upstream
+            running = [video_room(f"running-{i}", started, duration_minutes=3 * 24 * 60) for i in range(8)]
+            broken = [video_room(f"broken-{i}", started) for i in range(6)]
+            expired = [video_room(f"room-{i}", started) for i in range(4)]
+            later = [video_room(f"room-later-{i}", started + timedelta(minutes=1)) for i in range(3)]
+            await database.video_rooms.insert_many(running + broken + expired + later)
+
+            reaped = await asyncio.wait_for(server.reap_expired_video_rooms(), timeout=30)
+
+            assert reaped == len(expired) + len(later)
+            assert await database.video_rooms.count_documents({"is_active": True}) == len(running) + len(broken)
+
+    asyncio.run(scenario())